@@ -1,5 +1,10 @@
 # app/api/models/request_models.py
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 class TextInputRequest(BaseModel):
-    text: str
\ No newline at end of file
+    model_config = ConfigDict(frozen=True)
+
+    text: str
+
+# Built once at import; validates raw JSON bodies without an intermediate json.loads
+TEXT_INPUT_REQUEST_ADAPTER = TypeAdapter(TextInputRequest)
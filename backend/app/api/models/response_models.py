@@ -3,11 +3,15 @@ from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
 
 class GateExplanation(BaseModel):
+    __slots__ = ()
+
     gate: str
     explanation: str
     analogy: Optional[str] = None
 
 class CircuitExplanation(BaseModel):
+    __slots__ = ()
+
     title: str
     summary: str
     gates: List[GateExplanation]
@@ -18,22 +22,30 @@ class CircuitExplanation(BaseModel):
     custom_description: Optional[str] = None
 
 class CircuitVisualization(BaseModel):
+    __slots__ = ()
+
     circuit_diagram: str  # Base64 encoded PNG
     bloch_sphere: Optional[str] = None  # Base64 encoded PNG
     q_sphere: Optional[str] = None  # Base64 encoded PNG
     measurement_histogram: Optional[str] = None  # Base64 encoded PNG
 
 class CircuitExports(BaseModel):
+    __slots__ = ()
+
     qiskit_code: str
     qasm_code: str
     json_code: str
     ibmq_config: Optional[str] = None
 
 class CustomGateSequence(BaseModel):
+    __slots__ = ()
+
     gates: List[str]
     description: Optional[str] = None
 
 class CircuitResponse(BaseModel):
+    __slots__ = ()
+
     circuit_type: str
     num_qubits: int
     explanation: CircuitExplanation
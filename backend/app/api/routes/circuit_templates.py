@@ -1,22 +1,41 @@
 # app/api/routes/circuit_templates.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
-import traceback
-from ...core.nlp_processor.intent_parser import CircuitType
+from pydantic import BaseModel, TypeAdapter
+import asyncio
+import logging
+import hashlib
+import base64
+import orjson
+import cbor2
+from collections import OrderedDict
+from qiskit import QuantumCircuit
+from ...core.nlp_processor.intent_parser import CircuitType, CircuitIntent
 from ...core.circuit_builder.builder import CircuitBuilder
 from ..models.response_models import CircuitResponse, CircuitExplanation, CircuitVisualization, CircuitExports, GateExplanation
 from ...core.explanation_generator.circuit_explainer import CircuitExplainer
 from ...core.output_generator.qiskit_generator import QiskitGenerator
 from ...core.output_generator.visualizer import CircuitVisualizer
 from ...core.output_generator.export_generator import ExportGenerator
+from ...core.lru_cache import lru_get, lru_put_bytes
+from ...core.cpu_pool import run_in_cpu_pool
+from ...core.image_store import IMAGE_FIELDS
+from .visualizations import store_image_urls
+from ...config import settings
+
+logger = logging.getLogger(__name__)
 
 # Define models for circuit templates
 class ParameterOption(BaseModel):
+    __slots__ = ()
+
     value: str
     label: str
 
 class CircuitParameter(BaseModel):
+    __slots__ = ()
+
     name: str
     label: str
     type: str
@@ -26,6 +45,8 @@ class CircuitParameter(BaseModel):
     options: Optional[List[ParameterOption]] = None
 
 class CircuitTypeInfo(BaseModel):
+    __slots__ = ()
+
     id: str
     name: str
     description: str
@@ -33,426 +54,404 @@ class CircuitTypeInfo(BaseModel):
     defaultParams: Dict[str, Any]
 
 class CircuitGenerateRequest(BaseModel):
+    __slots__ = ()
+
     circuit_type: str
     parameters: Dict[str, Any]
 
+class CircuitExplainBatchRequest(BaseModel):
+    __slots__ = ()
+
+    circuits: List[CircuitGenerateRequest]
+
+# Shared option list for yes/no select parameters
+_YES_NO_OPTIONS: List[Dict[str, str]] = [
+    {"value": "yes", "label": "Yes"},
+    {"value": "no", "label": "No"}
+]
+
+def _qubits_param(default: int, lo: int, hi: int) -> Dict[str, Any]:
+    """Build the num_qubits parameter entry shared by most templates."""
+    return {"name": "num_qubits", "label": "Number of Qubits", "type": "number", "default": default, "min": lo, "max": hi}
+
+def _yes_no_param(name: str, label: str, default: str) -> Dict[str, Any]:
+    """Build a yes/no select parameter entry."""
+    return {"name": name, "label": label, "type": "select", "default": default, "options": _YES_NO_OPTIONS}
+
+# Static template catalogue, validated into CircuitTypeInfo models once at import
+_TEMPLATES_RAW: List[Dict[str, Any]] = [
+    {
+        "id": CircuitType.BELL_STATE.value,
+        "name": "Bell State",
+        "description": "A simple Bell state circuit that creates quantum entanglement between qubits",
+        "parameters": [
+            _qubits_param(2, 2, 5),
+            _yes_no_param("measure", "Add Measurement", "yes")
+        ],
+        "defaultParams": {"num_qubits": 2, "measure": "yes"}
+    },
+    {
+        "id": CircuitType.GHZ_STATE.value,
+        "name": "GHZ State",
+        "description": "Greenberger–Horne–Zeilinger state - a highly entangled quantum state",
+        "parameters": [
+            _qubits_param(3, 3, 10)
+        ],
+        "defaultParams": {"num_qubits": 3}
+    },
+    {
+        "id": CircuitType.W_STATE.value,
+        "name": "W State",
+        "description": "Another type of entangled quantum state where exactly one qubit is in state |1⟩",
+        "parameters": [
+            _qubits_param(3, 3, 8)
+        ],
+        "defaultParams": {"num_qubits": 3}
+    },
+    {
+        "id": CircuitType.TELEPORTATION.value,
+        "name": "Quantum Teleportation",
+        "description": "Quantum teleportation protocol that transfers a quantum state using entanglement",
+        "parameters": [],
+        "defaultParams": {}
+    },
+    {
+        "id": CircuitType.SUPERDENSE_CODING.value,
+        "name": "Superdense Coding",
+        "description": "Quantum protocol that allows sending two classical bits using one qubit",
+        "parameters": [],
+        "defaultParams": {}
+    },
+    {
+        "id": CircuitType.DEUTSCH_JOZSA.value,
+        "name": "Deutsch-Jozsa Algorithm",
+        "description": "Quantum algorithm that determines if a function is constant or balanced",
+        "parameters": [
+            _qubits_param(3, 2, 8),
+            {"name": "oracle_type", "label": "Oracle Type", "type": "select", "default": "balanced", "options": [
+                {"value": "constant", "label": "Constant"},
+                {"value": "balanced", "label": "Balanced"}
+            ]}
+        ],
+        "defaultParams": {"num_qubits": 3, "oracle_type": "balanced"}
+    },
+    {
+        "id": CircuitType.BERNSTEIN_VAZIRANI.value,
+        "name": "Bernstein-Vazirani Algorithm",
+        "description": "Quantum algorithm that determines a hidden bitstring",
+        "parameters": [
+            _qubits_param(4, 3, 8),
+            {"name": "secret_string", "label": "Secret String", "type": "select", "default": "101", "options": [
+                {"value": "101", "label": "101"},
+                {"value": "010", "label": "010"},
+                {"value": "111", "label": "111"},
+                {"value": "001", "label": "001"}
+            ]}
+        ],
+        "defaultParams": {"num_qubits": 4, "secret_string": "101"}
+    },
+    {
+        "id": CircuitType.SIMON.value,
+        "name": "Simon's Algorithm",
+        "description": "Quantum algorithm that determines a hidden bitstring in a black-box function",
+        "parameters": [
+            _qubits_param(6, 4, 8)
+        ],
+        "defaultParams": {"num_qubits": 6}
+    },
+    {
+        "id": CircuitType.QFT.value,
+        "name": "Quantum Fourier Transform",
+        "description": "Quantum Fourier Transform circuit - the quantum analog of the discrete Fourier transform",
+        "parameters": [
+            _qubits_param(3, 2, 8),
+            _yes_no_param("inverse", "Inverse QFT", "no")
+        ],
+        "defaultParams": {"num_qubits": 3, "inverse": "no"}
+    },
+    {
+        "id": CircuitType.QPE.value,
+        "name": "Quantum Phase Estimation",
+        "description": "Algorithm to estimate the eigenphase of a unitary operator",
+        "parameters": [
+            _qubits_param(5, 3, 8),
+            {"name": "precision_qubits", "label": "Precision Qubits", "type": "number", "default": 3, "min": 2, "max": 6}
+        ],
+        "defaultParams": {"num_qubits": 5, "precision_qubits": 3}
+    },
+    {
+        "id": CircuitType.SHOR.value,
+        "name": "Shor's Algorithm",
+        "description": "Quantum algorithm for integer factorization",
+        "parameters": [
+            _qubits_param(7, 5, 10),
+            {"name": "number_to_factor", "label": "Number to Factor", "type": "select", "default": "15", "options": [
+                {"value": "15", "label": "15"},
+                {"value": "21", "label": "21"},
+                {"value": "35", "label": "35"}
+            ]}
+        ],
+        "defaultParams": {"num_qubits": 7, "number_to_factor": "15"}
+    },
+    {
+        "id": CircuitType.GROVERS.value,
+        "name": "Grover's Algorithm",
+        "description": "Quantum search algorithm that finds an element in an unsorted database",
+        "parameters": [
+            _qubits_param(3, 2, 6),
+            {"name": "iterations", "label": "Number of Iterations", "type": "number", "default": 1, "min": 1, "max": 10},
+            {"name": "marked_state", "label": "Marked State", "type": "select", "default": "101", "options": [
+                {"value": "101", "label": "101"},
+                {"value": "010", "label": "010"},
+                {"value": "111", "label": "111"}
+            ]}
+        ],
+        "defaultParams": {"num_qubits": 3, "iterations": 1, "marked_state": "101"}
+    },
+    {
+        "id": CircuitType.QAOA.value,
+        "name": "Quantum Approximate Optimization Algorithm",
+        "description": "Variational quantum algorithm for solving combinatorial optimization problems",
+        "parameters": [
+            _qubits_param(4, 2, 8),
+            {"name": "p_layers", "label": "Number of QAOA Layers", "type": "number", "default": 1, "min": 1, "max": 3}
+        ],
+        "defaultParams": {"num_qubits": 4, "p_layers": 1}
+    },
+    {
+        "id": CircuitType.VQE.value,
+        "name": "Variational Quantum Eigensolver",
+        "description": "Hybrid quantum-classical algorithm for finding low energy states of molecules",
+        "parameters": [
+            _qubits_param(4, 2, 8),
+            {"name": "ansatz_depth", "label": "Ansatz Depth", "type": "number", "default": 1, "min": 1, "max": 3}
+        ],
+        "defaultParams": {"num_qubits": 4, "ansatz_depth": 1}
+    },
+    {
+        "id": CircuitType.QUANTUM_COUNTING.value,
+        "name": "Quantum Counting Algorithm",
+        "description": "Quantum algorithm that determines the number of solutions to a search problem",
+        "parameters": [
+            _qubits_param(6, 4, 8),
+            {"name": "counting_qubits", "label": "Counting Qubits", "type": "number", "default": 3, "min": 2, "max": 4}
+        ],
+        "defaultParams": {"num_qubits": 6, "counting_qubits": 3}
+    },
+    {
+        "id": CircuitType.QUANTUM_WALK.value,
+        "name": "Quantum Walk",
+        "description": "Quantum version of the classical random walk algorithm",
+        "parameters": [
+            _qubits_param(5, 3, 8),
+            {"name": "steps", "label": "Number of Steps", "type": "number", "default": 2, "min": 1, "max": 5}
+        ],
+        "defaultParams": {"num_qubits": 5, "steps": 2}
+    },
+    {
+        "id": CircuitType.HHL.value,
+        "name": "HHL Algorithm",
+        "description": "Quantum algorithm for solving linear systems of equations",
+        "parameters": [
+            _qubits_param(5, 4, 8),
+            {"name": "precision_qubits", "label": "Precision Qubits", "type": "number", "default": 3, "min": 2, "max": 4}
+        ],
+        "defaultParams": {"num_qubits": 5, "precision_qubits": 3}
+    }
+]
+
+_TEMPLATES: List[CircuitTypeInfo] = TypeAdapter(List[CircuitTypeInfo]).validate_python(_TEMPLATES_RAW)
+
+# The template catalogue never changes at runtime, so serialize it once at import
+_TEMPLATES_JSON: bytes = orjson.dumps([t.model_dump() for t in _TEMPLATES])
+_TEMPLATES_ETAG = f'"{hashlib.blake2b(_TEMPLATES_JSON, digest_size=16).hexdigest()}"'
+
+# The circuit collaborators hold no per-request state, so share one instance of each
+_BUILDER = CircuitBuilder()
+_EXPLAINER = CircuitExplainer()
+_VISUALIZER = CircuitVisualizer()
+_EXPORTER = ExportGenerator()
+_QISKIT_GEN = QiskitGenerator()
+
+# Lookup table from request strings to CircuitType members
+_CTYPE_MAP = {ct.value: ct for ct in CircuitType}
+
+# Most circuits accepted by one /explain/batch submission
+_EXPLAIN_BATCH_MAX_CIRCUITS = 100
+
+# Output steps run by _render_outputs, keyed by the result name the route reads
+_VIZ_STEPS = (
+    ("circuit_image", _VISUALIZER.generate_circuit_image),
+    ("viz_bundle", _VISUALIZER.render_all),
+)
+_EXPORT_STEPS = (
+    ("qiskit_code", _QISKIT_GEN.generate_code),
+)
+
+def _circuit_fingerprint(circuit: QuantumCircuit) -> bytes:
+    """
+    Hash what a circuit's renders depend on: its registers and each operation's name,
+    bit indices, parameters and condition.
+    
+    Built from circuit.data rather than QASM, since QuantumCircuit.qasm() is gone in
+    qiskit 1.0 and not every circuit can be written as QASM.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(reg.name, reg.size) for reg in circuit.qregs + circuit.cregs]).encode())
+    for instruction in circuit.data:
+        operation = instruction.operation
+        digest.update(repr((
+            operation.name,
+            [circuit.find_bit(q).index for q in instruction.qubits],
+            [circuit.find_bit(c).index for c in instruction.clbits],
+            operation.params,
+            getattr(operation, "condition", None),
+        )).encode())
+    return digest.digest()
+
+def _render_outputs(circuit: QuantumCircuit, cached_viz: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Produce all visualizations and exports of a built template circuit, reusing
+    cached_viz for the visualizations when given.
+    
+    Runs on CPU_POOL. A failing output step yields an exception in place of its
+    result so the others are still returned.
+    """
+    results: Dict[str, Any] = {}
+    if cached_viz is not None:
+        results.update(cached_viz)
+        steps = _EXPORT_STEPS
+    else:
+        steps = _VIZ_STEPS + _EXPORT_STEPS
+    
+    for name, step in steps:
+        try:
+            results[name] = step(circuit)
+        except Exception as e:
+            results[name] = e
+    
+    # The remaining exports come from one pass, which reports failures per export
+    results.update(_EXPORTER.generate_all(circuit))
+    return results
+
+# Serialized /generate responses, keyed by the canonical (circuit_type, parameters) JSON.
+# Bounded by total size, since the inline base64 PNGs make each one tens to hundreds of KB.
+_RESP_CACHE: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+# Rendered visualizations, keyed by _circuit_fingerprint of the built circuit
+_VIZ_CACHE: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
+def _viz_size(viz: Dict[str, Any]) -> int:
+    """Total length of the base64 images in a _VIZ_CACHE entry."""
+    return len(viz["circuit_image"] or "") + sum(len(image or "") for image in viz["viz_bundle"].values())
+
+def _response_cache_key(circuit_type: str, parameters: Dict[str, Any]) -> bytes:
+    """Build a canonical cache key for a template generation request."""
+    return orjson.dumps({"t": circuit_type, "p": parameters}, option=orjson.OPT_SORT_KEYS)
+
+def _wants_cbor(http_request: Request) -> bool:
+    """Check whether the client asked for a CBOR encoded response."""
+    return "application/cbor" in http_request.headers.get("accept", "")
+
+def _store_raw_images(payload: Dict[str, Any]) -> None:
+    """Replace inline base64 PNGs with raw bytes for binary encodings."""
+    visualization = payload.get("visualization") or {}
+    for field in IMAGE_FIELDS:
+        encoded = visualization.get(field)
+        if encoded:
+            visualization[field] = base64.b64decode(encoded)
+
+def _encode_generate_response(body: bytes, http_request: Request, images: str) -> Response:
+    """Encode a /generate response in the representation the client asked for."""
+    wants_cbor = _wants_cbor(http_request)
+    if images != "urls" and not wants_cbor:
+        return Response(content=body, media_type="application/json")
+    
+    payload = orjson.loads(body)
+    if images == "urls":
+        store_image_urls(payload["visualization"], http_request)
+    else:
+        _store_raw_images(payload)
+    
+    if wants_cbor:
+        return Response(content=cbor2.dumps(payload), media_type="application/cbor")
+    return Response(content=orjson.dumps(payload), media_type="application/json")
+
 router = APIRouter(
     prefix="/circuits",
     tags=["circuit-templates"],
     responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse,
 )
 
-@router.get("/templates", response_model=List[CircuitTypeInfo])
-async def get_circuit_templates():
+@router.get("/templates", responses={200: {"model": List[CircuitTypeInfo]}})
+async def get_circuit_templates(http_request: Request):
     """
     Get a list of available quantum circuit templates with their parameters.
     """
-    try:
-        circuit_types = [
-            CircuitTypeInfo(
-                id=CircuitType.BELL_STATE.value,
-                name="Bell State",
-                description="A simple Bell state circuit that creates quantum entanglement between qubits",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=2,
-                        min=2,
-                        max=5
-                    ),
-                    CircuitParameter(
-                        name="measure",
-                        label="Add Measurement",
-                        type="select",
-                        default="yes",
-                        options=[
-                            ParameterOption(value="yes", label="Yes"),
-                            ParameterOption(value="no", label="No")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 2, "measure": "yes"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.GHZ_STATE.value,
-                name="GHZ State",
-                description="Greenberger–Horne–Zeilinger state - a highly entangled quantum state",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=3,
-                        min=3,
-                        max=10
-                    )
-                ],
-                defaultParams={"num_qubits": 3}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.W_STATE.value,
-                name="W State",
-                description="Another type of entangled quantum state where exactly one qubit is in state |1⟩",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=3,
-                        min=3,
-                        max=8
-                    )
-                ],
-                defaultParams={"num_qubits": 3}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.TELEPORTATION.value,
-                name="Quantum Teleportation",
-                description="Quantum teleportation protocol that transfers a quantum state using entanglement",
-                parameters=[],
-                defaultParams={}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.SUPERDENSE_CODING.value,
-                name="Superdense Coding",
-                description="Quantum protocol that allows sending two classical bits using one qubit",
-                parameters=[],
-                defaultParams={}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.DEUTSCH_JOZSA.value,
-                name="Deutsch-Jozsa Algorithm",
-                description="Quantum algorithm that determines if a function is constant or balanced",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="oracle_type",
-                        label="Oracle Type",
-                        type="select",
-                        default="balanced",
-                        options=[
-                            ParameterOption(value="constant", label="Constant"),
-                            ParameterOption(value="balanced", label="Balanced")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 3, "oracle_type": "balanced"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.BERNSTEIN_VAZIRANI.value,
-                name="Bernstein-Vazirani Algorithm",
-                description="Quantum algorithm that determines a hidden bitstring",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=4,
-                        min=3,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="secret_string",
-                        label="Secret String",
-                        type="select",
-                        default="101",
-                        options=[
-                            ParameterOption(value="101", label="101"),
-                            ParameterOption(value="010", label="010"),
-                            ParameterOption(value="111", label="111"),
-                            ParameterOption(value="001", label="001")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 4, "secret_string": "101"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.SIMON.value,
-                name="Simon's Algorithm",
-                description="Quantum algorithm that determines a hidden bitstring in a black-box function",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=6,
-                        min=4,
-                        max=8
-                    )
-                ],
-                defaultParams={"num_qubits": 6}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.QFT.value,
-                name="Quantum Fourier Transform",
-                description="Quantum Fourier Transform circuit - the quantum analog of the discrete Fourier transform",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="inverse",
-                        label="Inverse QFT",
-                        type="select",
-                        default="no",
-                        options=[
-                            ParameterOption(value="yes", label="Yes"),
-                            ParameterOption(value="no", label="No")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 3, "inverse": "no"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.QPE.value,
-                name="Quantum Phase Estimation",
-                description="Algorithm to estimate the eigenphase of a unitary operator",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=5,
-                        min=3,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="precision_qubits",
-                        label="Precision Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=6
-                    )
-                ],
-                defaultParams={"num_qubits": 5, "precision_qubits": 3}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.SHOR.value,
-                name="Shor's Algorithm",
-                description="Quantum algorithm for integer factorization",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=7,
-                        min=5,
-                        max=10
-                    ),
-                    CircuitParameter(
-                        name="number_to_factor",
-                        label="Number to Factor",
-                        type="select",
-                        default="15",
-                        options=[
-                            ParameterOption(value="15", label="15"),
-                            ParameterOption(value="21", label="21"),
-                            ParameterOption(value="35", label="35")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 7, "number_to_factor": "15"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.GROVERS.value,
-                name="Grover's Algorithm",
-                description="Quantum search algorithm that finds an element in an unsorted database",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=6
-                    ),
-                    CircuitParameter(
-                        name="iterations",
-                        label="Number of Iterations",
-                        type="number",
-                        default=1,
-                        min=1,
-                        max=10
-                    ),
-                    CircuitParameter(
-                        name="marked_state",
-                        label="Marked State",
-                        type="select",
-                        default="101",
-                        options=[
-                            ParameterOption(value="101", label="101"),
-                            ParameterOption(value="010", label="010"),
-                            ParameterOption(value="111", label="111")
-                        ]
-                    )
-                ],
-                defaultParams={"num_qubits": 3, "iterations": 1, "marked_state": "101"}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.QAOA.value,
-                name="Quantum Approximate Optimization Algorithm",
-                description="Variational quantum algorithm for solving combinatorial optimization problems",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=4,
-                        min=2,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="p_layers",
-                        label="Number of QAOA Layers",
-                        type="number",
-                        default=1,
-                        min=1,
-                        max=3
-                    )
-                ],
-                defaultParams={"num_qubits": 4, "p_layers": 1}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.VQE.value,
-                name="Variational Quantum Eigensolver",
-                description="Hybrid quantum-classical algorithm for finding low energy states of molecules",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=4,
-                        min=2,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="ansatz_depth",
-                        label="Ansatz Depth",
-                        type="number",
-                        default=1,
-                        min=1,
-                        max=3
-                    )
-                ],
-                defaultParams={"num_qubits": 4, "ansatz_depth": 1}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.QUANTUM_COUNTING.value,
-                name="Quantum Counting Algorithm",
-                description="Quantum algorithm that determines the number of solutions to a search problem",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=6,
-                        min=4,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="counting_qubits",
-                        label="Counting Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=4
-                    )
-                ],
-                defaultParams={"num_qubits": 6, "counting_qubits": 3}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.QUANTUM_WALK.value,
-                name="Quantum Walk",
-                description="Quantum version of the classical random walk algorithm",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=5,
-                        min=3,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="steps",
-                        label="Number of Steps",
-                        type="number",
-                        default=2,
-                        min=1,
-                        max=5
-                    )
-                ],
-                defaultParams={"num_qubits": 5, "steps": 2}
-            ),
-            CircuitTypeInfo(
-                id=CircuitType.HHL.value,
-                name="HHL Algorithm",
-                description="Quantum algorithm for solving linear systems of equations",
-                parameters=[
-                    CircuitParameter(
-                        name="num_qubits",
-                        label="Number of Qubits",
-                        type="number",
-                        default=5,
-                        min=4,
-                        max=8
-                    ),
-                    CircuitParameter(
-                        name="precision_qubits",
-                        label="Precision Qubits",
-                        type="number",
-                        default=3,
-                        min=2,
-                        max=4
-                    )
-                ],
-                defaultParams={"num_qubits": 5, "precision_qubits": 3}
-            )
-        ]
-        
-        return circuit_types
-    except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error getting circuit templates: {str(e)}\n{error_details}")
-        raise HTTPException(status_code=500, detail=str(e))
+    headers = {"ETag": _TEMPLATES_ETAG, "Cache-Control": "public, max-age=3600"}
+    
+    # Clients that already hold this catalogue revision only need the headers
+    if_none_match = http_request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in client_etags or _TEMPLATES_ETAG in client_etags:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(
+        content=_TEMPLATES_JSON,
+        media_type="application/json",
+        headers=headers
+    )
 
-@router.post("/generate", response_model=CircuitResponse)
-async def generate_from_template(request: CircuitGenerateRequest):
+@router.post(
+    "/generate",
+    responses={200: {"model": CircuitResponse, "content": {"application/cbor": {}}}}
+)
+async def generate_from_template(
+    request: CircuitGenerateRequest,
+    http_request: Request,
+    images: str = Query("inline", pattern="^(inline|urls)$", description="Return PNGs inline as base64 or as /viz URLs")
+):
     """
     Generate a quantum circuit from a selected template and parameters.
     """
     try:
-        print(f"Generating circuit of type: {request.circuit_type} with parameters: {request.parameters}")
+        logger.info("Generating circuit of type: %s with parameters: %s", request.circuit_type, request.parameters)
         
-        # Create a CircuitIntent from the template selection
-        from ...core.nlp_processor.intent_parser import CircuitIntent
-        
-        try:
-            circuit_type = CircuitType(request.circuit_type)
-        except ValueError:
+        circuit_type = _CTYPE_MAP.get(request.circuit_type)
+        if circuit_type is None:
             raise HTTPException(status_code=400, detail=f"Invalid circuit type: {request.circuit_type}")
         
+        # Template output is deterministic in (circuit_type, parameters), so replay cached
+        # bytes before doing any per-request setup
+        cache_key = _response_cache_key(request.circuit_type, request.parameters)
+        cached_body = lru_get(_RESP_CACHE, cache_key)
+        if cached_body is not None:
+            return _encode_generate_response(cached_body, http_request, images)
+        
         # Create the circuit intent
         intent = CircuitIntent(circuit_type, request.parameters)
         
-        # Build the circuit
-        circuit_builder = CircuitBuilder()
-        circuit = circuit_builder.build_circuit(intent)
+        # Build here, so the builder's caches and async OpenAI client are shared by all
+        # requests, then render and export in one CPU pool round trip
+        circuit = await _BUILDER.abuild_circuit(intent)
+        
+        # Different parameters can produce the same circuit, so reuse renders by circuit
+        # content. The cache is only touched here on the event loop, not from pool threads.
+        fingerprint = _circuit_fingerprint(circuit)
+        cached_viz = lru_get(_VIZ_CACHE, fingerprint)
+        rendered = await run_in_cpu_pool(_render_outputs, circuit, cached_viz)
+        if cached_viz is None:
+            viz = {name: rendered[name] for name, _ in _VIZ_STEPS}
+            if not any(isinstance(value, Exception) for value in viz.values()):
+                lru_put_bytes(_VIZ_CACHE, fingerprint, viz, settings.VIZ_CACHE_BYTES, size=_viz_size)
+        circuit_image = rendered["circuit_image"]
+        viz_bundle = rendered["viz_bundle"]
+        qiskit_code = rendered["qiskit_code"]
+        qasm_code = rendered["qasm_code"]
+        json_code = rendered["json_code"]
+        ibmq_config = rendered["ibmq_config"]
         
         # Initialize response objects with default values
         explanation = CircuitExplanation(
@@ -479,14 +478,14 @@ async def generate_from_template(request: CircuitGenerateRequest):
         
         # Generate explanation
         try:
-            circuit_explainer = CircuitExplainer()
-            explanation_dict = circuit_explainer.generate_explanation(intent, circuit)
+            explanation_dict = await _EXPLAINER.agenerate_explanation(intent, circuit)
             
-            # Convert explanation dict to model format
-            explanation = CircuitExplanation(
+            # Convert explanation dict to model format; the dict comes from our own
+            # explainer rather than user input, so skip per-field validation
+            explanation = CircuitExplanation.model_construct(
                 title=explanation_dict.get("title", f"{intent.circuit_type.value.replace('_', ' ').title()} Circuit"),
                 summary=explanation_dict.get("summary", "A quantum circuit implementation."),
-                gates=[GateExplanation(
+                gates=[GateExplanation.model_construct(
                     gate=g.get("gate", ""),
                     explanation=g.get("explanation", ""),
                     analogy=g.get("analogy", "")
@@ -496,58 +495,45 @@ async def generate_from_template(request: CircuitGenerateRequest):
                 error=explanation_dict.get("error", None)
             )
         except Exception as e:
-            print(f"Error generating explanation: {str(e)}")
+            logger.exception("Error generating explanation: %s", e)
             explanation.error = f"Error generating explanation: {str(e)}"
         
-        # Generate visualizations
-        try:
-            visualizer = CircuitVisualizer()
-            circuit_image = visualizer.generate_circuit_image(circuit)
+        # Apply visualization results
+        if isinstance(circuit_image, Exception):
+            logger.error("Error generating visualizations: %s", circuit_image, exc_info=circuit_image)
+        else:
             visualization.circuit_diagram = circuit_image
-            
-            try:
-                statevector_viz = visualizer.generate_statevector_visualization(circuit)
-                visualization.bloch_sphere = statevector_viz.get("bloch_sphere")
-                visualization.q_sphere = statevector_viz.get("q_sphere")
-            except Exception as e:
-                print(f"Error generating statevector visualization: {str(e)}")
-            
-            try:
-                measurement_histogram = visualizer.generate_measurement_histogram(circuit)
-                visualization.measurement_histogram = measurement_histogram
-            except Exception as e:
-                print(f"Error generating measurement histogram: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating visualizations: {str(e)}")
         
-        # Generate export formats
-        try:
-            export_generator = ExportGenerator()
-            qiskit_generator = QiskitGenerator()
-            
-            exports.qiskit_code = qiskit_generator.generate_code(circuit)
-            
-            try:
-                exports.qasm_code = export_generator.generate_qasm(circuit)
-            except Exception as e:
-                print(f"Error generating QASM: {str(e)}")
-                exports.qasm_code = "# Error generating QASM code"
-            
-            try:
-                exports.json_code = export_generator.generate_json(circuit)
-            except Exception as e:
-                print(f"Error generating JSON: {str(e)}")
-                exports.json_code = "{\"error\": \"Error generating JSON code\"}"
-            
-            try:
-                exports.ibmq_config = export_generator.generate_ibmq_job(circuit)
-            except Exception as e:
-                print(f"Error generating IBMQ config: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating exports: {str(e)}")
-            exports.qiskit_code = f"# Error generating Qiskit code: {str(e)}"
+        if isinstance(viz_bundle, Exception):
+            logger.error("Error generating state visualizations: %s", viz_bundle, exc_info=viz_bundle)
+        else:
+            visualization.bloch_sphere = viz_bundle["bloch_sphere"]
+            visualization.q_sphere = viz_bundle["q_sphere"]
+            visualization.measurement_histogram = viz_bundle["measurement_histogram"]
+        
+        # Apply export results
+        if isinstance(qiskit_code, Exception):
+            logger.error("Error generating exports: %s", qiskit_code, exc_info=qiskit_code)
+            exports.qiskit_code = f"# Error generating Qiskit code: {str(qiskit_code)}"
+        else:
+            exports.qiskit_code = qiskit_code
+        
+        if isinstance(qasm_code, Exception):
+            logger.error("Error generating QASM: %s", qasm_code, exc_info=qasm_code)
+            exports.qasm_code = "# Error generating QASM code"
+        else:
+            exports.qasm_code = qasm_code
+        
+        if isinstance(json_code, Exception):
+            logger.error("Error generating JSON: %s", json_code, exc_info=json_code)
+            exports.json_code = "{\"error\": \"Error generating JSON code\"}"
+        else:
+            exports.json_code = json_code
+        
+        if isinstance(ibmq_config, Exception):
+            logger.error("Error generating IBMQ config: %s", ibmq_config, exc_info=ibmq_config)
+        else:
+            exports.ibmq_config = ibmq_config
         
         # Prepare the complete response
         response = CircuitResponse(
@@ -558,9 +544,102 @@ async def generate_from_template(request: CircuitGenerateRequest):
             exports=exports,
         )
         
-        return response
+        # Serialize straight from the model with pydantic-core, skipping jsonable_encoder
+        body = response.model_dump_json().encode()
+        
+        # Don't pin transient explanation failures (e.g. OpenAI outages) in the cache
+        if explanation.error is None:
+            lru_put_bytes(_RESP_CACHE, cache_key, body, settings.TEMPLATE_RESPONSE_CACHE_BYTES)
+        
+        return _encode_generate_response(body, http_request, images)
         
+    except HTTPException as he:
+        # Just re-raise HTTP exceptions
+        raise he
     except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error generating circuit from template: {str(e)}\n{error_details}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.exception("Error generating circuit from template: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/explain/stream", responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_template_explanation(request: CircuitGenerateRequest):
+    """
+    Stream the explanation of a template circuit as server-sent events.
+    
+    Each `fragment` event carries a {field: value} object with the title, summary or
+    educational value as soon as OpenAI has written it. The final `explanation` event
+    carries the complete explanation.
+    """
+    circuit_type = _CTYPE_MAP.get(request.circuit_type)
+    if circuit_type is None:
+        raise HTTPException(status_code=400, detail=f"Invalid circuit type: {request.circuit_type}")
+    
+    intent = CircuitIntent(circuit_type, request.parameters)
+    try:
+        circuit = await _BUILDER.abuild_circuit(intent)
+    except Exception as e:
+        logger.exception("Error building circuit for explanation: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        # Hold each item back by one, since only the last one is the complete explanation
+        previous = None
+        async for item in _EXPLAINER.stream_explanation(intent, circuit):
+            if previous is not None:
+                yield b"event: fragment\ndata: " + orjson.dumps(previous) + b"\n\n"
+            previous = item
+        yield b"event: explanation\ndata: " + orjson.dumps(previous) + b"\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/explain/batch")
+async def submit_explanation_batch(request: CircuitExplainBatchRequest):
+    """
+    Submit explanations for a set of template circuits, e.g. a classroom set, as one
+    OpenAI Batch API job.
+    
+    Batch jobs cost about half as much as individual explanations but may take up to
+    24 hours. Returns the batch id to poll with GET /circuits/explain/batch/{batch_id}.
+    """
+    if not 1 <= len(request.circuits) <= _EXPLAIN_BATCH_MAX_CIRCUITS:
+        raise HTTPException(status_code=400, detail=f"Submit between 1 and {_EXPLAIN_BATCH_MAX_CIRCUITS} circuits")
+    if not _EXPLAINER.async_client:
+        raise HTTPException(status_code=503, detail="OpenAI API key not found")
+    
+    intents = []
+    for item in request.circuits:
+        circuit_type = _CTYPE_MAP.get(item.circuit_type)
+        if circuit_type is None:
+            raise HTTPException(status_code=400, detail=f"Invalid circuit type: {item.circuit_type}")
+        intents.append(CircuitIntent(circuit_type, dict(item.parameters)))
+    
+    try:
+        circuits = await asyncio.gather(*(_BUILDER.abuild_circuit(intent) for intent in intents))
+        batch_id = await _EXPLAINER.asubmit_batch(list(zip(intents, circuits)))
+    except Exception as e:
+        logger.exception("Error submitting explanation batch: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"batch_id": batch_id, "status": "submitted"}
+
+@router.get("/explain/batch/{batch_id}")
+async def get_explanation_batch(batch_id: str):
+    """
+    Check on a submitted explanation batch.
+    
+    Returns status "in_progress" until the job finishes, then "completed" with the
+    explanations keyed by the index of each circuit in the submission.
+    """
+    if not _EXPLAINER.async_client:
+        raise HTTPException(status_code=503, detail="OpenAI API key not found")
+    
+    try:
+        explanations = await _EXPLAINER.apoll_batch(batch_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        logger.exception("Error polling explanation batch %s: %s", batch_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if explanations is None:
+        return {"batch_id": batch_id, "status": "in_progress"}
+    return {"batch_id": batch_id, "status": "completed", "explanations": explanations}
@@ -1,26 +1,41 @@
 # app/api/routes/circuit_upload.py
-import traceback
+import logging
+import asyncio
 import os
 import tempfile
 import json
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+import codecs
+import copy
+import hashlib
+import functools
+from collections import OrderedDict
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 
 from ..models.response_models import CircuitResponse, CircuitExplanation, CircuitVisualization, CircuitExports, GateExplanation
 from ...core.nlp_processor.intent_parser import CircuitType, CircuitIntent
 from ...core.nlp_processor.openai_parser import OpenAICircuitParser
+from ...core.nlp_processor.local_parser import LocalCircuitFileParser
 from ...core.circuit_builder.builder import CircuitBuilder
 from ...core.output_generator.qiskit_generator import QiskitGenerator
 from ...core.output_generator.visualizer import CircuitVisualizer
 from ...core.output_generator.export_generator import ExportGenerator
 from ...core.explanation_generator.circuit_explainer import CircuitExplainer
 from ...core.explanation_generator.custom_circuit_explainer import CustomCircuitExplainer
+from ...core.lru_cache import lru_get, lru_put
+from ...core.cpu_pool import run_in_cpu_pool
+from ...config import settings
+from .visualizations import store_image_urls
+
+logger = logging.getLogger(__name__)
 
 # Define request models
 class CircuitUploadResponse(CircuitResponse):
     """Response model for circuit uploads, extending the base CircuitResponse."""
+    __slots__ = ()
+
     source_format: str
     original_content: str
     cleaned_content: Optional[str] = None
@@ -29,19 +44,94 @@ router = APIRouter(
     prefix="/upload",
     tags=["circuit-upload"],
     responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse,
 )
 
-# Define allowed file extensions
-ALLOWED_EXTENSIONS = {
-    '.qasm': 'qasm',    # OpenQASM files
-    '.py': 'qiskit',    # Qiskit Python files
-    '.json': 'json'     # JSON circuit descriptions
+# Map allowed file extensions (without the dot) to circuit formats
+_EXT_FORMAT = {
+    'qasm': 'qasm',    # OpenQASM files
+    'py': 'qiskit',    # Qiskit Python files
+    'json': 'json'     # JSON circuit descriptions
 }
+_ALLOWED_EXTENSIONS = frozenset(_EXT_FORMAT)
+
+# The circuit collaborators hold no per-request state, so share one instance of each
+_BUILDER = CircuitBuilder()
+_CUSTOM_EXPLAINER = CustomCircuitExplainer()
+_VISUALIZER = CircuitVisualizer()
+_EXPORTER = ExportGenerator()
+_QISKIT_GEN = QiskitGenerator()
+_LOCAL_PARSER = LocalCircuitFileParser()
+
+@functools.lru_cache(maxsize=None)
+def _get_openai_parser(api_key: Optional[str]) -> OpenAICircuitParser:
+    """Return a shared parser per API key so its OpenAI connection pool is reused."""
+    return OpenAICircuitParser(api_key)
+
+# OpenAI parses of uploaded files, keyed by a hash of the file and parse inputs
+_PARSE_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+
+def _parse_cache_key(content_digest: bytes, file_format: str, description: Optional[str]) -> str:
+    """Build the content-addressed key for a circuit file parse."""
+    digest = hashlib.blake2b(content_digest, digest_size=16)
+    digest.update(b"\0")
+    for part in (file_format, description or "", OpenAICircuitParser.FILE_PARSE_MODEL):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+async def _parse_with_openai(file_content: str, content_digest: bytes, file_format: str,
+                             description: Optional[str]) -> tuple:
+    """Parse a circuit file with OpenAI, reusing earlier results for identical uploads."""
+    parse_key = _parse_cache_key(content_digest, file_format, description)
+    cached_parse = lru_get(_PARSE_CACHE, parse_key)
+    if cached_parse is not None:
+        logger.debug("Using cached parse for %s circuit file", file_format)
+        return copy.deepcopy(cached_parse)
+    
+    # Use OpenAI to analyze and clean the circuit
+    openai_parser = _get_openai_parser(os.environ.get("OPENAI_API_KEY"))
+    
+    logger.debug("Parsing %s circuit file with OpenAI", file_format)
+    result = await openai_parser.parse_circuit_file_async(file_content, file_format, description)
+    lru_put(_PARSE_CACHE, parse_key, copy.deepcopy(result), settings.OPENAI_PARSE_CACHE_SIZE)
+    return result
+
+# Uploads are read and decoded in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
 
-@router.post("/circuit", response_model=CircuitUploadResponse)
+async def _read_upload_text(file: UploadFile) -> Tuple[str, bytes]:
+    """
+    Read an uploaded file as UTF-8 text one chunk at a time, so the raw bytes are
+    never held in memory alongside the decoded string.
+    
+    Returns the text and a blake2b digest of the raw bytes, hashed as they stream
+    past so the text never has to be re-encoded for the parse cache key.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    content_hash = hashlib.blake2b(digest_size=16)
+    parts = []
+    total_size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        total_size += len(chunk)
+        if total_size > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum upload size is {settings.MAX_UPLOAD_SIZE} bytes"
+            )
+        content_hash.update(chunk)
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), content_hash.digest()
+
+# The response is assembled from models built here, so skip FastAPI's re-validation
+# of the whole nested structure on the way out and serialize it directly
+@router.post("/circuit", responses={200: {"model": CircuitUploadResponse}})
 async def upload_circuit_file(
+    http_request: Request,
     file: UploadFile = File(...),
-    description: Optional[str] = Form(None)
+    description: Optional[str] = Form(None),
+    images: str = Query("inline", pattern="^(inline|urls)$", description="Return PNGs inline as base64 or as /viz URLs")
 ):
     """
     Upload and process a quantum circuit file.
@@ -51,36 +141,39 @@ async def upload_circuit_file(
     - JSON circuit descriptions (.json)
     """
     try:
-        print(f"Processing uploaded circuit file: {file.filename}")
+        logger.info("Processing uploaded circuit file: %s", file.filename)
         
         # Validate file extension
-        _, file_extension = os.path.splitext(file.filename)
-        file_extension = file_extension.lower()
+        _, dot, file_extension = file.filename.rpartition('.')
+        file_extension = file_extension.lower() if dot else ''
         
-        if file_extension not in ALLOWED_EXTENSIONS:
+        if file_extension not in _ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Unsupported file format: {file_extension}. Supported formats are: {', '.join(ALLOWED_EXTENSIONS.keys())}"
+                detail=f"Unsupported file format: {dot}{file_extension}. Supported formats are: {', '.join('.' + ext for ext in _EXT_FORMAT)}"
             )
         
         # Read file content
-        file_content = await file.read()
-        file_content_str = file_content.decode('utf-8')
+        file_content_str, content_digest = await _read_upload_text(file)
         
         # Determine the file format
-        file_format = ALLOWED_EXTENSIONS[file_extension]
-        
-        # Use OpenAI to analyze and clean the circuit
-        openai_parser = OpenAICircuitParser(os.environ.get("OPENAI_API_KEY"))
+        file_format = _EXT_FORMAT[file_extension]
         
         # Process the circuit based on its format
         try:
-            print(f"Parsing {file_format} circuit file with OpenAI")
-            cleaned_content, circuit_metadata = openai_parser.parse_circuit_file(
-                file_content_str, 
-                file_format, 
-                description
-            )
+            # Well-formed QASM and exported JSON parse locally; only files qiskit can't
+            # read, or that use gates the builder doesn't know, go to OpenAI
+            local_parse = await run_in_cpu_pool(_LOCAL_PARSER.parse_circuit_file, file_content_str, file_format, description)
+            if local_parse is not None:
+                logger.debug("Parsed %s circuit file locally", file_format)
+                cleaned_content, circuit_metadata = local_parse
+            else:
+                cleaned_content, circuit_metadata = await _parse_with_openai(
+                    file_content_str, 
+                    content_digest, 
+                    file_format, 
+                    description
+                )
             
             # Create a CircuitIntent from the cleaned circuit
             intent_params = {
@@ -96,14 +189,13 @@ async def upload_circuit_file(
             intent = CircuitIntent(CircuitType.CUSTOM, intent_params)
             
         except Exception as e:
-            print(f"Error parsing circuit file: {str(e)}")
+            logger.warning("Error parsing circuit file: %s", e)
             raise HTTPException(status_code=422, detail=f"Failed to parse circuit file: {str(e)}")
         
-        print(f"Intent created: {intent.circuit_type} with params: {intent.params}")
+        logger.debug("Intent created: %s with params: %s", intent.circuit_type, intent.params)
         
         # Build the circuit
-        circuit_builder = CircuitBuilder()
-        circuit = circuit_builder.build_circuit(intent)
+        circuit = await _BUILDER.abuild_circuit(intent)
         
         # Initialize response objects with default values
         explanation = CircuitExplanation(
@@ -128,11 +220,34 @@ async def upload_circuit_file(
             ibmq_config=None
         )
         
-        # Generate enhanced explanation for the imported circuit
+        # The explanation, visualizations and exports are independent of each other, so
+        # produce them concurrently instead of one after another: the explanation awaits
+        # OpenAI on the event loop, while the rendering work runs on the CPU pool
+        logger.debug("Generating explanation for imported circuit")
+        (
+            explanation_dict,
+            circuit_image,
+            viz_bundle,
+            qiskit_code,
+            export_bundle,
+        ) = await asyncio.gather(
+            _CUSTOM_EXPLAINER.aexplain_circuit(intent),
+            run_in_cpu_pool(_VISUALIZER.generate_circuit_image, circuit),
+            run_in_cpu_pool(_VISUALIZER.render_all, circuit),
+            run_in_cpu_pool(_QISKIT_GEN.generate_code, circuit),
+            run_in_cpu_pool(_EXPORTER.generate_all, circuit),
+            return_exceptions=True,
+        )
+        if isinstance(export_bundle, Exception):
+            export_bundle = dict.fromkeys(("qasm_code", "json_code", "ibmq_config"), export_bundle)
+        qasm_code = export_bundle["qasm_code"]
+        json_code = export_bundle["json_code"]
+        ibmq_config = export_bundle["ibmq_config"]
+        
+        # Apply the enhanced explanation for the imported circuit
         try:
-            print("Generating explanation for imported circuit")
-            custom_explainer = CustomCircuitExplainer()
-            explanation_dict = custom_explainer.explain_circuit(intent)
+            if isinstance(explanation_dict, Exception):
+                raise explanation_dict
             
             # Convert explanation dict to model format
             explanation = CircuitExplanation(
@@ -147,9 +262,9 @@ async def upload_circuit_file(
                 educational_value=explanation_dict.get("educational_value", "Understanding imported quantum circuit behavior and gate operations."),
                 custom_description=circuit_metadata.get("description", "")
             )
-            print("Successfully generated explanation")
+            logger.debug("Successfully generated explanation")
         except Exception as e:
-            print(f"Error generating circuit explanation: {str(e)}")
+            logger.warning("Error generating circuit explanation: %s", e)
             # Fallback to simpler explanation
             explanation = CircuitExplanation(
                 title=f"Imported {file_format.upper()} Circuit",
@@ -163,55 +278,45 @@ async def upload_circuit_file(
                 educational_value="Understanding quantum circuit behavior from external sources."
             )
         
-        # Generate visualizations
-        try:
-            visualizer = CircuitVisualizer()
-            circuit_image = visualizer.generate_circuit_image(circuit)
+        # Apply visualization results
+        if isinstance(circuit_image, Exception):
+            logger.error("Error generating visualizations: %s", circuit_image, exc_info=circuit_image)
+        else:
             visualization.circuit_diagram = circuit_image
-            
-            try:
-                statevector_viz = visualizer.generate_statevector_visualization(circuit)
-                visualization.bloch_sphere = statevector_viz.get("bloch_sphere")
-                visualization.q_sphere = statevector_viz.get("q_sphere")
-            except Exception as e:
-                print(f"Error generating statevector visualization: {str(e)}")
-            
-            try:
-                measurement_histogram = visualizer.generate_measurement_histogram(circuit)
-                visualization.measurement_histogram = measurement_histogram
-            except Exception as e:
-                print(f"Error generating measurement histogram: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating visualizations: {str(e)}")
         
-        # Generate export formats
-        try:
-            export_generator = ExportGenerator()
-            qiskit_generator = QiskitGenerator()
-            
-            exports.qiskit_code = qiskit_generator.generate_code(circuit)
-            
-            try:
-                exports.qasm_code = export_generator.generate_qasm(circuit)
-            except Exception as e:
-                print(f"Error generating QASM: {str(e)}")
-                exports.qasm_code = "# Error generating QASM code"
-            
-            try:
-                exports.json_code = export_generator.generate_json(circuit)
-            except Exception as e:
-                print(f"Error generating JSON: {str(e)}")
-                exports.json_code = "{\"error\": \"Error generating JSON code\"}"
-            
-            try:
-                exports.ibmq_config = export_generator.generate_ibmq_job(circuit)
-            except Exception as e:
-                print(f"Error generating IBMQ config: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating exports: {str(e)}")
-            exports.qiskit_code = f"# Error generating Qiskit code: {str(e)}"
+        if isinstance(viz_bundle, Exception):
+            logger.error("Error generating state visualizations: %s", viz_bundle, exc_info=viz_bundle)
+        else:
+            visualization.bloch_sphere = viz_bundle["bloch_sphere"]
+            visualization.q_sphere = viz_bundle["q_sphere"]
+            visualization.measurement_histogram = viz_bundle["measurement_histogram"]
+        
+        if images == "urls":
+            store_image_urls(visualization, http_request)
+        
+        # Apply export results
+        if isinstance(qiskit_code, Exception):
+            logger.error("Error generating exports: %s", qiskit_code, exc_info=qiskit_code)
+            exports.qiskit_code = f"# Error generating Qiskit code: {str(qiskit_code)}"
+        else:
+            exports.qiskit_code = qiskit_code
+        
+        if isinstance(qasm_code, Exception):
+            logger.error("Error generating QASM: %s", qasm_code, exc_info=qasm_code)
+            exports.qasm_code = "# Error generating QASM code"
+        else:
+            exports.qasm_code = qasm_code
+        
+        if isinstance(json_code, Exception):
+            logger.error("Error generating JSON: %s", json_code, exc_info=json_code)
+            exports.json_code = "{\"error\": \"Error generating JSON code\"}"
+        else:
+            exports.json_code = json_code
+        
+        if isinstance(ibmq_config, Exception):
+            logger.error("Error generating IBMQ config: %s", ibmq_config, exc_info=ibmq_config)
+        else:
+            exports.ibmq_config = ibmq_config
         
         # Prepare the complete response
         response = CircuitUploadResponse(
@@ -229,12 +334,11 @@ async def upload_circuit_file(
         response.custom_gates = intent.params.get("custom_gates", [])
         response.custom_description = intent.params.get("custom_description", "")
         
-        return response
+        return ORJSONResponse(response.model_dump())
         
     except HTTPException as he:
         # Just re-raise HTTP exceptions
         raise he
     except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error processing circuit file: {str(e)}\n{error_details}")
+        logger.exception("Error processing circuit file: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process circuit file: {str(e)}")
\ No newline at end of file
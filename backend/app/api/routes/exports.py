@@ -1,10 +1,14 @@
 # app/api/routes/exports.py
-from fastapi import APIRouter, HTTPException, Query
+import functools
+import hashlib
+from typing import Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import Response
 from ..models.response_models import CircuitResponse
 from ...core.circuit_builder.builder import CircuitBuilder
 from ...core.nlp_processor.intent_parser import CircuitIntent, CircuitType
 from ...core.output_generator.export_generator import ExportGenerator
+from ...core.cpu_pool import run_in_cpu_pool
 
 router = APIRouter(
     prefix="/exports",
@@ -12,45 +16,57 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# The circuit collaborators hold no per-request state, so share one instance of each
+_BUILDER = CircuitBuilder()
+_EXPORTER = ExportGenerator()
+_CTYPE_MAP = {ct.value: ct for ct in CircuitType}
+
+@functools.lru_cache(maxsize=256)
+def _build_notebook(circuit_type: str, num_qubits: int) -> Tuple[bytes, str]:
+    """Build the notebook for a circuit, returning its bytes and ETag."""
+    # Parse the circuit type, treating unknown types as custom
+    circuit_type_enum = _CTYPE_MAP.get(circuit_type, CircuitType.CUSTOM)
+    
+    # Build the circuit
+    if circuit_type_enum == CircuitType.CUSTOM:
+        circuit = _BUILDER.build_circuit(CircuitIntent(circuit_type_enum, {"num_qubits": num_qubits}))
+    else:
+        circuit = _BUILDER.build_template_circuit(circuit_type_enum, num_qubits)
+    
+    # Generate Jupyter Notebook
+    jupyter_notebook = _EXPORTER.generate_jupyter_notebook(
+        circuit, 
+        circuit_type,
+        f"A {circuit_type.replace('_', ' ')} quantum circuit with {num_qubits} qubits"
+    ).encode("utf-8")
+    etag = f'"{hashlib.blake2b(jupyter_notebook, digest_size=16).hexdigest()}"'
+    return jupyter_notebook, etag
+
 @router.get("/jupyter", response_class=Response)
 async def get_jupyter_notebook(
+    http_request: Request,
     circuit_type: str = Query(..., description="Type of the circuit"),
     num_qubits: int = Query(2, description="Number of qubits in the circuit", ge=1, le=10)
 ):
     """Generate and download a Jupyter Notebook for the specified circuit."""
     try:
-        # Create the circuit builder
-        circuit_builder = CircuitBuilder()
-        
-        # Parse the circuit type
-        try:
-            circuit_type_enum = CircuitType(circuit_type)
-        except ValueError:
-            circuit_type_enum = CircuitType.CUSTOM
-        
-        # Create circuit intent
-        intent = CircuitIntent(circuit_type_enum, {"num_qubits": num_qubits})
+        # The inputs come from a small finite domain, so notebooks are built once per pair,
+        # off the event loop
+        jupyter_notebook, etag = await run_in_cpu_pool(_build_notebook, circuit_type, num_qubits)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=86400",
+            "Content-Disposition": f"attachment; filename=quantum_circuit_{circuit_type}.ipynb"
+        }
         
-        # Build the circuit
-        circuit = circuit_builder.build_circuit(intent)
-        
-        # Create export generator
-        export_generator = ExportGenerator()
-        
-        # Generate Jupyter Notebook
-        jupyter_notebook = export_generator.generate_jupyter_notebook(
-            circuit, 
-            circuit_type,
-            f"A {circuit_type.replace('_', ' ')} quantum circuit with {num_qubits} qubits"
-        )
+        if http_request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
         
         # Return as a downloadable file
         return Response(
             content=jupyter_notebook,
             media_type="application/x-ipynb+json",
-            headers={
-                "Content-Disposition": f"attachment; filename=quantum_circuit_{circuit_type}.ipynb"
-            }
+            headers=headers
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate Jupyter Notebook: {str(e)}")
\ No newline at end of file
@@ -1,6 +1,14 @@
 # app/api/routes/image_input.py
-import traceback
-from fastapi import APIRouter, HTTPException, UploadFile, File
+import logging
+import asyncio
+import copy
+import hashlib
+import functools
+import os
+from collections import OrderedDict
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import ORJSONResponse
 from ..models.response_models import CircuitResponse, CircuitExplanation, CircuitVisualization, CircuitExports, GateExplanation
 from ...core.nlp_processor.intent_parser import CircuitIntent, CircuitType
 from ...core.circuit_builder.builder import CircuitBuilder
@@ -10,39 +18,102 @@ from ...core.output_generator.export_generator import ExportGenerator
 from ...core.explanation_generator.circuit_explainer import CircuitExplainer
 from ...core.explanation_generator.custom_circuit_explainer import CustomCircuitExplainer
 from ...core.nlp_processor.vision_parser import VisionCircuitParser
+from ...core.lru_cache import lru_get, lru_put
+from ...core.cpu_pool import run_in_cpu_pool
+from ...config import settings
+from .visualizations import store_image_urls
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/image",
     tags=["image-input"],
     responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse,
 )
 
-@router.post("/generate", response_model=CircuitResponse)
-async def generate_from_image(file: UploadFile = File(...)):
+# The circuit collaborators hold no per-request state, so share one instance of each
+_BUILDER = CircuitBuilder()
+_CIRCUIT_EXPLAINER = CircuitExplainer()
+_VISUALIZER = CircuitVisualizer()
+_EXPORTER = ExportGenerator()
+_QISKIT_GEN = QiskitGenerator()
+
+@functools.lru_cache(maxsize=None)
+def _get_vision_parser(api_key: Optional[str]) -> VisionCircuitParser:
+    """Return a shared parser per API key so its OpenAI connection pool is reused."""
+    return VisionCircuitParser(api_key)
+
+# Vision parses of uploaded images, keyed by a hash of the image bytes
+_PARSE_CACHE: "OrderedDict[str, CircuitIntent]" = OrderedDict()
+
+def _parse_cache_key(contents: bytes, content_type: Optional[str]) -> str:
+    """Build the content-addressed key for an image parse."""
+    digest = hashlib.blake2b(contents, digest_size=16)
+    digest.update(f"\0{content_type}\0{VisionCircuitParser.DEFAULT_MODEL}".encode("utf-8"))
+    return digest.hexdigest()
+
+# Uploads are read in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def _read_upload_bytes(file: UploadFile) -> bytes:
+    """Read an uploaded file, rejecting it with 413 once it exceeds MAX_UPLOAD_SIZE."""
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum upload size is {settings.MAX_UPLOAD_SIZE} bytes"
+            )
+    return bytes(buffer)
+
+# The response is assembled from models built here, so skip FastAPI's re-validation
+# of the whole nested structure on the way out and serialize it directly
+@router.post("/generate", responses={200: {"model": CircuitResponse}})
+async def generate_from_image(
+    http_request: Request,
+    file: UploadFile = File(...),
+    images: str = Query("inline", pattern="^(inline|urls)$", description="Return PNGs inline as base64 or as /viz URLs")
+):
     try:
-        print(f"Processing image file: {file.filename}")
+        logger.info("Processing image file: %s", file.filename)
         
-        # Read file content
-        contents = await file.read()
+        # Read file content, enforcing the size limit for uploads without a Content-Length
+        contents = await _read_upload_bytes(file)
         
-        # Process the image with GPT Vision
-        try:
-            vision_parser = VisionCircuitParser()
-            intent = await vision_parser.parse_image(contents, file.content_type)
-        except HTTPException as he:
-            # Pass through HTTPExceptions from the parser
-            raise he
+        # Process the image with GPT Vision, reusing the result for images seen before
+        parse_key = _parse_cache_key(contents, file.content_type)
+        cached_intent = lru_get(_PARSE_CACHE, parse_key)
+        if cached_intent is not None:
+            logger.debug("Using cached vision parse for image")
+            intent = copy.deepcopy(cached_intent)
+        else:
+            try:
+                vision_parser = _get_vision_parser(os.environ.get("OPENAI_API_KEY"))
+                intent = await vision_parser.parse_image(contents, file.content_type)
+            except HTTPException as he:
+                # Pass through HTTPExceptions from the parser
+                raise he
+            lru_put(_PARSE_CACHE, parse_key, copy.deepcopy(intent), settings.OPENAI_PARSE_CACHE_SIZE)
         
-        print(f"Intent detected: {intent.circuit_type} with params: {intent.params}")
+        # The image bytes aren't needed past parsing; drop them before the render stages
+        del contents
+        
+        logger.debug("Intent detected: %s with params: %s", intent.circuit_type, intent.params)
         
         # Build the circuit
-        circuit_builder = CircuitBuilder()
-        circuit = circuit_builder.build_circuit(intent)
+        if intent.circuit_type != CircuitType.CUSTOM and isinstance(intent.params.get("num_qubits"), int) \
+                and intent.params.keys() == {"num_qubits"}:
+            # Plain template intents only depend on their type and size, so reuse earlier builds
+            circuit = await run_in_cpu_pool(_BUILDER.build_template_circuit, intent.circuit_type, intent.params["num_qubits"])
+        else:
+            circuit = await _BUILDER.abuild_circuit(intent)
         
         # *** KEY FIX: Check if the vision parser provided an explanation ***
         # Get the explanation from the parser if it exists, otherwise create a default one
         if hasattr(intent, "explanation") and intent.explanation:
-            print("Using explanation from vision parser!")
+            logger.debug("Using explanation from vision parser")
             explanation_dict = intent.explanation
             
             # Convert explanation dict to model format
@@ -75,8 +146,7 @@ async def generate_from_image(file: UploadFile = File(...)):
             else:
                 # Try to generate explanations for known circuit types including QFT
                 try:
-                    circuit_explainer = CircuitExplainer()
-                    explanation_dict = circuit_explainer.generate_explanation(intent, circuit)
+                    explanation_dict = await _CIRCUIT_EXPLAINER.agenerate_explanation(intent, circuit)
                     
                     # Convert explanation dict to model format
                     explanation = CircuitExplanation(
@@ -92,7 +162,7 @@ async def generate_from_image(file: UploadFile = File(...)):
                         error=explanation_dict.get("error", None)
                     )
                 except Exception as e:
-                    print(f"Error generating explanation: {str(e)}")
+                    logger.warning("Error generating explanation: %s", e)
                     explanation.error = f"Error generating explanation: {str(e)}"
         
         visualization = CircuitVisualization(
@@ -118,55 +188,65 @@ async def generate_from_image(file: UploadFile = File(...)):
             custom_gates = intent.params.get("custom_gates", [])
             custom_description = intent.params.get("custom_description", "Custom quantum circuit")
         
-        # Generate visualizations
-        try:
-            visualizer = CircuitVisualizer()
-            circuit_image = visualizer.generate_circuit_image(circuit)
+        # Visualizations and exports only read the circuit, so render them concurrently
+        # on the CPU pool instead of blocking the event loop one after another
+        (
+            circuit_image,
+            viz_bundle,
+            qiskit_code,
+            export_bundle,
+        ) = await asyncio.gather(
+            run_in_cpu_pool(_VISUALIZER.generate_circuit_image, circuit),
+            run_in_cpu_pool(_VISUALIZER.render_all, circuit),
+            run_in_cpu_pool(_QISKIT_GEN.generate_code, circuit),
+            run_in_cpu_pool(_EXPORTER.generate_all, circuit),
+            return_exceptions=True,
+        )
+        if isinstance(export_bundle, Exception):
+            export_bundle = dict.fromkeys(("qasm_code", "json_code", "ibmq_config"), export_bundle)
+        qasm_code = export_bundle["qasm_code"]
+        json_code = export_bundle["json_code"]
+        ibmq_config = export_bundle["ibmq_config"]
+        
+        # Apply visualization results
+        if isinstance(circuit_image, Exception):
+            logger.error("Error generating visualizations: %s", circuit_image, exc_info=circuit_image)
+        else:
             visualization.circuit_diagram = circuit_image
-            
-            try:
-                statevector_viz = visualizer.generate_statevector_visualization(circuit)
-                visualization.bloch_sphere = statevector_viz.get("bloch_sphere")
-                visualization.q_sphere = statevector_viz.get("q_sphere")
-            except Exception as e:
-                print(f"Error generating statevector visualization: {str(e)}")
-            
-            try:
-                measurement_histogram = visualizer.generate_measurement_histogram(circuit)
-                visualization.measurement_histogram = measurement_histogram
-            except Exception as e:
-                print(f"Error generating measurement histogram: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating visualizations: {str(e)}")
-        
-        # Generate export formats
-        try:
-            export_generator = ExportGenerator()
-            qiskit_generator = QiskitGenerator()
-            
-            exports.qiskit_code = qiskit_generator.generate_code(circuit)
-            
-            try:
-                exports.qasm_code = export_generator.generate_qasm(circuit)
-            except Exception as e:
-                print(f"Error generating QASM: {str(e)}")
-                exports.qasm_code = "# Error generating QASM code"
-            
-            try:
-                exports.json_code = export_generator.generate_json(circuit)
-            except Exception as e:
-                print(f"Error generating JSON: {str(e)}")
-                exports.json_code = "{\"error\": \"Error generating JSON code\"}"
-            
-            try:
-                exports.ibmq_config = export_generator.generate_ibmq_job(circuit)
-            except Exception as e:
-                print(f"Error generating IBMQ config: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating exports: {str(e)}")
-            exports.qiskit_code = f"# Error generating Qiskit code: {str(e)}"
+        
+        if isinstance(viz_bundle, Exception):
+            logger.error("Error generating state visualizations: %s", viz_bundle, exc_info=viz_bundle)
+        else:
+            visualization.bloch_sphere = viz_bundle["bloch_sphere"]
+            visualization.q_sphere = viz_bundle["q_sphere"]
+            visualization.measurement_histogram = viz_bundle["measurement_histogram"]
+        
+        if images == "urls":
+            store_image_urls(visualization, http_request)
+        
+        # Apply export results
+        if isinstance(qiskit_code, Exception):
+            logger.error("Error generating exports: %s", qiskit_code, exc_info=qiskit_code)
+            exports.qiskit_code = f"# Error generating Qiskit code: {str(qiskit_code)}"
+        else:
+            exports.qiskit_code = qiskit_code
+        
+        if isinstance(qasm_code, Exception):
+            logger.error("Error generating QASM: %s", qasm_code, exc_info=qasm_code)
+            exports.qasm_code = "# Error generating QASM code"
+        else:
+            exports.qasm_code = qasm_code
+        
+        if isinstance(json_code, Exception):
+            logger.error("Error generating JSON: %s", json_code, exc_info=json_code)
+            exports.json_code = "{\"error\": \"Error generating JSON code\"}"
+        else:
+            exports.json_code = json_code
+        
+        if isinstance(ibmq_config, Exception):
+            logger.error("Error generating IBMQ config: %s", ibmq_config, exc_info=ibmq_config)
+        else:
+            exports.ibmq_config = ibmq_config
         
         # Prepare the complete response - ensure all required fields are present
         response = CircuitResponse(
@@ -183,15 +263,17 @@ async def generate_from_image(file: UploadFile = File(...)):
             response.custom_description = custom_description
         
         # Debug output
-        print(f"Response prepared: {response.circuit_type} with {response.num_qubits} qubits")
-        print(f"Explanation in response: {explanation.title} - Gates: {len(explanation.gates)} - Applications: {len(explanation.applications)}")
+        logger.debug("Response prepared: %s with %d qubits", response.circuit_type, response.num_qubits)
+        logger.debug(
+            "Explanation in response: %s - Gates: %d - Applications: %d",
+            explanation.title, len(explanation.gates), len(explanation.applications)
+        )
         
-        return response
+        return ORJSONResponse(response.model_dump())
         
     except HTTPException as he:
         # Just re-raise HTTP exceptions
         raise he
     except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error processing image request: {str(e)}\n{error_details}")
+        logger.exception("Error processing image request: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process image: {str(e)}")
\ No newline at end of file
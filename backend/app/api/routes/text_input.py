@@ -1,36 +1,145 @@
 # app/api/routes/text_input.py (updated)
-import traceback
+import logging
+import asyncio
+import functools
+import hashlib
 import math
 import re
-from fastapi import APIRouter, HTTPException, Depends
-from ..models.request_models import TextInputRequest
+from collections import OrderedDict
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import ValidationError
+from ..models.request_models import TextInputRequest, TEXT_INPUT_REQUEST_ADAPTER
 from ..models.response_models import CircuitResponse, CircuitExplanation, CircuitVisualization, CircuitExports, GateExplanation
 from ...core.nlp_processor.intent_parser import SimpleIntentParser, CircuitType, CircuitIntent
 from ...core.nlp_processor.openai_parser import OpenAICircuitParser
+from ...core.nlp_processor.parse_batcher import IntentParseBatcher
 from ...core.circuit_builder.builder import CircuitBuilder
 from ...core.output_generator.qiskit_generator import QiskitGenerator
 from ...core.output_generator.visualizer import CircuitVisualizer
 from ...core.output_generator.export_generator import ExportGenerator
 from ...core.explanation_generator.circuit_explainer import CircuitExplainer
 from ...core.explanation_generator.custom_circuit_explainer import CustomCircuitExplainer
+from ...core.cpu_pool import run_in_cpu_pool
+from ...core.lru_cache import ttl_get, ttl_put_bytes
+from ...core.stage_timer import StageTimer
+from ...config import settings
 import os
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/text",
     tags=["text-input"],
     responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse,
 )
 
+# The circuit collaborators hold no per-request state, so share one instance of each
+_BUILDER = CircuitBuilder()
+_CIRCUIT_EXPLAINER = CircuitExplainer()
+_CUSTOM_EXPLAINER = CustomCircuitExplainer()
+_VISUALIZER = CircuitVisualizer()
+_EXPORTER = ExportGenerator()
+_QISKIT_GEN = QiskitGenerator()
+_SIMPLE_PARSER = SimpleIntentParser()
+
+@functools.lru_cache(maxsize=None)
+def _get_openai_parser(api_key: str) -> OpenAICircuitParser:
+    """Return a shared parser per API key so its OpenAI connection pool is reused."""
+    return OpenAICircuitParser(api_key)
+
+@functools.lru_cache(maxsize=None)
+def _get_parse_batcher(parser: OpenAICircuitParser) -> IntentParseBatcher:
+    """Return the batcher that coalesces concurrent parses for a shared parser."""
+    return IntentParseBatcher(parser)
+
 def get_intent_parser():
     """Factory function to get the appropriate intent parser."""
     api_key = os.environ.get("OPENAI_API_KEY")
     if api_key:
         try:
-            return OpenAICircuitParser(api_key)
+            return _get_openai_parser(api_key)
         except:
-            return SimpleIntentParser()
+            return _SIMPLE_PARSER
     else:
-        return SimpleIntentParser()
+        return _SIMPLE_PARSER
+
+# Serialized /generate responses keyed by normalized prompt, expiring after TEXT_RESPONSE_CACHE_TTL.
+# Bounded by total size, since the inline base64 PNGs make each one tens to hundreds of KB.
+_RESP_CACHE: "OrderedDict[bytes, bytes]" = OrderedDict()
+
+def _response_cache_key(text: str) -> bytes:
+    """Build a cache key from the normalized request text and the parser that will handle it."""
+    normalized = " ".join(text.lower().split())
+    parser = "openai" if os.environ.get("OPENAI_API_KEY") else "simple"
+    return hashlib.blake2b(f"{parser}\0{normalized}".encode("utf-8"), digest_size=16).digest()
+
+# The specific 2-qubit RX(π/2), RY(π/4), CNOT request, in either gate order
+_RX_RY_CNOT_RE = re.compile(r'2.?qubit.*rx.*pi/2.*ry.*pi/4.*cnot|2.?qubit.*rx.*pi/2.*cnot.*ry.*pi/4')
+
+# The intent answered for that request
+_RX_RY_CNOT_GATES = (
+    f"rx 0 {math.pi/2}",  # RX(π/2) on qubit 0
+    f"ry 1 {math.pi/4}",  # RY(π/4) on qubit 1
+    "cx 0 1",              # CNOT with qubit 0 controlling qubit 1
+)
+_RX_RY_CNOT_PARAMS = {
+    "num_qubits": 2,
+    "custom_description": "Custom 2-qubit circuit with RX(π/2), RY(π/4), and CNOT gates",
+}
+
+# Prompts that only name a template circuit, optionally with a qubit count, e.g. "bell state",
+# "create a 4-qubit ghz state" or "qft on 5 qubits". Anything more specific falls through
+# to the intent parser.
+_FASTPATH_TEMPLATES = (
+    (r"bell(?: state| pair)?", CircuitType.BELL_STATE),
+    (r"ghz(?: state)?", CircuitType.GHZ_STATE),
+    (r"w[- ]state", CircuitType.W_STATE),
+    (r"(?:quantum )?teleportation", CircuitType.TELEPORTATION),
+    (r"superdense coding", CircuitType.SUPERDENSE_CODING),
+    (r"deutsch[- ]jozsa", CircuitType.DEUTSCH_JOZSA),
+    (r"bernstein[- ]vazirani", CircuitType.BERNSTEIN_VAZIRANI),
+    (r"simon'?s?", CircuitType.SIMON),
+    (r"qft|(?:quantum )?fourier transform", CircuitType.QFT),
+    (r"qpe|(?:quantum )?phase estimation", CircuitType.QPE),
+    (r"grover'?s?(?: search)?", CircuitType.GROVERS),
+)
+_FASTPATH_RULES = [
+    (
+        re.compile(
+            r"(?:please )?(?:(?:create|make|build|generate|show|give)(?: me)? )?(?:an? |the )?"
+            r"(?:(?P<n1>\d+)[- ]?qubits? )?(?:" + core + r")(?: circuit| algorithm| protocol)?"
+            r"(?: (?:with|on|using|of|for) (?P<n2>\d+) qubits?)?(?: please)?[.!]?"
+        ),
+        circuit_type,
+    )
+    for core, circuit_type in _FASTPATH_TEMPLATES
+]
+
+# Fewest qubits each fast-path template can be built with (1 if not listed). Requests
+# for fewer fall through to the intent parser instead of failing in the template.
+_FASTPATH_MIN_QUBITS = {
+    CircuitType.BELL_STATE: 2,
+    CircuitType.GHZ_STATE: 3,
+    CircuitType.TELEPORTATION: 3,
+    CircuitType.SUPERDENSE_CODING: 2,
+}
+
+def _match_template_request(text_lower: str) -> Optional[CircuitIntent]:
+    """Resolve a bare template request locally, without the intent parser or OpenAI."""
+    normalized = " ".join(text_lower.split())
+    for pattern, circuit_type in _FASTPATH_RULES:
+        match = pattern.fullmatch(normalized)
+        if match:
+            num_qubits = match.group("n1") or match.group("n2")
+            if num_qubits and int(num_qubits) < _FASTPATH_MIN_QUBITS.get(circuit_type, 1):
+                return None
+            params = {"num_qubits": min(int(num_qubits), 10)} if num_qubits else {}
+            return CircuitIntent(circuit_type, params)
+    return None
 
 def check_specific_circuit_requests(text: str) -> CircuitIntent:
     """Check for specific circuit requests that may need direct handling."""
@@ -38,77 +147,77 @@ def check_specific_circuit_requests(text: str) -> CircuitIntent:
     text_lower = text.lower()
     
     # Check for the specific 2-qubit RX(π/2), RY(π/4), CNOT request
-    rx_ry_cnot_pattern = re.compile(r'2.?qubit.*rx.*pi/2.*ry.*pi/4.*cnot|2.?qubit.*rx.*pi/2.*cnot.*ry.*pi/4')
-    
-    if rx_ry_cnot_pattern.search(text_lower) or (
+    if _RX_RY_CNOT_RE.search(text_lower) or (
         'rx' in text_lower and 'ry' in text_lower and 'cnot' in text_lower and 
         ('π/2' in text_lower or 'pi/2' in text_lower) and 
         ('π/4' in text_lower or 'pi/4' in text_lower)):
         
-        print("Detected specific RX(π/2), RY(π/4), CNOT circuit request - using direct handling")
-        
-        # Create a custom circuit intent with the precise gate sequence
-        custom_gates = [
-            f"rx 0 {math.pi/2}",  # RX(π/2) on qubit 0
-            f"ry 1 {math.pi/4}",  # RY(π/4) on qubit 1
-            "cx 0 1"               # CNOT with qubit 0 controlling qubit 1
-        ]
-        
-        params = {
-            "num_qubits": 2,
-            "custom_description": "Custom 2-qubit circuit with RX(π/2), RY(π/4), and CNOT gates",
-            "custom_gates": custom_gates
-        }
+        logger.debug("Detected specific RX(π/2), RY(π/4), CNOT circuit request - using direct handling")
         
+        # Fresh params and gate list per request, since downstream code may modify them
+        params = dict(_RX_RY_CNOT_PARAMS, custom_gates=list(_RX_RY_CNOT_GATES))
         return CircuitIntent(CircuitType.CUSTOM, params)
     
-    # Add more specific circuit patterns here if needed
+    # Bare template requests like "3 qubit ghz state"
+    template_intent = _match_template_request(text_lower)
+    if template_intent is not None:
+        return template_intent
     
     # No direct match, return None to continue with normal parsing
     return None
 
-@router.post("/generate", response_model=CircuitResponse)
-async def generate_from_text(request: TextInputRequest):
+async def _read_text_request(http_request: Request) -> TextInputRequest:
+    """Validate the JSON body in one pydantic-core pass, reporting errors like FastAPI does."""
+    try:
+        return TEXT_INPUT_REQUEST_ADAPTER.validate_json(await http_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+# The response is assembled from models built here, so skip FastAPI's re-validation
+# of the whole nested structure on the way out and serialize it directly. The body is
+# read by _read_text_request, so its schema is declared here for the OpenAPI docs.
+@router.post(
+    "/generate",
+    responses={200: {"model": CircuitResponse}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": TextInputRequest.model_json_schema()}},
+        }
+    },
+)
+async def generate_from_text(request: TextInputRequest = Depends(_read_text_request)):
     try:
-        print(f"Processing text request: {request.text}")
+        logger.info("Processing text request: %s", request.text)
+        timer = StageTimer("text.generate")
         
-        # First check for specific circuit patterns
-        intent = check_specific_circuit_requests(request.text)
+        # Repeated prompts skip parsing, OpenAI and rendering entirely
+        cache_key = _response_cache_key(request.text)
+        cached_body = ttl_get(_RESP_CACHE, cache_key)
+        if cached_body is not None:
+            timer.log(cached=True)
+            return Response(content=cached_body, media_type="application/json")
         
-        # If no specific pattern matched, proceed with normal parsing
-        if intent is None:
-            # Parse the intent
-            intent_parser = get_intent_parser()
-            intent = intent_parser.parse(request.text)
+        with timer.stage("intent_parse"):
+            # First check for specific circuit patterns
+            intent = check_specific_circuit_requests(request.text)
+            
+            # If no specific pattern matched, proceed with normal parsing
+            if intent is None:
+                # Parse the intent without blocking the event loop on OpenAI or the regex parser
+                intent_parser = get_intent_parser()
+                if isinstance(intent_parser, OpenAICircuitParser):
+                    intent = await _get_parse_batcher(intent_parser).parse(request.text)
+                else:
+                    intent = await run_in_cpu_pool(intent_parser.parse, request.text)
         
-        print(f"Intent detected: {intent.circuit_type} with params: {intent.params}")
+        logger.debug("Intent detected: %s with params: %s", intent.circuit_type, intent.params)
         
         # Build the circuit
-        circuit_builder = CircuitBuilder()
-        circuit = circuit_builder.build_circuit(intent)
-        
-        # Initialize response objects with default values
-        explanation = CircuitExplanation(
-            title=f"{intent.circuit_type.value.replace('_', ' ').title()} Circuit",
-            summary="A quantum circuit implementation.",
-            gates=[],
-            applications=[],
-            educational_value="Understanding quantum computing principles."
-        )
-        
-        visualization = CircuitVisualization(
-            circuit_diagram="",
-            bloch_sphere=None,
-            q_sphere=None,
-            measurement_histogram=None
-        )
-        
-        exports = CircuitExports(
-            qiskit_code="",
-            qasm_code="",
-            json_code="",
-            ibmq_config=None
-        )
+        with timer.stage("circuit_build"):
+            circuit = await _BUILDER.abuild_circuit(intent)
         
         # For custom circuits, handle explanation differently
         custom_gates = None
@@ -119,10 +228,37 @@ async def generate_from_text(request: TextInputRequest):
             custom_description = intent.params.get("custom_description", "Custom quantum circuit")
             
             # Generate enhanced explanation for custom circuits using dedicated explainer
+            logger.debug("Generating enhanced explanation for custom circuit")
+            explanation_task = _CUSTOM_EXPLAINER.aexplain_circuit(intent)
+        else:
+            # Try to generate explanations for known circuit types
+            explanation_task = _CIRCUIT_EXPLAINER.agenerate_explanation(intent, circuit)
+        
+        # The explanation, visualizations and exports are independent of each other, so
+        # produce them concurrently instead of one after another: the explanation awaits
+        # OpenAI on the event loop, while the rendering work runs on the CPU pool
+        (
+            explanation_dict,
+            circuit_image,
+            viz_bundle,
+            qiskit_code,
+            export_bundle,
+        ) = await asyncio.gather(
+            timer.timed("explain", explanation_task),
+            timer.timed("circuit_diagram", run_in_cpu_pool(_VISUALIZER.generate_circuit_image, circuit)),
+            timer.timed("visualize", run_in_cpu_pool(_VISUALIZER.render_all, circuit)),
+            timer.timed("qiskit_code", run_in_cpu_pool(_QISKIT_GEN.generate_code, circuit)),
+            timer.timed("export", run_in_cpu_pool(_EXPORTER.generate_all, circuit)),
+            return_exceptions=True,
+        )
+        if isinstance(export_bundle, Exception):
+            export_bundle = dict.fromkeys(("qasm_code", "json_code", "ibmq_config"), export_bundle)
+        
+        # Apply the explanation
+        if intent.circuit_type == CircuitType.CUSTOM:
             try:
-                print("Generating enhanced explanation for custom circuit")
-                custom_explainer = CustomCircuitExplainer()
-                explanation_dict = custom_explainer.explain_circuit(intent)
+                if isinstance(explanation_dict, Exception):
+                    raise explanation_dict
                 
                 # Convert explanation dict to model format
                 explanation = CircuitExplanation(
@@ -135,11 +271,12 @@ async def generate_from_text(request: TextInputRequest):
                     ) for g in explanation_dict.get("gates", [])],
                     applications=explanation_dict.get("applications", ["Custom quantum algorithm implementation", "Quantum circuit experimentation"]),
                     educational_value=explanation_dict.get("educational_value", "Understanding custom quantum circuit behavior and gate operations."),
+                    error=explanation_dict.get("error", None),
                     custom_description=custom_description
                 )
-                print("Successfully generated enhanced explanation")
+                logger.debug("Successfully generated enhanced explanation")
             except Exception as e:
-                print(f"Error generating custom circuit explanation: {str(e)}")
+                logger.warning("Error generating custom circuit explanation: %s", e)
                 # Fallback to simpler explanation
                 explanation = CircuitExplanation(
                     title="Custom Quantum Circuit",
@@ -151,13 +288,13 @@ async def generate_from_text(request: TextInputRequest):
                     ) for gate in custom_gates],
                     applications=["Custom quantum algorithm implementation", "Quantum circuit experimentation"],
                     educational_value="Understanding custom quantum circuit behavior and gate operations.",
+                    error=f"Error generating explanation: {str(e)}",
                     custom_description=custom_description
                 )
         else:
-            # Try to generate explanations for known circuit types
             try:
-                circuit_explainer = CircuitExplainer()
-                explanation_dict = circuit_explainer.generate_explanation(intent, circuit)
+                if isinstance(explanation_dict, Exception):
+                    raise explanation_dict
                 
                 # Convert explanation dict to model format
                 explanation = CircuitExplanation(
@@ -173,76 +310,74 @@ async def generate_from_text(request: TextInputRequest):
                     error=explanation_dict.get("error", None)
                 )
             except Exception as e:
-                print(f"Error generating explanation: {str(e)}")
-                explanation.error = f"Error generating explanation: {str(e)}"
+                logger.warning("Error generating explanation: %s", e)
+                explanation = CircuitExplanation(
+                    title=f"{intent.circuit_type.value.replace('_', ' ').title()} Circuit",
+                    summary="A quantum circuit implementation.",
+                    gates=[],
+                    applications=[],
+                    educational_value="Understanding quantum computing principles.",
+                    error=f"Error generating explanation: {str(e)}"
+                )
         
-        # Try to generate visualizations
-        try:
-            visualizer = CircuitVisualizer()
-            circuit_image = visualizer.generate_circuit_image(circuit)
-            visualization.circuit_diagram = circuit_image
-            
-            try:
-                statevector_viz = visualizer.generate_statevector_visualization(circuit)
-                visualization.bloch_sphere = statevector_viz.get("bloch_sphere")
-                visualization.q_sphere = statevector_viz.get("q_sphere")
-            except Exception as e:
-                print(f"Error generating statevector visualization: {str(e)}")
-            
-            try:
-                measurement_histogram = visualizer.generate_measurement_histogram(circuit)
-                visualization.measurement_histogram = measurement_histogram
-            except Exception as e:
-                print(f"Error generating measurement histogram: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating visualizations: {str(e)}")
+        # Apply visualization results
+        if isinstance(circuit_image, Exception):
+            logger.error("Error generating visualizations: %s", circuit_image, exc_info=circuit_image)
+            circuit_image = ""
         
-        # Try to generate export formats
-        try:
-            export_generator = ExportGenerator()
-            qiskit_generator = QiskitGenerator()
-            
-            exports.qiskit_code = qiskit_generator.generate_code(circuit)
-            
-            try:
-                exports.qasm_code = export_generator.generate_qasm(circuit)
-            except Exception as e:
-                print(f"Error generating QASM: {str(e)}")
-                exports.qasm_code = "# Error generating QASM code"
-            
-            try:
-                exports.json_code = export_generator.generate_json(circuit)
-            except Exception as e:
-                print(f"Error generating JSON: {str(e)}")
-                exports.json_code = "{\"error\": \"Error generating JSON code\"}"
-            
-            try:
-                exports.ibmq_config = export_generator.generate_ibmq_job(circuit)
-            except Exception as e:
-                print(f"Error generating IBMQ config: {str(e)}")
-                
-        except Exception as e:
-            print(f"Error generating exports: {str(e)}")
-            exports.qiskit_code = f"# Error generating Qiskit code: {str(e)}"
+        if isinstance(viz_bundle, Exception):
+            logger.error("Error generating state visualizations: %s", viz_bundle, exc_info=viz_bundle)
+            viz_bundle = dict.fromkeys(("bloch_sphere", "q_sphere", "measurement_histogram"))
+        
+        # Apply export results
+        if isinstance(qiskit_code, Exception):
+            logger.error("Error generating exports: %s", qiskit_code, exc_info=qiskit_code)
+            qiskit_code = f"# Error generating Qiskit code: {str(qiskit_code)}"
+        
+        qasm_code = export_bundle["qasm_code"]
+        if isinstance(qasm_code, Exception):
+            logger.error("Error generating QASM: %s", qasm_code, exc_info=qasm_code)
+            qasm_code = "# Error generating QASM code"
         
-        # Prepare the complete response
-        response = CircuitResponse(
+        json_code = export_bundle["json_code"]
+        if isinstance(json_code, Exception):
+            logger.error("Error generating JSON: %s", json_code, exc_info=json_code)
+            json_code = "{\"error\": \"Error generating JSON code\"}"
+        
+        ibmq_config = export_bundle["ibmq_config"]
+        if isinstance(ibmq_config, Exception):
+            logger.error("Error generating IBMQ config: %s", ibmq_config, exc_info=ibmq_config)
+            ibmq_config = None
+        
+        # Every field below is a string (or None) produced by our own generators, and the
+        # explanation was validated above, so assemble the response without re-validating
+        response = CircuitResponse.model_construct(
             circuit_type=intent.circuit_type.value,
             num_qubits=circuit.num_qubits,
             explanation=explanation,
-            visualization=visualization,
-            exports=exports,
+            visualization=CircuitVisualization.model_construct(
+                circuit_diagram=circuit_image,
+                **viz_bundle,
+            ),
+            exports=CircuitExports.model_construct(
+                qiskit_code=qiskit_code,
+                qasm_code=qasm_code,
+                json_code=json_code,
+                ibmq_config=ibmq_config,
+            ),
+            custom_gates=custom_gates,
+            custom_description=custom_description,
         )
         
-        # Add custom circuit information if applicable
-        if intent.circuit_type == CircuitType.CUSTOM:
-            response.custom_gates = custom_gates
-            response.custom_description = custom_description
+        # Cache the serialized body so hits are replayed as is,
+        # but don't pin a degraded explanation
+        json_response = ORJSONResponse(response.model_dump())
+        if explanation.error is None:
+            ttl_put_bytes(_RESP_CACHE, cache_key, json_response.body, settings.TEXT_RESPONSE_CACHE_BYTES, settings.TEXT_RESPONSE_CACHE_TTL)
         
-        return response
+        timer.log(cached=False, circuit_type=intent.circuit_type.value)
+        return json_response
         
     except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error processing request: {str(e)}\n{error_details}")
+        logger.exception("Error processing request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,46 @@
+# app/api/routes/visualizations.py
+import base64
+from typing import Any
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from ...core.image_store import IMAGE_FIELDS, put_image, get_image
+from ...config import settings
+
+router = APIRouter(
+    prefix="/viz",
+    tags=["visualizations"],
+    responses={404: {"description": "Not found"}},
+)
+
+def store_image_urls(visualization: Any, http_request: Request) -> None:
+    """
+    Move a CircuitVisualization's inline base64 PNGs into the image store and
+    replace them with /viz URLs. Accepts the model or its dumped dict.
+    """
+    is_dict = isinstance(visualization, dict)
+    for field in IMAGE_FIELDS:
+        encoded = visualization.get(field) if is_dict else getattr(visualization, field)
+        if not encoded:
+            continue
+        image_id = put_image(base64.b64decode(encoded))
+        url = str(http_request.url_for("get_visualization_image", image_id=image_id))
+        if is_dict:
+            visualization[field] = url
+        else:
+            setattr(visualization, field, url)
+
+@router.get("/{image_id}", response_class=Response)
+async def get_visualization_image(image_id: str):
+    """
+    Get a rendered visualization referenced by an images=urls response.
+    """
+    png_bytes = get_image(image_id)
+    if png_bytes is None:
+        raise HTTPException(status_code=404, detail="Image not found or expired")
+    
+    # Image ids are content hashes, so the bytes behind a URL never change
+    return Response(
+        content=png_bytes,
+        media_type="image/png",
+        headers={"Cache-Control": f"public, max-age={settings.IMAGE_STORE_TTL}, immutable"}
+    )
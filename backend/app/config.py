@@ -9,6 +9,7 @@ class Settings(BaseModel):
     APP_NAME: str = "Quantum Circuit Generator"
     APP_VERSION: str = "0.1.0"
     APP_DESCRIPTION: str = "Generate quantum circuits from natural language or images"
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")  # Use WARNING in production to skip debug/info formatting
     
     # API Keys
     OPENAI_API_KEY: str = os.environ.get("OPENAI_API_KEY", "")
@@ -19,6 +20,38 @@ class Settings(BaseModel):
     
     # Visualization settings
     MAX_QUBIT_VISUALIZATION: int = 8  # Maximum qubits for which to generate visualizations
+    MAX_QUBIT_SIMULATION: int = 12  # Maximum qubits for which to simulate a measurement histogram
+    
+    # Upload settings
+    MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # Largest accepted circuit file upload, in bytes
+    
+    # Caching settings
+    TEMPLATE_RESPONSE_CACHE_BYTES: int = 32 * 1024 * 1024  # Total size of cached /circuits/generate responses (0 disables)
+    TEXT_RESPONSE_CACHE_BYTES: int = 32 * 1024 * 1024  # Total size of cached /text/generate responses (0 disables)
+    TEXT_RESPONSE_CACHE_TTL: int = 3600  # Seconds a cached /text/generate response is reused
+    IMAGE_STORE_BYTES: int = 64 * 1024 * 1024  # Total size of rendered PNGs kept for /viz URLs
+    IMAGE_STORE_TTL: int = 900  # Seconds a /viz URL stays valid
+    VIZ_CACHE_BYTES: int = 16 * 1024 * 1024  # Total size of cached base64 template visualizations
+    TEMPLATE_CIRCUIT_CACHE_SIZE: int = 512  # Built circuits kept per (circuit_type, num_qubits)
+    GATE_SEQUENCE_CIRCUIT_CACHE_SIZE: int = 256  # Built circuits kept per (num_qubits, gate sequence)
+    OPENAI_PARSE_CACHE_SIZE: int = 256  # Cached OpenAI parses of uploaded files and images
+    OPENAI_GATE_CACHE_SIZE: int = 512  # Cached OpenAI gate sequences per (circuit_type, params)
+    OPENAI_GATE_DISK_CACHE: bool = os.environ.get("CUBITS_OPENAI_CACHE") == "1"  # Also persist them across restarts
+    OPENAI_GATE_DISK_CACHE_DIR: str = os.environ.get(
+        "CUBITS_OPENAI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cubitsatwork", "openai_gates")
+    )
+    EXPLANATION_CACHE_SIZE: int = 512  # Cached OpenAI circuit explanations per canonical circuit
+    GATE_EXPLANATION_CACHE_SIZE: int = 256  # Cached OpenAI gate explanations per gate signature
+    
+    # OpenAI settings
+    OPENAI_BATCH_MAX_SIZE: int = 8  # Most text requests parsed in one batched OpenAI call
+    OPENAI_BATCH_WAIT_MS: int = 20  # How long a text request waits for others to batch with
+    OPENAI_CIRCUIT_MODEL: str = os.environ.get("OPENAI_CIRCUIT_MODEL", "gpt-4o-mini")  # Model generating template gate sequences
+    OPENAI_CIRCUIT_MAX_TOKENS: int = 1024  # Response cap for a generated gate sequence
+    OPENAI_EXPLANATION_MODEL: str = os.environ.get("OPENAI_EXPLANATION_MODEL", "gpt-3.5-turbo")  # Model writing circuit and gate explanations
+    
+    # Worker settings
+    CPU_POOL_WORKERS: int = os.cpu_count() or 4  # Threads for blocking per-request stages
 
 # Initialize settings
 settings = Settings()
\ No newline at end of file
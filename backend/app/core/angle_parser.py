@@ -0,0 +1,62 @@
+# app/core/angle_parser.py
+import ast
+import functools
+import math
+import operator
+
+# Arithmetic allowed in angle expressions such as "pi/2" or "-3*pi/4"
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+_PI_MODULES = frozenset({"np", "numpy", "math"})
+# Longest expression accepted; real angles are a few characters, and the limit keeps
+# deeply nested input from reaching the parser at all
+MAX_EXPRESSION_LENGTH = 100
+
+def _evaluate(node: ast.AST) -> float:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    if isinstance(node, ast.Name) and node.id == "pi":
+        return math.pi
+    if (isinstance(node, ast.Attribute) and node.attr == "pi"
+            and isinstance(node.value, ast.Name) and node.value.id in _PI_MODULES):
+        return math.pi
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand))
+    raise ValueError(f"Unsupported element in angle expression: {ast.dump(node)}")
+
+@functools.lru_cache(maxsize=512)
+def _parse_normalized_angle(expression: str) -> float:
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Angle expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        result = _evaluate(ast.parse(expression, mode="eval"))
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ValueError(f"Invalid angle expression '{expression}'") from e
+    # A negative base with a fractional exponent, e.g. "(-1)**0.5", gives a complex number
+    if isinstance(result, complex) or not math.isfinite(result):
+        raise ValueError(f"Angle expression '{expression}' is not a finite real number")
+    return float(result)
+
+def parse_angle(expression: str) -> float:
+    """
+    Evaluate an angle expression built from numbers, pi and + - * / **.
+
+    Unlike eval, anything else (names, calls, attribute access) raises ValueError, as do
+    overlong expressions and results that are complex or infinite; overflow and division
+    by zero raise ArithmeticError.
+    Results are cached, since the same few angles like "pi/2" recur constantly.
+    """
+    return _parse_normalized_angle(expression.strip().lower().replace("π", "pi"))
@@ -1,51 +1,127 @@
-from typing import List
+from typing import List, Optional
+import logging
 import re
+from collections import OrderedDict
 import numpy as np
 from qiskit import QuantumCircuit
 from ..nlp_processor.intent_parser import CircuitType, CircuitIntent
 from .openai_circuit_generator import OpenAICircuitGenerator
+from .templates.bell_state import create_bell_state
+from .templates.ghz_state import create_ghz_state
+from .templates.teleportation import create_teleportation_circuit
+from .templates.deutsch_jozsa import create_deutsch_jozsa_circuit
+from .templates.bernstein_vazirani import create_bernstein_vazirani_circuit
+from .templates.qft import create_qft_circuit
+from .templates.grovers import create_grovers_circuit
+from ..lru_cache import lru_get, lru_put
+from ..angle_parser import parse_angle
+from ..cpu_pool import run_in_cpu_pool
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+# QASM style bit references in "q[0] -> c[0]" measurements
+_QIDX_RE = re.compile(r'q\[(\d+)\]')
+_CIDX_RE = re.compile(r'c\[(\d+)\]')
+
+# Whitespace-delimited integer tokens in gate instructions, e.g. the 0 and 1 in "cx 0 1" but not "0.5"
+_INT_TOKEN_RE = re.compile(r'(?<!\S)\d+(?!\S)')
+
+# Punctuation in "if(c[2]==1) x 2" style conditionals ("==" is replaced before translating)
+_COND_TRANS = str.maketrans({"(": " ", ")": None, ",": " "})
+
+def _bit_string(value) -> Optional[str]:
+    """A secret string or marked state parameter as a string, or None if not given."""
+    return None if value in (None, "") else str(value)
+
+# Circuit types built locally from their templates, as (num_qubits, params) -> circuit.
+# Deutsch-Jozsa and Bernstein-Vazirani count the ancilla in num_qubits, as the template
+# catalogue and the OpenAI prompts do, so the templates get one qubit less.
+_TEMPLATE_BUILDERS = {
+    CircuitType.BELL_STATE: lambda n, p: create_bell_state(n),
+    CircuitType.GHZ_STATE: lambda n, p: create_ghz_state(n),
+    CircuitType.TELEPORTATION: lambda n, p: create_teleportation_circuit(),
+    CircuitType.DEUTSCH_JOZSA: lambda n, p: create_deutsch_jozsa_circuit(n - 1, str(p.get("oracle_type") or "balanced")),
+    CircuitType.BERNSTEIN_VAZIRANI: lambda n, p: create_bernstein_vazirani_circuit(n - 1, _bit_string(p.get("secret_string"))),
+    CircuitType.QFT: lambda n, p: create_qft_circuit(n),
+    CircuitType.GROVERS: lambda n, p: create_grovers_circuit(n, _bit_string(p.get("marked_state"))),
+}
+
+# Largest circuit built from a template; Grover's iteration count grows as sqrt(2^n), so
+# bigger requests go to the generator, whose output is bounded by its token cap
+_TEMPLATE_MAX_QUBITS = 10
 
 class CustomCircuitBuilder:
 
-    def __init__(self):
-        self.gate_map = {
-            "h": self._apply_h,
-            "x": self._apply_x,
-            "y": self._apply_y,
-            "z": self._apply_z,
-            "id": self._apply_id,
-            "cx": self._apply_cx,
-            "cz": self._apply_cz,
-            "ccx": self._apply_ccx,
-            "rx": self._apply_rx,
-            "ry": self._apply_ry,
-            "rz": self._apply_rz,
-            "u1": self._apply_u1,  # will auto map to rz
-            "u2": self._apply_u2,
-            "u3": self._apply_u3,
-            "s": self._apply_s,
-            "t": self._apply_t,
-            "measure": self._apply_measure,
-            "swap": self._apply_swap,
-            "cp": self._apply_cp,
-            "reset": self._apply_reset,
-            "if": self._apply_conditional,
-            "conditional": self._apply_conditional,  # Allow "conditional:" prefix from parser
-            "barrier": self._apply_barrier
-        }
+    # Plain gates by name: (qubit count, parameter count, QuantumCircuit method).
+    # Instructions list qubits then angles; Qiskit takes angles then qubits.
+    # A qubit count of None accepts any number of qubits.
+    GATE_DISPATCH = {
+        "h": (1, 0, "h"),
+        "x": (1, 0, "x"),
+        "y": (1, 0, "y"),
+        "z": (1, 0, "z"),
+        "id": (1, 0, "i"),
+        "s": (1, 0, "s"),
+        "t": (1, 0, "t"),
+        "reset": (1, 0, "reset"),
+        "rx": (1, 1, "rx"),
+        "ry": (1, 1, "ry"),
+        "rz": (1, 1, "rz"),
+        "u1": (1, 1, "rz"),  # U1 is deprecated -> same as RZ
+        "u2": (1, 2, "u2"),
+        "u3": (1, 3, "u3"),
+        "cx": (2, 0, "cx"),
+        "cz": (2, 0, "cz"),
+        "swap": (2, 0, "swap"),
+        "cp": (2, 1, "cp"),
+        "ccx": (3, 0, "ccx"),
+        "barrier": (None, 0, "barrier"),
+    }
+
+    # Gates that can be classically conditioned: (QuantumCircuit method, angle count)
+    COND_GATE_TABLE = {
+        "x": ("x", 0),
+        "y": ("y", 0),
+        "z": ("z", 0),
+        "h": ("h", 0),
+        "rx": ("rx", 1),
+        "ry": ("ry", 1),
+        "rz": ("rz", 1),
+    }
 
     def build_circuit(self, num_qubits: int, gate_sequence: List[str]) -> QuantumCircuit:
         circuit = QuantumCircuit(num_qubits, num_qubits)
 
-        for gate_instruction in gate_sequence:
-            self._apply_gate(circuit, gate_instruction)
+        for gate_name, apply, args in self._compile_sequence(gate_sequence):
+            try:
+                apply(circuit, *args)
+            except Exception as e:
+                logger.warning("Error applying gate %s with args %s: %s", gate_name, args, e)
 
         if not any("measure" in gate for gate in gate_sequence):
             circuit.measure_all()
 
         return circuit
 
-    def _apply_gate(self, circuit: QuantumCircuit, gate_instruction: str):
+    def _compile_sequence(self, gate_sequence: List[str]) -> List[tuple]:
+        """
+        Parse a whole gate sequence into (gate name, callable, args) rows.
+
+        Tokenizing, table lookups and int/float conversion all happen in this one
+        pass, so applying the rows is a plain call per gate. Plain gates resolve to
+        the unbound QuantumCircuit method with their converted arguments; measure
+        and conditional instructions keep their raw tokens for their handlers.
+        """
+        ops = []
+        for gate_instruction in gate_sequence:
+            op = self._compile_gate(gate_instruction)
+            if op is not None:
+                ops.append(op)
+        return ops
+
+    def _compile_gate(self, gate_instruction: str):
+        """Parse one instruction into a (gate name, callable, args) row, or None to skip it."""
         # Handle measurement with arrow notation
         if "->" in gate_instruction:
             parts = gate_instruction.strip().replace("->", " ").split()
@@ -62,8 +138,8 @@ class CustomCircuitBuilder:
                     clbit_part = parts[-1]
                     
                     # Handle QASM style format with q[] and c[]
-                    qubit_match = re.search(r'q\[(\d+)\]', qubit_part)
-                    clbit_match = re.search(r'c\[(\d+)\]', clbit_part)
+                    qubit_match = _QIDX_RE.search(qubit_part)
+                    clbit_match = _CIDX_RE.search(clbit_part)
                     
                     if qubit_match and clbit_match:
                         qubit_idx = qubit_match.group(1)
@@ -75,12 +151,12 @@ class CustomCircuitBuilder:
                     
                     parts = ["measure", qubit_idx, clbit_idx]
             else:
-                print(f"Invalid measurement format: {gate_instruction}")
-                return
+                logger.warning("Invalid measurement format: %s", gate_instruction)
+                return None
                 
         # Handle conditional operations
         elif gate_instruction.startswith("if("):
-            parts = gate_instruction.strip().replace(")", "").replace("(", " ").replace("==", " ").replace(",", " ").split()
+            parts = gate_instruction.replace("==", " ").translate(_COND_TRANS).split()
             parts.insert(0, "if")
         elif gate_instruction.lower().startswith("conditional:"):
             parts = gate_instruction.replace("conditional:", "").strip().split()
@@ -98,164 +174,61 @@ class CustomCircuitBuilder:
             # Parse qubit index
             qubit = qubit_part.split()[0] if " " in qubit_part else qubit_part
             
-            # Parse angle expression - handle various formats
-            if "/" in angle_str or "*" in angle_str or "+" in angle_str or "-" in angle_str:
-                try:
-                    # Replace pi with np.pi for evaluation
-                    expression = angle_str.lower().replace("pi", "np.pi")
-                    
-                    # Safely evaluate the mathematical expression
-                    angle = eval(expression)
-                    print(f"Successfully evaluated angle expression '{angle_str}' to {angle}")
-                except Exception as e:
-                    print(f"Error evaluating angle expression '{angle_str}': {str(e)}")
-                    angle = 0.0
-            elif "pi" in angle_str.lower():
-                try:
-                    # Handle simple pi constants
-                    expression = angle_str.lower().replace("pi", "np.pi")
-                    angle = eval(expression)
-                except Exception as e:
-                    print(f"Error parsing pi angle '{angle_str}': {str(e)}")
-                    angle = 0.0
-            else:
-                try:
-                    # Handle plain numeric values
-                    angle = float(angle_str)
-                except Exception as e:
-                    print(f"Error converting angle '{angle_str}' to float: {str(e)}")
-                    angle = 0.0
+            # Parse angle expression: plain numbers, pi and basic arithmetic
+            try:
+                angle = parse_angle(angle_str)
+            except (ValueError, ArithmeticError) as e:
+                logger.warning("Error evaluating angle expression '%s': %s", angle_str, e)
+                angle = 0.0
                     
             parts = [gate_name, qubit, str(angle)]
         else:
             parts = gate_instruction.strip().split()
 
         if not parts:
-            return
+            return None
 
         gate_name = parts[0].lower()
-        gate_function = self.gate_map.get(gate_name)
-        if not gate_function:
-            print(f"Warning: Unrecognized gate '{gate_name}' in instruction: {gate_instruction}")
-            return
-
-        try:
-            gate_function(circuit, parts[1:])
-        except Exception as e:
-            print(f"Error applying gate {gate_name} with args {parts[1:]}: {str(e)}")
-
-    # --- Gate implementations ---
-
-    def _apply_h(self, circuit, args):
-        circuit.h(int(args[0]))
-
-    def _apply_x(self, circuit, args):
-        circuit.x(int(args[0]))
-
-    def _apply_y(self, circuit, args):
-        circuit.y(int(args[0]))
-
-    def _apply_z(self, circuit, args):
-        circuit.z(int(args[0]))
-
-    def _apply_id(self, circuit, args):
-        circuit.i(int(args[0]))
-
-    def _apply_cx(self, circuit, args):
-        circuit.cx(int(args[0]), int(args[1]))
-
-    def _apply_cz(self, circuit, args):
-        circuit.cz(int(args[0]), int(args[1]))
-
-    def _apply_ccx(self, circuit, args):
-        circuit.ccx(int(args[0]), int(args[1]), int(args[2]))
-
-    def _apply_rx(self, circuit, args):
-        try:
-            if len(args) >= 2:
-                circuit.rx(float(args[1]), int(args[0]))
-            else:
-                print(f"Insufficient args for rx: {args}")
-        except Exception as e:
-            print(f"Error applying rx gate: {str(e)}")
-
-    def _apply_ry(self, circuit, args):
-        try:
-            if len(args) >= 2:
-                circuit.ry(float(args[1]), int(args[0]))
-            else:
-                print(f"Insufficient args for ry: {args}")
-        except Exception as e:
-            print(f"Error applying ry gate: {str(e)}")
-
-    def _apply_rz(self, circuit, args):
-        try:
-            if len(args) >= 2:
-                circuit.rz(float(args[1]), int(args[0]))
-            else:
-                print(f"Insufficient args for rz: {args}")
-        except Exception as e:
-            print(f"Error applying rz gate: {str(e)}")
-
-    def _apply_u1(self, circuit, args):
-        # U1 is deprecated -> same as RZ
-        try:
-            if len(args) >= 2:
-                circuit.rz(float(args[1]), int(args[0]))
-            else:
-                print(f"Insufficient args for u1: {args}")
-        except Exception as e:
-            print(f"Error applying u1 gate: {str(e)}")
-
-    def _apply_u2(self, circuit, args):
-        try:
-            if len(args) >= 3:
-                circuit.u2(float(args[1]), float(args[2]), int(args[0]))
-            else:
-                print(f"Insufficient args for u2: {args}")
-        except Exception as e:
-            print(f"Error applying u2 gate: {str(e)}")
+        args = parts[1:]
+        if gate_name == "measure":
+            return gate_name, self._apply_measure, (args,)
+        if gate_name in ("if", "conditional"):
+            return gate_name, self._apply_conditional, (args,)
+
+        spec = self.GATE_DISPATCH.get(gate_name)
+        if spec is None:
+            logger.warning("Unrecognized gate '%s' in instruction: %s", gate_name, gate_instruction)
+            return None
+
+        num_qubits, num_params, method = spec
+        if num_qubits is None:
+            num_qubits = len(args)
+        if len(args) < num_qubits + num_params:
+            logger.warning("Insufficient args for %s: %s", gate_name, args)
+            return None
 
-    def _apply_u3(self, circuit, args):
         try:
-            if len(args) >= 4:
-                circuit.u3(float(args[1]), float(args[2]), float(args[3]), int(args[0]))
-            else:
-                print(f"Insufficient args for u3: {args}")
-        except Exception as e:
-            print(f"Error applying u3 gate: {str(e)}")
-
-    def _apply_s(self, circuit, args):
-        circuit.s(int(args[0]))
+            qubits = [int(a) for a in args[:num_qubits]]
+            angles = [float(a) for a in args[num_qubits:num_qubits + num_params]]
+            apply = getattr(QuantumCircuit, method)
+        except (ValueError, AttributeError) as e:
+            logger.warning("Error applying gate %s with args %s: %s", gate_name, args, e)
+            return None
+        return gate_name, apply, (*angles, *qubits)
 
-    def _apply_t(self, circuit, args):
-        circuit.t(int(args[0]))
+    # --- Gates that need more than a direct QuantumCircuit call ---
 
     def _apply_measure(self, circuit, args):
         try:
-            # Print args for debugging
-            print(f"Applying measure with args: {args}")
+            logger.debug("Applying measure with args: %s", args)
             if len(args) >= 2:
                 qubit_idx = int(args[0])
                 clbit_idx = int(args[1])
                 circuit.measure(qubit_idx, clbit_idx)
             else:
-                print(f"Insufficient args for measure: {args}")
+                logger.warning("Insufficient args for measure: %s", args)
         except Exception as e:
-            print(f"Error applying measure gate: {str(e)}")
-
-    def _apply_swap(self, circuit, args):
-        circuit.swap(int(args[0]), int(args[1]))
-
-    def _apply_cp(self, circuit, args):
-        circuit.cp(float(args[2]), int(args[0]), int(args[1]))
-
-    def _apply_reset(self, circuit, args):
-        circuit.reset(int(args[0]))
-
-    def _apply_barrier(self, circuit, args):
-        qubits = [int(q) for q in args]
-        circuit.barrier(*qubits)
+            logger.warning("Error applying measure gate: %s", e)
 
     def _apply_conditional(self, circuit, args):
         """
@@ -263,7 +236,7 @@ class CustomCircuitBuilder:
         conditional if c 2 1 x 2   OR  if c 2 1 x 2
         Meaning: if classical c[2] == 1, apply X on qubit 2.
         """
-        print(f"Applying conditional operation with args: {args}")
+        logger.debug("Applying conditional operation with args: %s", args)
         if len(args) >= 4:
             try:
                 creg_index = int(args[1])
@@ -277,89 +250,26 @@ class CustomCircuitBuilder:
                 # Define the condition register
                 condition_register = circuit.cregs[0]
                 
-                # Handle conditional operations based on gate type
-                if gate == "x":
-                    # Create the conditional X gate
-                    # First apply the gate normally
-                    x_gate = circuit.x(qubit)
-                    # Then add the condition
-                    x_gate.c_if(condition_register, condition_value)
-                    
-                    # Modify the name of the last instruction to indicate it's conditional
-                    if len(circuit.data) > 0:
-                        last_instruction = circuit.data[-1]
-                        instruction_obj = last_instruction[0]
-                        if hasattr(instruction_obj, 'name'):
-                            original_name = instruction_obj.name
-                            instruction_obj.name = f"{original_name}_if_{condition_value}"
-                
-                elif gate == "z":
-                    z_gate = circuit.z(qubit)
-                    z_gate.c_if(condition_register, condition_value)
-                    if len(circuit.data) > 0:
-                        last_instruction = circuit.data[-1]
-                        instruction_obj = last_instruction[0]
-                        if hasattr(instruction_obj, 'name'):
-                            original_name = instruction_obj.name
-                            instruction_obj.name = f"{original_name}_if_{condition_value}"
-                
-                elif gate == "y":
-                    y_gate = circuit.y(qubit)
-                    y_gate.c_if(condition_register, condition_value)
-                    if len(circuit.data) > 0:
-                        last_instruction = circuit.data[-1]
-                        instruction_obj = last_instruction[0]
-                        if hasattr(instruction_obj, 'name'):
-                            original_name = instruction_obj.name
-                            instruction_obj.name = f"{original_name}_if_{condition_value}"
-                
-                elif gate == "h":
-                    h_gate = circuit.h(qubit)
-                    h_gate.c_if(condition_register, condition_value)
-                    if len(circuit.data) > 0:
-                        last_instruction = circuit.data[-1]
-                        instruction_obj = last_instruction[0]
-                        if hasattr(instruction_obj, 'name'):
-                            original_name = instruction_obj.name
-                            instruction_obj.name = f"{original_name}_if_{condition_value}"
+                # Look up the gate and how many angle arguments follow the qubit
+                spec = self.COND_GATE_TABLE.get(gate)
+                if spec is None:
+                    logger.warning("Unsupported conditional gate: %s", gate)
+                    return
+                method, num_angles = spec
+                if len(args) < 5 + num_angles:
+                    logger.warning("Unsupported conditional gate: %s", gate)
+                    return
+                angles = [float(a) for a in args[5:5 + num_angles]]
                 
-                elif gate in ["rx", "ry", "rz"] and len(args) >= 6:
-                    angle = float(args[5])
-                    if gate == "rx":
-                        rx_gate = circuit.rx(angle, qubit)
-                        rx_gate.c_if(condition_register, condition_value)
-                        if len(circuit.data) > 0:
-                            last_instruction = circuit.data[-1]
-                            instruction_obj = last_instruction[0]
-                            if hasattr(instruction_obj, 'name'):
-                                original_name = instruction_obj.name
-                                instruction_obj.name = f"{original_name}_if_{condition_value}"
-                    
-                    elif gate == "ry":
-                        ry_gate = circuit.ry(angle, qubit)
-                        ry_gate.c_if(condition_register, condition_value)
-                        if len(circuit.data) > 0:
-                            last_instruction = circuit.data[-1]
-                            instruction_obj = last_instruction[0]
-                            if hasattr(instruction_obj, 'name'):
-                                original_name = instruction_obj.name
-                                instruction_obj.name = f"{original_name}_if_{condition_value}"
-                    
-                    elif gate == "rz":
-                        rz_gate = circuit.rz(angle, qubit)
-                        rz_gate.c_if(condition_register, condition_value)
-                        if len(circuit.data) > 0:
-                            last_instruction = circuit.data[-1]
-                            instruction_obj = last_instruction[0]
-                            if hasattr(instruction_obj, 'name'):
-                                original_name = instruction_obj.name
-                                instruction_obj.name = f"{original_name}_if_{condition_value}"
+                # Apply the gate, then add the condition
+                getattr(circuit, method)(*angles, qubit).c_if(condition_register, condition_value)
                 
-                else:
-                    print(f"Unsupported conditional gate: {gate}")
+                # Modify the name of the last instruction to indicate it's conditional
+                instruction_obj = circuit.data[-1].operation
+                instruction_obj.name = f"{instruction_obj.name}_if_{condition_value}"
             
             except Exception as e:
-                print(f"Error in conditional gate: {str(e)}")
+                logger.warning("Error in conditional gate: %s", e)
 
 class CircuitBuilder:
 
@@ -367,42 +277,119 @@ class CircuitBuilder:
         self.custom_builder = CustomCircuitBuilder()
         self.openai_generator = OpenAICircuitGenerator(api_key)
         self.MAX_QUBITS = 50
+        # Built non-custom circuits keyed by (circuit_type, num_qubits)
+        self._template_cache: "OrderedDict[tuple, QuantumCircuit]" = OrderedDict()
+        # Circuits built from gate sequences keyed by (num_qubits, gate sequence)
+        self._sequence_cache: "OrderedDict[tuple, QuantumCircuit]" = OrderedDict()
+
+    def build_template_circuit(self, circuit_type: CircuitType, num_qubits: int) -> QuantumCircuit:
+        """
+        Build a non-custom circuit that depends only on its type and size.
+
+        Results are memoized per builder, which skips the gate generation (and any
+        OpenAI round trip) on repeats. Callers get a copy they are free to modify.
+        """
+        key = (circuit_type, num_qubits)
+        circuit = lru_get(self._template_cache, key)
+        if circuit is None:
+            circuit = self.build_circuit(CircuitIntent(circuit_type, {"num_qubits": num_qubits}))
+            lru_put(self._template_cache, key, circuit, settings.TEMPLATE_CIRCUIT_CACHE_SIZE)
+        return circuit.copy()
+
+    def _build_from_sequence(self, num_qubits: int, gate_sequence: List[str]) -> QuantumCircuit:
+        """
+        Build a circuit from a gate sequence, reusing earlier builds of the same sequence.
+
+        The key is the exact instruction strings, since the parser is sensitive to
+        case and spacing in some formats. Callers get a copy they are free to modify.
+        """
+        key = (num_qubits, tuple(gate_sequence))
+        circuit = lru_get(self._sequence_cache, key)
+        if circuit is None:
+            circuit = self.custom_builder.build_circuit(num_qubits, gate_sequence)
+            lru_put(self._sequence_cache, key, circuit, settings.GATE_SEQUENCE_CIRCUIT_CACHE_SIZE)
+        return circuit.copy()
 
     def build_circuit(self, intent: CircuitIntent) -> QuantumCircuit:
         circuit_type = intent.circuit_type
         params = intent.params
-        num_qubits = params.get("num_qubits", None)
 
-        if num_qubits is not None:
-            num_qubits = min(num_qubits, self.MAX_QUBITS)
+        if circuit_type == CircuitType.CUSTOM:
+            return self._build_custom_circuit(params)
+
+        num_qubits = self._template_qubit_count(circuit_type, params)
+        circuit = self._build_from_template(circuit_type, num_qubits, params)
+        if circuit is not None:
+            return circuit
+        gate_sequence = self.openai_generator.generate_circuit_gates(circuit_type, params)
+
+        return self._build_from_sequence(num_qubits, gate_sequence)
+
+    async def abuild_circuit(self, intent: CircuitIntent) -> QuantumCircuit:
+        """
+        build_circuit for callers on an event loop.
+
+        OpenAI gate generation is awaited instead of blocking, and the qiskit work
+        (template builds included) runs on the CPU pool.
+        """
+        circuit_type = intent.circuit_type
+        params = intent.params
 
         if circuit_type == CircuitType.CUSTOM:
-            custom_gates = params.get("custom_gates", ["h 0", "cx 0 1"])
-            
-            # Debug log the gates being processed
-            print(f"Building circuit with {len(custom_gates)} gates: {custom_gates}")
+            return await run_in_cpu_pool(self._build_custom_circuit, params)
+
+        num_qubits = self._template_qubit_count(circuit_type, params)
+        if circuit_type in _TEMPLATE_BUILDERS:
+            circuit = await run_in_cpu_pool(self._build_from_template, circuit_type, num_qubits, params)
+            if circuit is not None:
+                return circuit
+        gate_sequence = await self.openai_generator.agenerate_circuit_gates(circuit_type, params)
 
-            if num_qubits is None:
-                highest_qubit = -1
-                for gate_str in custom_gates:
-                    parts = gate_str.strip().split()
-                    for part in parts[1:]:
-                        try:
-                            qubit = int(part)
-                            highest_qubit = max(highest_qubit, qubit)
-                        except ValueError:
-                            pass
+        return await run_in_cpu_pool(self._build_from_sequence, num_qubits, gate_sequence)
 
-                num_qubits = max(2, highest_qubit + 1)
-                num_qubits = min(num_qubits, self.MAX_QUBITS)
+    def _build_from_template(self, circuit_type: CircuitType, num_qubits: int, params: dict) -> Optional[QuantumCircuit]:
+        """
+        Build a circuit from its local template, without asking OpenAI for gates.
 
-            return self.custom_builder.build_circuit(num_qubits, custom_gates)
+        Returns None when the type has no template, or the template rejects the size or
+        parameters, so the caller falls back to the generator.
+        """
+        build = _TEMPLATE_BUILDERS.get(circuit_type)
+        if build is None or num_qubits > _TEMPLATE_MAX_QUBITS:
+            return None
+        try:
+            return build(num_qubits, params)
+        except ValueError as e:
+            logger.debug("Template for %s rejected params %s: %s", circuit_type.value, params, e)
+            return None
 
+    def _template_qubit_count(self, circuit_type: CircuitType, params: dict) -> int:
+        """Resolve (and record in params) the qubit count of a non-custom circuit."""
+        num_qubits = params.get("num_qubits", None)
         if num_qubits is None:
             num_qubits = self.openai_generator._get_default_qubit_count(circuit_type)
-            num_qubits = min(num_qubits, self.MAX_QUBITS)
+        num_qubits = min(num_qubits, self.MAX_QUBITS)
 
         params["num_qubits"] = num_qubits
-        gate_sequence = self.openai_generator.generate_circuit_gates(circuit_type, params)
+        return num_qubits
+
+    def _build_custom_circuit(self, params: dict) -> QuantumCircuit:
+        """Build a custom circuit from the gate instructions in its params."""
+        num_qubits = params.get("num_qubits", None)
+
+        if num_qubits is not None:
+            num_qubits = min(num_qubits, self.MAX_QUBITS)
+
+        custom_gates = params.get("custom_gates", ["h 0", "cx 0 1"])
+        
+        # Debug log the gates being processed
+        logger.debug("Building circuit with %d gates: %s", len(custom_gates), custom_gates)
+
+        if num_qubits is None:
+            # Integer tokens are qubit (or clbit) indices; gate names and angles never match
+            highest_qubit = max(map(int, _INT_TOKEN_RE.findall(" ".join(custom_gates))), default=-1)
+
+            num_qubits = max(2, highest_qubit + 1)
+            num_qubits = min(num_qubits, self.MAX_QUBITS)
 
-        return self.custom_builder.build_circuit(num_qubits, gate_sequence)
\ No newline at end of file
+        return self._build_from_sequence(num_qubits, custom_gates)
\ No newline at end of file
@@ -1,157 +1,147 @@
 # app/core/circuit_builder/openai_circuit_generator.py
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import os
 import json
+import logging
+import math
+import re
+import time
+import hashlib
+import tempfile
+from collections import OrderedDict
 from qiskit import QuantumCircuit
-from openai import OpenAI
+import orjson
+from ..openai_clients import get_openai_client, get_async_openai_client
 from ..nlp_processor.intent_parser import CircuitType
+from ..lru_cache import lru_get, lru_put
+from ...config import settings
 
-class OpenAICircuitGenerator:
-    """Generates quantum circuit structures using OpenAI."""
-    
-    def __init__(self, api_key=None):
-        # Use provided API key or environment variable
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        
-        # Initialize OpenAI client if API key is available
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-        else:
-            self.client = None
-    
-    def generate_circuit_gates(self, circuit_type: CircuitType, params: Dict[str, Any]) -> List[str]:
-        """Generate a gate sequence for a circuit using OpenAI."""
-        if not self.client:
-            # Fallback to basic implementations if no API key
-            return self._get_fallback_circuit_gates(circuit_type, params)
-        
-        try:
-            # Extract parameters
-            num_qubits = params.get("num_qubits", self._get_default_qubit_count(circuit_type))
-            
-            # Create a prompt for OpenAI
-            system_prompt = """
-            You are a quantum computing expert. Your task is to generate a sequence of quantum gates that 
-            implements a specific quantum algorithm or circuit.
-            
-            The gates should be in the format expected by Qiskit:
-            - Simple gates: "h 0" for Hadamard on qubit 0
-            - Rotation gates: "rx 0 1.5708" for RX(π/2) on qubit 0
-            - Two-qubit gates: "cx 0 1" for CNOT with qubit 0 controlling qubit 1
-            
-            Use only the following gates:
-            - Single-qubit gates: h, x, y, z, s, t, rx, ry, rz
-            - Two-qubit gates: cx (CNOT), cz, swap
-            - Three-qubit gates: ccx (Toffoli)
-            - Measurement: measure
-            
-            YOUR RESPONSE MUST BE A VALID JSON ARRAY containing ONLY the gate instructions in sequence.
-            For example: ["h 0", "cx 0 1", "measure 0", "measure 1"]
-            
-            Ensure the circuit is valid and properly implements the requested algorithm.
-            Do not include explanations, just return the JSON array of gate instructions.
-            """
-            
-            # Create the user prompt based on the circuit type and parameters
-            user_prompt = self._create_circuit_prompt(circuit_type, params)
-            
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},  # Ensure JSON response
-                temperature=0.2  # Low temperature for consistent outputs
-            )
-            
-            # Extract and parse the response
-            content = response.choices[0].message.content
-            
-            try:
-                # Clean up response if needed
-                content = content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                
-                # Parse JSON - handle both array and object responses
-                parsed = json.loads(content)
-                
-                # Handle case where OpenAI returns an object with a gates key
-                if isinstance(parsed, dict) and "gates" in parsed:
-                    gate_sequence = parsed["gates"]
-                # Handle case where OpenAI returns just the array
-                elif isinstance(parsed, list):
-                    gate_sequence = parsed
-                else:
-                    raise ValueError("Unexpected response format")
-                
-                return gate_sequence
-                
-            except json.JSONDecodeError as e:
-                return self._get_fallback_circuit_gates(circuit_type, params)
-                
-        except Exception as e:
-            return self._get_fallback_circuit_gates(circuit_type, params)
-    
-    def _create_circuit_prompt(self, circuit_type: CircuitType, params: Dict[str, Any]) -> str:
-        """Create a prompt for OpenAI based on circuit type and parameters."""
-        num_qubits = params.get("num_qubits", self._get_default_qubit_count(circuit_type))
-        
-        # Base details for all prompts
-        base_details = f"""
-        Circuit type: {circuit_type.value}
+logger = logging.getLogger(__name__)
+
+# A response wrapped in a ```json ... ``` (or bare ```) code fence; group 1 is the body
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
+
+# System prompt for gate generation, kept short since it is sent with every request.
+# It is part of the disk cache key, so editing it invalidates cached sequences.
+_GATE_SYSTEM_PROMPT = (
+    'You are a quantum computing expert. Reply with a JSON object {"gates": [...]} listing, in order, '
+    'the gate instructions that implement the requested circuit, with no explanations.\n'
+    'Instruction format: gate name, qubit indices, then any angle in radians, e.g. '
+    '"h 0", "rx 0 1.5708", "cx 0 1" (control 0, target 1), "measure 0 0" (qubit 0 into bit 0).\n'
+    'Allowed gates: h,x,y,z,s,t,rx,ry,rz,cx,cz,swap,ccx,measure.'
+)
+
+# Structured output format for gate replies, so the server only returns {"gates": [str, ...]}
+_GATE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "gate_sequence",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"gates": {"type": "array", "items": {"type": "string"}}},
+            "required": ["gates"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# System prompt for the one-shot repair of a reply that did not parse
+_GATE_REPAIR_PROMPT = 'Fix this malformed JSON. Return only the JSON object {"gates": [...]} it was meant to be.'
+
+# Response size estimate for _estimate_max_tokens. An instruction such as "cp 0 1 1.5708"
+# is about 8 tokens with its quotes and comma; the estimate allows twice that for headroom.
+_BASE_GATE_TOKENS = 32  # The {"gates": [...]} wrapper
+_TOKENS_PER_GATE = 16
+_GATES_PER_QUBIT = 4  # Typical gates per qubit in a circuit of linear size
+# Circuit types built around a QFT, whose gate count grows with the square of the qubits
+_QUADRATIC_GATE_TYPES = frozenset({
+    CircuitType.QFT,
+    CircuitType.QPE,
+    CircuitType.SHOR,
+    CircuitType.QUANTUM_COUNTING,
+    CircuitType.HHL,
+})
+
+# Default number of qubits for each circuit type
+_DEFAULT_QUBITS = {
+    CircuitType.BELL_STATE: 2,
+    CircuitType.GHZ_STATE: 3,
+    CircuitType.W_STATE: 3,
+    CircuitType.TELEPORTATION: 3,
+    CircuitType.SUPERDENSE_CODING: 2,
+    CircuitType.DEUTSCH_JOZSA: 3,
+    CircuitType.BERNSTEIN_VAZIRANI: 4,
+    CircuitType.SIMON: 6,
+    CircuitType.QFT: 3,
+    CircuitType.QPE: 5,
+    CircuitType.SHOR: 6,
+    CircuitType.GROVERS: 3,
+    CircuitType.QAOA: 4,
+    CircuitType.VQE: 4,
+    CircuitType.QUANTUM_COUNTING: 5,
+    CircuitType.QUANTUM_WALK: 4,
+    CircuitType.HHL: 5
+}
+
+def _ghz_fallback(num_qubits: int) -> List[str]:
+    """H on qubit 0, then a CNOT chain across all qubits."""
+    return ["h 0"] + [f"cx {i} {i+1}" for i in range(num_qubits - 1)]
+
+def _entangling_fallback(num_qubits: int) -> List[str]:
+    """For other circuit types, a basic circuit that at least creates entanglement."""
+    return ["h 0"] + [f"cx {i} {i+1}" for i in range(min(3, num_qubits) - 1)]
+
+# Basic gate sequences used when OpenAI is unavailable, by circuit type.
+# Each call builds a new list, so callers may modify the result.
+_FALLBACK_GATES = {
+    CircuitType.BELL_STATE: lambda num_qubits: ["h 0", "cx 0 1"],
+    CircuitType.GHZ_STATE: _ghz_fallback,
+    CircuitType.TELEPORTATION: lambda num_qubits: ["h 1", "cx 1 2", "cx 0 1", "h 0", "measure 0", "measure 1", "cx 1 2", "cz 0 2"],
+    # Simple 3-qubit QFT
+    CircuitType.QFT: lambda num_qubits: ["h 0", "cp 0 1 1.5708", "cp 0 2 0.7854", "h 1", "cp 1 2 1.5708", "h 2", "swap 0 2"],
+}
+
+# Opening of every circuit prompt
+_BASE_PROMPT_TEMPLATE = """
+        Circuit type: {circuit_type}
         Number of qubits: {num_qubits}
         
         Generate a sequence of Qiskit gate instructions that implements this circuit.
         """
-        
-        # Add circuit-specific details
-        if circuit_type == CircuitType.BELL_STATE:
-            return base_details + """
+
+# Circuit-specific prompt text appended to the common details, by circuit type.
+# Placeholders are filled from the fields built in _create_circuit_prompt.
+_PROMPT_SUFFIXES = {
+    CircuitType.BELL_STATE: """
             Create a Bell state (maximally entangled state) between two qubits.
             The final state should be (|00⟩ + |11⟩)/√2.
-            """
-        
-        elif circuit_type == CircuitType.GHZ_STATE:
-            return base_details + f"""
+            """,
+    CircuitType.GHZ_STATE: """
             Create a GHZ state among {num_qubits} qubits.
-            The final state should be (|{"0" * num_qubits}⟩ + |{"1" * num_qubits}⟩)/√2.
-            """
-        
-        elif circuit_type == CircuitType.W_STATE:
-            return base_details + f"""
+            The final state should be (|{zeros}⟩ + |{ones}⟩)/√2.
+            """,
+    CircuitType.W_STATE: """
             Create a W state among {num_qubits} qubits.
             The W state is an equal superposition of all states with exactly one qubit in state |1⟩.
             For example, for 3 qubits: (|100⟩ + |010⟩ + |001⟩)/√3.
-            """
-        
-        elif circuit_type == CircuitType.TELEPORTATION:
-            return base_details + """
+            """,
+    CircuitType.TELEPORTATION: """
             Implement a quantum teleportation circuit.
             The circuit should:
             1. Prepare a state to teleport on qubit 0
             2. Create entanglement between qubits 1 and 2
             3. Perform Bell measurement on qubits 0 and 1
             4. Apply conditional corrections on qubit 2
-            """
-        
-        elif circuit_type == CircuitType.SUPERDENSE_CODING:
-            return base_details + """
+            """,
+    CircuitType.SUPERDENSE_CODING: """
             Implement a superdense coding protocol.
             The circuit should:
             1. Create an entangled pair (Bell state)
             2. Encode two classical bits by applying operations on one qubit
             3. Measure both qubits to decode the classical information
-            """
-        
-        elif circuit_type == CircuitType.DEUTSCH_JOZSA:
-            oracle_type = params.get("oracle_type", "balanced")
-            return base_details + f"""
+            """,
+    CircuitType.DEUTSCH_JOZSA: """
             Implement the Deutsch-Jozsa algorithm with a {oracle_type} oracle function.
             The circuit should:
             1. Initialize all qubits
@@ -159,13 +149,8 @@ class OpenAICircuitGenerator:
             3. Apply the oracle (assume it's {oracle_type})
             4. Apply Hadamard gates again
             5. Measure all qubits except the ancilla
-            """
-        
-        elif circuit_type == CircuitType.BERNSTEIN_VAZIRANI:
-            secret = params.get("secret_string", "101")
-            if not secret:
-                secret = "101"  # Default secret string
-            return base_details + f"""
+            """,
+    CircuitType.BERNSTEIN_VAZIRANI: """
             Implement the Bernstein-Vazirani algorithm to find the secret string "{secret}".
             The circuit should:
             1. Initialize the qubits
@@ -173,10 +158,8 @@ class OpenAICircuitGenerator:
             3. Implement an oracle that encodes the secret string "{secret}"
             4. Apply Hadamard gates again
             5. Measure all qubits except the ancilla
-            """
-        
-        elif circuit_type == CircuitType.SIMON:
-            return base_details + """
+            """,
+    CircuitType.SIMON: """
             Implement Simon's algorithm.
             The circuit should:
             1. Initialize all qubits
@@ -184,38 +167,27 @@ class OpenAICircuitGenerator:
             3. Apply the oracle (representing a function with a hidden period)
             4. Apply Hadamard gates to the first register again
             5. Measure the first register
-            """
-        
-        elif circuit_type == CircuitType.QFT:
-            return base_details + f"""
+            """,
+    CircuitType.QFT: """
             Implement the Quantum Fourier Transform on {num_qubits} qubits.
             The circuit should apply the appropriate sequence of Hadamard gates and controlled phase rotations.
-            """
-        
-        elif circuit_type == CircuitType.QPE:
-            return base_details + """
+            """,
+    CircuitType.QPE: """
             Implement Quantum Phase Estimation.
             The circuit should:
             1. Initialize register qubits in superposition
             2. Apply controlled unitary operations
             3. Apply inverse QFT to the register
             4. Measure the register
-            """
-        
-        elif circuit_type == CircuitType.SHOR:
-            return base_details + """
+            """,
+    CircuitType.SHOR: """
             Implement a simplified version of Shor's algorithm.
             The circuit should demonstrate the key components:
             1. QFT and inverse QFT
             2. Modular exponentiation
             Focus on implementing the quantum part of Shor's algorithm.
-            """
-        
-        elif circuit_type == CircuitType.GROVERS:
-            marked_state = params.get("marked_state", "101")
-            if not marked_state:
-                marked_state = "101"  # Default marked state
-            return base_details + f"""
+            """,
+    CircuitType.GROVERS: """
             Implement Grover's search algorithm to find the marked state "{marked_state}".
             The circuit should:
             1. Initialize all qubits in superposition
@@ -223,10 +195,8 @@ class OpenAICircuitGenerator:
             3. Apply the diffusion operator
             4. Repeat oracle and diffusion as appropriate
             5. Measure all qubits
-            """
-        
-        elif circuit_type == CircuitType.QAOA:
-            return base_details + """
+            """,
+    CircuitType.QAOA: """
             Implement a basic Quantum Approximate Optimization Algorithm (QAOA) circuit.
             The circuit should:
             1. Prepare the initial state
@@ -234,10 +204,8 @@ class OpenAICircuitGenerator:
             3. Measure all qubits
             
             Use basic gates to approximate the QAOA operations.
-            """
-        
-        elif circuit_type == CircuitType.VQE:
-            return base_details + """
+            """,
+    CircuitType.VQE: """
             Implement a basic Variational Quantum Eigensolver (VQE) ansatz circuit.
             The circuit should:
             1. Initialize qubits
@@ -246,10 +214,8 @@ class OpenAICircuitGenerator:
             4. Prepare for measurement
             
             Use basic gates to represent a VQE circuit.
-            """
-        
-        elif circuit_type == CircuitType.QUANTUM_COUNTING:
-            return base_details + """
+            """,
+    CircuitType.QUANTUM_COUNTING: """
             Implement a Quantum Counting algorithm, which combines QPE with Grover's algorithm.
             The circuit should:
             1. Initialize QPE register and work register
@@ -257,10 +223,8 @@ class OpenAICircuitGenerator:
             3. Apply controlled Grover operators 
             4. Apply inverse QFT to the counting register
             5. Measure the counting register
-            """
-        
-        elif circuit_type == CircuitType.QUANTUM_WALK:
-            return base_details + """
+            """,
+    CircuitType.QUANTUM_WALK: """
             Implement a simple Quantum Walk circuit.
             The circuit should:
             1. Initialize the position and coin registers
@@ -268,10 +232,8 @@ class OpenAICircuitGenerator:
             3. Apply the shift operator based on the coin state
             4. Repeat coin and shift operations several times
             5. Measure all qubits
-            """
-        
-        elif circuit_type == CircuitType.HHL:
-            return base_details + """
+            """,
+    CircuitType.HHL: """
             Implement a simplified version of the HHL algorithm for solving linear systems.
             The circuit should demonstrate the key components:
             1. QPE to determine eigenvalues
@@ -279,59 +241,365 @@ class OpenAICircuitGenerator:
             3. Inverse QPE
             
             Focus on implementing the core quantum operations of the HHL algorithm.
+            """,
+}
+_DEFAULT_PROMPT_SUFFIX = """
+            Generate a general quantum circuit that demonstrates quantum superposition and entanglement.
             """
+
+# Complete prompt templates, joined once at import
+_PROMPT_TEMPLATES = {
+    circuit_type: _BASE_PROMPT_TEMPLATE + suffix for circuit_type, suffix in _PROMPT_SUFFIXES.items()
+}
+_DEFAULT_PROMPT_TEMPLATE = _BASE_PROMPT_TEMPLATE + _DEFAULT_PROMPT_SUFFIX
+
+class OpenAICircuitGenerator:
+    """Generates quantum circuit structures using OpenAI."""
+    
+    def __init__(self, api_key=None, model: Optional[str] = None):
+        # Use provided API key or environment variable
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.model = model or settings.OPENAI_CIRCUIT_MODEL
         
+        # Initialize OpenAI client if API key is available
+        if self.api_key:
+            self.client = get_openai_client(self.api_key)
+            self.async_client = get_async_openai_client(self.api_key)
         else:
-            return base_details + """
-            Generate a general quantum circuit that demonstrates quantum superposition and entanglement.
-            """
+            self.client = None
+            self.async_client = None
+        
+        # OpenAI gate sequences keyed by (circuit_type, canonical JSON of the params)
+        self._gate_cache: "OrderedDict[tuple, List[str]]" = OrderedDict()
+        
+        # Optional on-disk copy of those sequences, one JSON file per prompt hash
+        self._disk_cache_dir = None
+        if settings.OPENAI_GATE_DISK_CACHE:
+            try:
+                os.makedirs(settings.OPENAI_GATE_DISK_CACHE_DIR, exist_ok=True)
+                self._disk_cache_dir = settings.OPENAI_GATE_DISK_CACHE_DIR
+            except OSError as e:
+                logger.warning("OpenAI gate disk cache disabled: %s", e)
     
-    def _get_default_qubit_count(self, circuit_type: CircuitType) -> int:
-        """Get the default number of qubits for a given circuit type."""
-        default_qubits = {
-            CircuitType.BELL_STATE: 2,
-            CircuitType.GHZ_STATE: 3,
-            CircuitType.W_STATE: 3,
-            CircuitType.TELEPORTATION: 3,
-            CircuitType.SUPERDENSE_CODING: 2,
-            CircuitType.DEUTSCH_JOZSA: 3,
-            CircuitType.BERNSTEIN_VAZIRANI: 4,
-            CircuitType.SIMON: 6,
-            CircuitType.QFT: 3,
-            CircuitType.QPE: 5,
-            CircuitType.SHOR: 6,
-            CircuitType.GROVERS: 3,
-            CircuitType.QAOA: 4,
-            CircuitType.VQE: 4,
-            CircuitType.QUANTUM_COUNTING: 5,
-            CircuitType.QUANTUM_WALK: 4,
-            CircuitType.HHL: 5
+    def generate_circuit_gates(self, circuit_type: CircuitType, params: Dict[str, Any]) -> List[str]:
+        """Generate a gate sequence for a circuit using OpenAI."""
+        if not self.client:
+            # Fallback to basic implementations if no API key
+            return self._get_fallback_circuit_gates(circuit_type, params)
+        
+        gate_sequence, cache_key, user_prompt, disk_path = self._lookup_cached_gates(circuit_type, params)
+        if gate_sequence is not None:
+            return gate_sequence
+        
+        try:
+            gate_sequence = self._request_circuit_gates(user_prompt, self._estimate_max_tokens(circuit_type, params))
+        except Exception:
+            return self._get_fallback_circuit_gates(circuit_type, params)
+        
+        self._remember_gates(cache_key, disk_path, gate_sequence)
+        return gate_sequence
+    
+    def generate_circuit_gates_batch(
+        self,
+        requests: List[Tuple[CircuitType, Dict[str, Any]]],
+        urgent: bool = False,
+        poll_interval: float = 30.0,
+    ) -> List[List[str]]:
+        """
+        Generate gate sequences for many circuits through the OpenAI Batch API.
+        
+        A batch job costs about half as much as the same individual calls but may take
+        up to its 24h completion window, and this blocks until it finishes, so it is
+        meant for offline bulk work such as prebuild_gate_cache.py. A single request, or
+        urgent=True, goes through generate_circuit_gates instead. Cached requests are
+        answered from the cache, and a request whose batch result is missing or unusable
+        gets the same fallback circuit as generate_circuit_gates.
+        """
+        if not self.client or urgent or len(requests) <= 1:
+            return [self.generate_circuit_gates(circuit_type, params) for circuit_type, params in requests]
+        
+        results: List[Optional[List[str]]] = [None] * len(requests)
+        pending = {}  # custom_id -> (request index, cache key, disk path)
+        batch_lines = []
+        for index, (circuit_type, params) in enumerate(requests):
+            gate_sequence, cache_key, user_prompt, disk_path = self._lookup_cached_gates(circuit_type, params)
+            if gate_sequence is not None:
+                results[index] = gate_sequence
+                continue
+            
+            custom_id = str(index)
+            pending[custom_id] = (index, cache_key, disk_path)
+            batch_lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._gate_request_body(user_prompt, self._estimate_max_tokens(circuit_type, params)),
+            }))
+        
+        if pending:
+            try:
+                contents = self._run_gate_batch(batch_lines, poll_interval)
+            except Exception as e:
+                logger.warning("OpenAI gate batch failed, using fallback circuits: %s", e)
+                contents = {}
+            
+            for custom_id, (index, cache_key, disk_path) in pending.items():
+                circuit_type, params = requests[index]
+                try:
+                    gate_sequence = self._parse_or_repair_gate_content(contents[custom_id])
+                except Exception:
+                    results[index] = self._get_fallback_circuit_gates(circuit_type, params)
+                    continue
+                self._remember_gates(cache_key, disk_path, gate_sequence)
+                results[index] = gate_sequence
+        
+        return results
+    
+    async def agenerate_circuit_gates(self, circuit_type: CircuitType, params: Dict[str, Any]) -> List[str]:
+        """generate_circuit_gates for callers on an event loop, awaiting OpenAI instead of blocking."""
+        if not self.async_client:
+            return self._get_fallback_circuit_gates(circuit_type, params)
+        
+        gate_sequence, cache_key, user_prompt, disk_path = self._lookup_cached_gates(circuit_type, params)
+        if gate_sequence is not None:
+            return gate_sequence
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._gate_request_body(user_prompt, self._estimate_max_tokens(circuit_type, params))
+            )
+            content = response.choices[0].message.content
+            try:
+                gate_sequence = self._parse_gate_content(content)
+            except ValueError:
+                response = await self.async_client.chat.completions.create(**self._repair_request_body(content))
+                gate_sequence = self._parse_gate_content(response.choices[0].message.content)
+        except Exception:
+            return self._get_fallback_circuit_gates(circuit_type, params)
+        
+        self._remember_gates(cache_key, disk_path, gate_sequence)
+        return gate_sequence
+    
+    def _run_gate_batch(self, batch_lines: List[str], poll_interval: float) -> Dict[str, str]:
+        """Submit a JSONL batch of chat completions, wait for it, and map custom_id to message content."""
+        batch_input = self.client.files.create(
+            file=("circuit_gate_requests.jsonl", "\n".join(batch_lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"batch {batch.id} ended with status {batch.status}")
+        
+        # Output lines come back in any order; failed requests have no usable body
+        contents = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                contents[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return contents
+    
+    def clear_cache(self) -> None:
+        """Forget all cached gate sequences, in memory and on disk."""
+        self._gate_cache.clear()
+        if self._disk_cache_dir is None:
+            return
+        for name in os.listdir(self._disk_cache_dir):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self._disk_cache_dir, name))
+                except OSError:
+                    pass
+    
+    def _lookup_cached_gates(self, circuit_type: CircuitType, params: Dict[str, Any]):
+        """
+        Look a request up in the memory cache, then the disk cache.
+        
+        Returns (gate sequence or None, cache key, user prompt, disk path); the prompt and
+        disk path are only worked out on a memory miss. Disk hits are copied into memory.
+        """
+        # The same circuit type and parameters always ask OpenAI the same question
+        cache_key = self._gate_cache_key(circuit_type, params)
+        cached_gates = lru_get(self._gate_cache, cache_key)
+        if cached_gates is not None:
+            return list(cached_gates), cache_key, None, None
+        
+        # Create the user prompt based on the circuit type and parameters
+        user_prompt = self._create_circuit_prompt(circuit_type, params)
+        
+        # Sequences saved by an earlier process for the exact same prompt
+        disk_path = self._disk_cache_path(user_prompt)
+        gate_sequence = self._read_disk_cache(disk_path) if disk_path else None
+        if gate_sequence is not None:
+            lru_put(self._gate_cache, cache_key, list(gate_sequence), settings.OPENAI_GATE_CACHE_SIZE)
+        return gate_sequence, cache_key, user_prompt, disk_path
+    
+    def _remember_gates(self, cache_key: tuple, disk_path: Optional[str], gate_sequence: List[str]) -> None:
+        """Cache an OpenAI answer; fallbacks are never cached, since they may be due to a transient error."""
+        if disk_path:
+            self._write_disk_cache(disk_path, gate_sequence)
+        lru_put(self._gate_cache, cache_key, list(gate_sequence), settings.OPENAI_GATE_CACHE_SIZE)
+    
+    @staticmethod
+    def _gate_cache_key(circuit_type: CircuitType, params: Dict[str, Any]) -> tuple:
+        """In-memory cache key: the circuit type plus the params as canonical JSON."""
+        return circuit_type, json.dumps(params, sort_keys=True, default=str)
+    
+    def _disk_cache_path(self, user_prompt: str) -> Optional[str]:
+        """Path of the disk cache entry for a prompt, or None when the disk cache is off."""
+        if self._disk_cache_dir is None:
+            return None
+        key = hashlib.sha256(f"{_GATE_SYSTEM_PROMPT}{user_prompt}{self.model}".encode("utf-8")).hexdigest()
+        return os.path.join(self._disk_cache_dir, f"{key}.json")
+    
+    @staticmethod
+    def _read_disk_cache(path: str) -> Optional[List[str]]:
+        """Load a cached gate sequence, treating unreadable or malformed entries as misses."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                gate_sequence = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(gate_sequence, list):
+            return None
+        return gate_sequence
+    
+    @staticmethod
+    def _write_disk_cache(path: str, gate_sequence: List[str]) -> None:
+        """Write a cache entry atomically, so concurrent readers never see a partial file."""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(gate_sequence, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write OpenAI gate cache entry %s: %s", path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _request_circuit_gates(self, user_prompt: str, max_tokens: int) -> List[str]:
+        """Ask OpenAI for a gate sequence, raising if the call or its response is unusable."""
+        response = self.client.chat.completions.create(**self._gate_request_body(user_prompt, max_tokens))
+        
+        # Extract and parse the response
+        return self._parse_or_repair_gate_content(response.choices[0].message.content)
+    
+    def _parse_or_repair_gate_content(self, content: str) -> List[str]:
+        """
+        Parse a gate reply, asking OpenAI once to repair it if it is not valid JSON.
+        
+        The repair call only sends the broken reply back, which is much cheaper than
+        repeating the full prompt and keeps the user's circuit instead of a fallback.
+        """
+        try:
+            return self._parse_gate_content(content)
+        except ValueError:
+            response = self.client.chat.completions.create(**self._repair_request_body(content))
+            return self._parse_gate_content(response.choices[0].message.content)
+    
+    def _gate_request_body(self, user_prompt: str, max_tokens: int) -> Dict[str, Any]:
+        """Chat completion parameters for a gate request, shared by direct and batch calls."""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": _GATE_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": _GATE_RESPONSE_FORMAT,  # Server-enforced {"gates": [...]} JSON
+            "temperature": 0.2,  # Low temperature for consistent outputs
+            "max_tokens": max_tokens  # Bound the response size
         }
-        return default_qubits.get(circuit_type, 3)
     
-    def _get_fallback_circuit_gates(self, circuit_type: CircuitType, params: Dict[str, Any]) -> List[str]:
-        """Provide fallback gate sequences when OpenAI is unavailable."""
-        num_qubits = params.get("num_qubits", self._get_default_qubit_count(circuit_type))
+    def _repair_request_body(self, content: str) -> Dict[str, Any]:
+        """
+        Chat completion parameters asking OpenAI to fix a malformed gate reply.
         
-        # Basic fallback circuits
-        if circuit_type == CircuitType.BELL_STATE:
-            return ["h 0", "cx 0 1"]
+        This uses the full response cap rather than the per-circuit estimate, since the
+        reply being repaired may have been cut off by that estimate.
+        """
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": _GATE_REPAIR_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            "response_format": _GATE_RESPONSE_FORMAT,
+            "temperature": 0,
+            "max_tokens": settings.OPENAI_CIRCUIT_MAX_TOKENS
+        }
+    
+    @staticmethod
+    def _parse_gate_content(content: str) -> List[str]:
+        """Extract the gate list from a completion's message content."""
+        # Unwrap a markdown code fence if the model added one
+        fenced = _FENCE_RE.match(content)
+        content = fenced.group(1) if fenced else content.strip()
         
-        elif circuit_type == CircuitType.GHZ_STATE:
-            gates = ["h 0"]
-            for i in range(num_qubits - 1):
-                gates.append(f"cx {i} {i+1}")
-            return gates
+        # Parse JSON - handle both array and object responses
+        parsed = orjson.loads(content)
+        
+        # Handle case where OpenAI returns an object with a gates key
+        if isinstance(parsed, dict) and "gates" in parsed:
+            gate_sequence = parsed["gates"]
+        # Handle case where OpenAI returns just the array
+        elif isinstance(parsed, list):
+            gate_sequence = parsed
+        else:
+            raise ValueError("Unexpected response format")
+        
+        return gate_sequence
+    
+    def _create_circuit_prompt(self, circuit_type: CircuitType, params: Dict[str, Any]) -> str:
+        """Create a prompt for OpenAI based on circuit type and parameters."""
+        num_qubits = params.get("num_qubits", self._get_default_qubit_count(circuit_type))
         
-        elif circuit_type == CircuitType.TELEPORTATION:
-            return ["h 1", "cx 1 2", "cx 0 1", "h 0", "measure 0", "measure 1", "cx 1 2", "cz 0 2"]
+        template = _PROMPT_TEMPLATES.get(circuit_type, _DEFAULT_PROMPT_TEMPLATE)
+        return template.format_map({
+            "circuit_type": circuit_type.value,
+            "num_qubits": num_qubits,
+            "zeros": "0" * num_qubits,
+            "ones": "1" * num_qubits,
+            "oracle_type": params.get("oracle_type", "balanced"),
+            "secret": params.get("secret_string") or "101",  # Default secret string
+            "marked_state": params.get("marked_state") or "101",  # Default marked state
+        })
+    
+    def _estimate_max_tokens(self, circuit_type: CircuitType, params: Dict[str, Any]) -> int:
+        """Response token cap for a circuit, from a rough upper bound on its gate count."""
+        num_qubits = params.get("num_qubits")
+        if not isinstance(num_qubits, int) or num_qubits < 1:
+            num_qubits = self._get_default_qubit_count(circuit_type)
         
-        elif circuit_type == CircuitType.QFT:
-            # Simple 3-qubit QFT
-            return ["h 0", "cp 0 1 1.5708", "cp 0 2 0.7854", "h 1", "cp 1 2 1.5708", "h 2", "swap 0 2"]
+        if circuit_type == CircuitType.GROVERS:
+            # Oracle and diffusion of a few gates per qubit, repeated ~pi/4 * sqrt(2^n) times.
+            # Anything past 16 qubits is far over the cap, so the shift is bounded there.
+            iterations = max(1, int(math.pi/4 * math.sqrt(1 << min(num_qubits, 16))))
+            gate_count = _GATES_PER_QUBIT * num_qubits * iterations
+        elif circuit_type in _QUADRATIC_GATE_TYPES:
+            # A controlled rotation for each pair of qubits
+            gate_count = num_qubits * num_qubits
+        else:
+            gate_count = _GATES_PER_QUBIT * num_qubits
+        gate_count += num_qubits  # Measurements
         
-        # For other circuit types, return a basic circuit that at least creates entanglement
-        gates = ["h 0"]
-        for i in range(min(3, num_qubits) - 1):
-            gates.append(f"cx {i} {i+1}")
-        return gates
\ No newline at end of file
+        return min(settings.OPENAI_CIRCUIT_MAX_TOKENS, _BASE_GATE_TOKENS + _TOKENS_PER_GATE * gate_count)
+    
+    def _get_default_qubit_count(self, circuit_type: CircuitType) -> int:
+        """Get the default number of qubits for a given circuit type."""
+        return _DEFAULT_QUBITS.get(circuit_type, 3)
+    
+    def _get_fallback_circuit_gates(self, circuit_type: CircuitType, params: Dict[str, Any]) -> List[str]:
+        """Provide fallback gate sequences when OpenAI is unavailable."""
+        num_qubits = params.get("num_qubits", self._get_default_qubit_count(circuit_type))
+        return _FALLBACK_GATES.get(circuit_type, _entangling_fallback)(num_qubits)
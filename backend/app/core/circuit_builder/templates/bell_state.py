@@ -1,4 +1,5 @@
 # app/core/circuit_builder/templates/bell_state.py
+import functools
 from qiskit import QuantumCircuit
 
 def create_bell_state(num_qubits=2):
@@ -6,6 +7,12 @@ def create_bell_state(num_qubits=2):
     Create a Bell state circuit.
     Default is using 2 qubits to create |Φ+⟩ = (|00⟩ + |11⟩)/√2
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_bell_state(num_qubits).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_bell_state(num_qubits=2):
+    """Build the circuit for create_bell_state. The result is shared, so it must not be modified."""
     # Basic error checking
     if num_qubits < 2:
         raise ValueError("Bell state requires at least 2 qubits")
@@ -20,7 +27,6 @@ def create_bell_state(num_qubits=2):
     qc.cx(0, 1)
     
     # Measure qubits
-    for i in range(num_qubits):
-        qc.measure(i, i)
+    qc.measure(range(num_qubits), range(num_qubits))
     
-    return qc
\ No newline at end of file
+    return qc
@@ -1,7 +1,8 @@
 # app/core/circuit_builder/templates/bernstein_vazirani.py
+import functools
 from qiskit import QuantumCircuit
 
-def create_bernstein_vazirani_circuit(num_qubits=3, secret_string=None):
+def create_bernstein_vazirani_circuit(num_qubits=3, secret_string=None, debug=False):
     """
     Create a Bernstein-Vazirani algorithm circuit.
     
@@ -9,16 +10,29 @@ def create_bernstein_vazirani_circuit(num_qubits=3, secret_string=None):
         num_qubits (int): Number of qubits (excluding ancilla qubit).
         secret_string (str): Binary string representing the secret (e.g., '101').
                             If None, defaults to alternating 1s and 0s.
+        debug (bool): Add barriers around the oracle, as visual markers.
         
     Returns:
         QuantumCircuit: A Qiskit circuit implementing the Bernstein-Vazirani algorithm.
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_bernstein_vazirani_circuit(num_qubits, secret_string, debug).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_bernstein_vazirani_circuit(num_qubits=3, secret_string=None, debug=False):
+    """Build the circuit for create_bernstein_vazirani_circuit. The result is shared, so it must not be modified."""
+    if num_qubits < 1:
+        raise ValueError("Bernstein-Vazirani requires at least 1 input qubit")
+    
     # If no secret string is provided, create one (alternating 1s and 0s)
     if secret_string is None:
         secret_string = ''.join(['1' if i % 2 == 0 else '0' for i in range(num_qubits)])
     
-    # Convert to binary and ensure the right length
-    secret_string = format(int(secret_string, 2), f'0{num_qubits}b')
+    # Convert to binary and ensure the right length, unless it already is an n-bit string
+    if len(secret_string) != num_qubits or any(c not in '01' for c in secret_string):
+        secret_string = format(int(secret_string, 2), f'0{num_qubits}b')
+        if len(secret_string) != num_qubits or '-' in secret_string:
+            raise ValueError(f"Secret string '{secret_string}' does not fit in {num_qubits} qubits")
     
     # We need n+1 qubits, where the last qubit is the ancilla
     total_qubits = num_qubits + 1
@@ -30,24 +44,23 @@ def create_bernstein_vazirani_circuit(num_qubits=3, secret_string=None):
     qc.x(num_qubits)
     
     # Apply Hadamard gates to all qubits
-    for qubit in range(total_qubits):
-        qc.h(qubit)
+    qc.h(range(total_qubits))
     
-    qc.barrier()
+    if debug:
+        qc.barrier()
     
-    # Implement the oracle based on the secret string
-    for qubit, bit in enumerate(secret_string):
-        if bit == '1':
-            qc.cx(qubit, num_qubits)
+    # Implement the oracle based on the secret string: a CNOT onto the ancilla from each 1 bit
+    ones = [qubit for qubit, bit in enumerate(secret_string) if bit == '1']
+    if ones:
+        qc.cx(ones, num_qubits)
     
-    qc.barrier()
+    if debug:
+        qc.barrier()
     
     # Apply Hadamard gates to the input qubits
-    for qubit in range(num_qubits):
-        qc.h(qubit)
+    qc.h(range(num_qubits))
     
     # Measure the input qubits
-    for qubit in range(num_qubits):
-        qc.measure(qubit, qubit)
+    qc.measure(range(num_qubits), range(num_qubits))
     
     return qc
\ No newline at end of file
@@ -1,17 +1,28 @@
 # app/core/circuit_builder/templates/deutsch_jozsa.py
+import functools
 from qiskit import QuantumCircuit
 
-def create_deutsch_jozsa_circuit(num_qubits=3, oracle_type='balanced'):
+def create_deutsch_jozsa_circuit(num_qubits=3, oracle_type='balanced', debug=False):
     """
     Create a Deutsch-Jozsa algorithm circuit.
     
     Args:
         num_qubits (int): Number of qubits (excluding ancilla qubit).
         oracle_type (str): Type of oracle - 'constant' or 'balanced'.
+        debug (bool): Add barriers around the oracle, as visual markers.
         
     Returns:
         QuantumCircuit: A Qiskit circuit implementing the Deutsch-Jozsa algorithm.
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_deutsch_jozsa_circuit(num_qubits, oracle_type, debug).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_deutsch_jozsa_circuit(num_qubits=3, oracle_type='balanced', debug=False):
+    """Build the circuit for create_deutsch_jozsa_circuit. The result is shared, so it must not be modified."""
+    if num_qubits < 1:
+        raise ValueError("Deutsch-Jozsa requires at least 1 input qubit")
+    
     # We need n+1 qubits, where the last qubit is the ancilla
     total_qubits = num_qubits + 1
     
@@ -22,10 +33,10 @@ def create_deutsch_jozsa_circuit(num_qubits=3, oracle_type='balanced'):
     qc.x(num_qubits)
     
     # Apply Hadamard to all qubits
-    for qubit in range(total_qubits):
-        qc.h(qubit)
+    qc.h(range(total_qubits))
     
-    qc.barrier()
+    if debug:
+        qc.barrier()
     
     # Implement the oracle
     if oracle_type == 'constant':
@@ -35,17 +46,15 @@ def create_deutsch_jozsa_circuit(num_qubits=3, oracle_type='balanced'):
     else:  # 'balanced'
         # For balanced function, create a balanced oracle
         # Here's a simple balanced oracle: CNOT gates from each input qubit to the ancilla
-        for qubit in range(num_qubits):
-            qc.cx(qubit, num_qubits)
+        qc.cx(range(num_qubits), num_qubits)
     
-    qc.barrier()
+    if debug:
+        qc.barrier()
     
     # Apply Hadamard to input qubits
-    for qubit in range(num_qubits):
-        qc.h(qubit)
+    qc.h(range(num_qubits))
     
     # Measure the input qubits
-    for qubit in range(num_qubits):
-        qc.measure(qubit, qubit)
+    qc.measure(range(num_qubits), range(num_qubits))
     
     return qc
\ No newline at end of file
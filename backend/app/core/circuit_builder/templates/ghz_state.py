@@ -1,4 +1,5 @@
 # app/core/circuit_builder/templates/ghz_state.py
+import functools
 from qiskit import QuantumCircuit
 
 def create_ghz_state(num_qubits=3):
@@ -6,6 +7,12 @@ def create_ghz_state(num_qubits=3):
     Create a GHZ state circuit: |GHZ⟩ = (|00...0⟩ + |11...1⟩)/√2
     Default is creating a 3-qubit GHZ state
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_ghz_state(num_qubits).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_ghz_state(num_qubits=3):
+    """Build the circuit for create_ghz_state. The result is shared, so it must not be modified."""
     if num_qubits < 3:
         raise ValueError("GHZ state typically requires at least 3 qubits")
     
@@ -14,12 +21,10 @@ def create_ghz_state(num_qubits=3):
     # Apply Hadamard to the first qubit
     qc.h(0)
     
-    # Apply CNOT gates to entangle all qubits
-    for i in range(num_qubits-1):
-        qc.cx(i, i+1)
+    # Apply CNOT gates to entangle all qubits, as one broadcast chain i -> i+1
+    qc.cx(range(num_qubits-1), range(1, num_qubits))
     
     # Measure qubits
-    for i in range(num_qubits):
-        qc.measure(i, i)
+    qc.measure(range(num_qubits), range(num_qubits))
     
-    return qc
\ No newline at end of file
+    return qc
@@ -1,8 +1,10 @@
 # app/core/circuit_builder/templates/grovers.py
+import functools
+import math
 from qiskit import QuantumCircuit
-import numpy as np
+from qiskit.circuit.library import MCXGate
 
-def create_grovers_circuit(num_qubits=3, marked_state=None):
+def create_grovers_circuit(num_qubits=3, marked_state=None, debug=False):
     """
     Create a Grover's algorithm circuit.
     
@@ -10,68 +12,85 @@ def create_grovers_circuit(num_qubits=3, marked_state=None):
         num_qubits (int): Number of qubits.
         marked_state (str): Binary string representing the marked state (e.g., '101').
                            If None, defaults to all 1s.
+        debug (bool): Add barriers around each oracle and diffusion step, as visual markers.
                            
     Returns:
         QuantumCircuit: A Qiskit circuit implementing Grover's algorithm.
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_grovers_circuit(num_qubits, marked_state, debug).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_grovers_circuit(num_qubits=3, marked_state=None, debug=False):
+    """Build the circuit for create_grovers_circuit. The result is shared, so it must not be modified."""
+    if num_qubits < 2:
+        raise ValueError("Grover's algorithm requires at least 2 qubits")
+    
     # If no marked state is provided, default to all 1s
     if marked_state is None:
         marked_state = '1' * num_qubits
     
-    # Convert to binary and ensure the right length
-    marked_state = format(int(marked_state, 2), f'0{num_qubits}b')
+    # Convert to binary and ensure the right length, unless it already is an n-bit string
+    if len(marked_state) != num_qubits or any(c not in '01' for c in marked_state):
+        marked_state = format(int(marked_state, 2), f'0{num_qubits}b')
+        if len(marked_state) != num_qubits or '-' in marked_state:
+            raise ValueError(f"Marked state '{marked_state}' does not fit in {num_qubits} qubits")
     
     # Calculate the optimal number of iterations
-    iterations = int(np.floor(np.pi/4 * np.sqrt(2**num_qubits)))
+    iterations = int(math.pi/4 * math.sqrt(1 << num_qubits))
     
     # Create a circuit with num_qubits qubits
     qc = QuantumCircuit(num_qubits, num_qubits)
     
+    # Loop invariants: the qubits flipped around the oracle, and one multi-controlled X
+    # shared by every oracle and diffusion step, so its decomposition is built only once
+    zero_bits = [qubit for qubit, bit in enumerate(marked_state) if bit == '0']
+    all_qubits = list(range(num_qubits))
+    mcx = MCXGate(num_qubits - 1) if num_qubits > 2 else None
+    
     # Initialize: Apply Hadamard to all qubits
-    qc.h(range(num_qubits))
+    qc.h(all_qubits)
     
     # Perform Grover iterations
     for _ in range(iterations):
-        # Phase Oracle: Mark the target state
-        # We'll use a multi-controlled Z gate for this
-        # For simplicity, we'll just add a barrier and comment
-        qc.barrier()
-        # In a real implementation, you would implement the oracle based on the marked state
-        # Here we'll use a simple placeholder for illustration
-        for qubit, bit in enumerate(marked_state):
-            if bit == '0':
-                qc.x(qubit)
+        # Phase Oracle: Mark the target state by flipping its 0 bits, so it becomes
+        # |11...1⟩, and applying a multi-controlled Z
+        if debug:
+            qc.barrier()
+        if zero_bits:
+            qc.x(zero_bits)
         
-        # Apply a multi-controlled Z gate (simplified representation)
-        if num_qubits > 2:
+        # Apply a multi-controlled Z gate (H-MCX-H on the last qubit)
+        if mcx is not None:
             qc.h(num_qubits-1)
-            qc.mct(list(range(num_qubits-1)), num_qubits-1)
+            qc.append(mcx, all_qubits)
             qc.h(num_qubits-1)
         else:
             qc.cz(0, 1)
         
-        for qubit, bit in enumerate(marked_state):
-            if bit == '0':
-                qc.x(qubit)
+        if zero_bits:
+            qc.x(zero_bits)
         
-        qc.barrier()
+        if debug:
+            qc.barrier()
         
         # Diffusion operator
-        qc.h(range(num_qubits))
-        qc.x(range(num_qubits))
+        qc.h(all_qubits)
+        qc.x(all_qubits)
         
         # Apply multi-controlled Z
-        if num_qubits > 2:
+        if mcx is not None:
             qc.h(num_qubits-1)
-            qc.mct(list(range(num_qubits-1)), num_qubits-1)
+            qc.append(mcx, all_qubits)
             qc.h(num_qubits-1)
         else:
             qc.cz(0, 1)
         
-        qc.x(range(num_qubits))
-        qc.h(range(num_qubits))
+        qc.x(all_qubits)
+        qc.h(all_qubits)
         
-        qc.barrier()
+        if debug:
+            qc.barrier()
     
     # Measure all qubits
     qc.measure(range(num_qubits), range(num_qubits))
@@ -1,6 +1,7 @@
 # app/core/circuit_builder/templates/qft.py
+import functools
 from qiskit import QuantumCircuit
-import numpy as np
+from qiskit.circuit.library import QFT
 
 def create_qft_circuit(num_qubits=3):
     """
@@ -12,21 +13,21 @@ def create_qft_circuit(num_qubits=3):
     Returns:
         QuantumCircuit: A Qiskit circuit implementing the QFT.
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_qft_circuit(num_qubits).copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_qft_circuit(num_qubits=3):
+    """Build the circuit for create_qft_circuit. The result is shared, so it must not be modified."""
     qc = QuantumCircuit(num_qubits)
     
-    # Implement QFT
-    for i in range(num_qubits):
-        qc.h(i)
-        for j in range(i+1, num_qubits):
-            # Add controlled phase rotations
-            # The phase angle is 2π/2^(j-i+1)
-            qc.cp(2*np.pi/2**(j-i+1), j, i)
-    
-    # Swap qubits (optional - to match standard QFT definition)
-    for i in range(num_qubits//2):
-        qc.swap(i, num_qubits-i-1)
+    # Append the library QFT's gates (Hadamards, controlled phase rotations and the final
+    # swaps), decomposed one level so they are drawn and exported as individual gates.
+    # Qiskit's QFT starts from the highest qubit, so it goes on the qubits in reverse to
+    # start from qubit 0 as this template always has.
+    qc.compose(QFT(num_qubits, do_swaps=True).decompose(), list(reversed(range(num_qubits))), inplace=True)
     
     # Add measurements (optional)
     qc.measure_all()
     
-    return qc
\ No newline at end of file
+    return qc
@@ -1,4 +1,5 @@
 # app/core/circuit_builder/templates/teleportation.py (updated)
+import functools
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
 
 def create_teleportation_circuit():
@@ -7,6 +8,12 @@ def create_teleportation_circuit():
     
     Teleports the state of qubit 0 to qubit 2 using entanglement and classical communication.
     """
+    # Built circuits are cached per argument set; hand out copies so callers may modify them
+    return _build_teleportation_circuit().copy()
+
+@functools.lru_cache(maxsize=128)
+def _build_teleportation_circuit():
+    """Build the circuit for create_teleportation_circuit. The result is shared, so it must not be modified."""
     # Create quantum registers
     qr = QuantumRegister(3, 'q')
     crz = ClassicalRegister(1, 'crz')
@@ -27,11 +34,10 @@ def create_teleportation_circuit():
     qc.measure(qr[0], crz[0])
     qc.measure(qr[1], crx[0])
     
-    # Step 4: Apply corrections on qubit 2 based on measurement outcomes
-    # Corrected conditional syntax
-    with qc.if_test((crx, 1)):  # Use with statement for conditional operations
-        qc.x(qr[2])
-    with qc.if_test((crz, 1)):
-        qc.z(qr[2])
+    # Step 4: Apply corrections on qubit 2 based on measurement outcomes. Classically
+    # conditioned gates rather than if_test blocks, since OpenQASM 2 and the JSON/IBMQ
+    # exports can represent them
+    qc.x(qr[2]).c_if(crx, 1)
+    qc.z(qr[2]).c_if(crz, 1)
     
-    return qc
\ No newline at end of file
+    return qc
@@ -0,0 +1,19 @@
+# app/core/cpu_pool.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from ..config import settings
+
+# Dedicated pool for blocking qiskit/matplotlib/OpenAI work, so fanning out a request's
+# stages doesn't starve the default executor that serves FastAPI's sync endpoints
+CPU_POOL = ThreadPoolExecutor(
+    max_workers=settings.CPU_POOL_WORKERS,
+    thread_name_prefix="circuit-cpu"
+)
+
+async def run_in_cpu_pool(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable on CPU_POOL and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(
+        CPU_POOL, functools.partial(fn, *args, **kwargs)
+    )
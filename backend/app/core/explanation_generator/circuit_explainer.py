@@ -1,52 +1,93 @@
 # Modified app/core/explanation_generator/circuit_explainer.py
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import os
+import re
+import copy
+import logging
+import itertools
+import asyncio
+import hashlib
+from collections import OrderedDict
 from ..nlp_processor.intent_parser import CircuitType, CircuitIntent
+from ..lru_cache import lru_get, lru_put
+from ...config import settings
 from qiskit import QuantumCircuit
-from openai import OpenAI
+from pydantic import BaseModel, ValidationError
+from ..openai_clients import get_async_openai_client
 import json
+import orjson
 
-class CircuitExplainer:
-    """Generates educational explanations for quantum circuits."""
+logger = logging.getLogger(__name__)
+
+# OpenAI explanations keyed by explanation_cache_key, shared by every explainer instance
+_EXPLANATION_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def explanation_cache_key(kind: str, *parts: Any) -> str:
+    """Hash the canonical JSON of an explanation request into a cache key."""
+    payload = json.dumps([kind, *parts], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def get_cached_explanation(key: str) -> Optional[Dict[str, Any]]:
+    """Return a copy of a cached explanation, or None."""
+    explanation = lru_get(_EXPLANATION_CACHE, key)
+    return copy.deepcopy(explanation) if explanation is not None else None
+
+def cache_explanation(key: str, explanation: Dict[str, Any]) -> None:
+    """Remember a successfully parsed OpenAI explanation."""
+    explanation = copy.deepcopy(explanation)
+    lru_put(_EXPLANATION_CACHE, key, explanation, settings.EXPLANATION_CACHE_SIZE)
+
+def canonical_operations(operations: List[Tuple[str, List[int]]]) -> List[List[Any]]:
+    """
+    Normalize an operation list so reorderings of independent gates compare equal.
     
-    def __init__(self, api_key=None):
-        # Use provided API key or environment variable
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        
-        # Initialize OpenAI client if API key is available
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-            print(f"OpenAI API key found and loaded for CircuitExplainer")
-        else:
-            self.client = None
-            print("Warning: No OpenAI API key found. Cannot generate circuit explanations.")
+    Each operation is placed in the earliest layer after every earlier operation on its
+    qubits, and operations within a layer, which act on disjoint qubits and so commute,
+    are sorted. Circuits that only differ in that order get the same explanation.
+    """
+    qubit_depth: Dict[int, int] = {}
+    layers: List[List[List[Any]]] = []
+    for name, qubits in operations:
+        layer = max((qubit_depth.get(q, 0) for q in qubits), default=0)
+        for q in qubits:
+            qubit_depth[q] = layer + 1
+        if layer == len(layers):
+            layers.append([])
+        layers[layer].append([name, list(qubits)])
+    return [op for layer in layers for op in sorted(layer, key=lambda op: (op[1], op[0]))]
+
+# Operation lists longer than this are run-length compressed in explanation prompts
+COMPRESS_OPERATIONS_THRESHOLD = 16
+
+def compress_operations(operations: List[Tuple[str, List[int]]]) -> List[str]:
+    """
+    Run-length encode an operation list as prompt lines, shrinking structured circuits.
     
-    def generate_explanation(self, intent: CircuitIntent, circuit: QuantumCircuit) -> Dict[str, Any]:
-        """Generate an explanation for a quantum circuit using OpenAI."""
-        # Check if OpenAI client is available
-        if not self.client:
-            return {
-                "title": "API Configuration Error",
-                "summary": "OpenAI API key is not configured. Please check your environment variables or provide a key.",
-                "gates": [],
-                "applications": [],
-                "educational_value": "",
-                "error": "OpenAI API key not found"
-            }
-        
-        try:
-            # Prepare circuit information for the prompt
-            circuit_details = {
-                "type": intent.circuit_type.value,
-                "num_qubits": circuit.num_qubits,
-                "operations": [
-                    {"name": instruction.name, "qubits": [q.index for q in qargs]}
-                    for instruction, qargs, _ in circuit.data
-                ]
-            }
-            
-            # Define the system prompt for OpenAI
-            system_prompt = """
+    Consecutive applications of one gate share a line listing each one's qubits, e.g.
+    "cx [0, 1] [1, 2]". More than two in a row on consecutive single qubits are written
+    as a range, e.g. "h [0..9]".
+    """
+    lines = []
+    for name, run in itertools.groupby(operations, key=lambda op: op[0]):
+        qubit_lists = [qubits for _, qubits in run]
+        items = []
+        i = 0
+        while i < len(qubit_lists):
+            end = i + 1
+            if len(qubit_lists[i]) == 1:
+                first = qubit_lists[i][0]
+                while end < len(qubit_lists) and qubit_lists[end] == [first + end - i]:
+                    end += 1
+            if end - i > 2:
+                items.append(f"[{first}..{first + end - i - 1}]")
+            else:
+                items.extend(str(qubits) for qubits in qubit_lists[i:end])
+            i = end
+        lines.append(f"{name} {' '.join(items)}")
+    return lines
+
+# System prompt for a whole circuit explanation, gates included, used by batch jobs
+_SYSTEM_PROMPT = """
             You are a quantum computing professor creating educational content.
             Generate an explanation for a quantum circuit that is:
             1. Educational and suitable for students
@@ -76,63 +117,412 @@ class CircuitExplainer:
             
             Ensure that your response is properly formatted as valid JSON with no additional text.
             """
+
+# System prompt for everything in a circuit explanation but its gates, which are
+# explained separately per gate signature and shared between circuits
+_OVERVIEW_SYSTEM_PROMPT = """
+            You are a quantum computing professor creating educational content.
+            Generate an explanation for a quantum circuit that is:
+            1. Educational and suitable for students
+            2. Clear in explaining what the circuit does as a whole
+            3. Includes practical applications
             
-            user_prompt = f"""
-            Please explain this quantum circuit of type {intent.circuit_type.value}:
+            IMPORTANT: You must respond ONLY with a valid JSON object containing the following fields:
+            {
+              "title": "A descriptive title for the circuit",
+              "summary": "A brief overview of what the circuit does (1-2 paragraphs)",
+              "applications": [
+                "application 1",
+                "application 2",
+                // 3-5 practical applications
+              ],
+              "educational_value": "The educational importance of this circuit (1 paragraph)"
+            }
             
-            Number of qubits: {circuit.num_qubits}
-            Gate operations: {circuit_details['operations']}
+            Ensure that your response is properly formatted as valid JSON with no additional text.
+            """
+
+# System prompt for the explanation of a single gate
+_GATE_SYSTEM_PROMPT = """
+            You are a quantum computing professor creating educational content.
+            Explain a single quantum gate to students learning quantum computing, with an
+            intuitive analogy to help understanding.
             
-            Provide an explanation tailored for students learning quantum computing. Be educational, clear, and include helpful analogies.
+            IMPORTANT: You must respond ONLY with a valid JSON object containing the following fields:
+            {
+              "explanation": "detailed explanation of the gate's quantum effect",
+              "analogy": "intuitive analogy to help understand the gate"
+            }
+            
+            Ensure that your response is properly formatted as valid JSON with no additional text.
             """
+
+class ExplainedGate(BaseModel):
+    """One gate entry of an OpenAI explanation reply."""
+    gate: str = ""
+    explanation: str = ""
+    analogy: Optional[str] = ""
+
+class Explanation(BaseModel):
+    """
+    An OpenAI explanation reply.
+    
+    model_validate_json parses and validates a reply in one pydantic-core pass. Every
+    field has a default so partial replies validate; dump them with exclude_unset=True
+    so callers still see which fields the model left out.
+    """
+    title: str = ""
+    summary: str = ""
+    gates: List[ExplainedGate] = []
+    applications: List[str] = []
+    educational_value: str = ""
+
+# Fields of every error explanation; error_explanation fills in the rest
+_ERROR_EXPLANATION = Explanation().model_dump()
+
+def error_explanation(title: str, summary: str, error: str) -> Dict[str, Any]:
+    """A fresh explanation dict reporting an error."""
+    return dict(_ERROR_EXPLANATION, title=title, summary=summary, gates=[], applications=[], error=error)
+
+# Per-gate explanations keyed by gate_signature, shared by every explainer instance
+_GATE_EXPLANATION_CACHE: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+
+def gate_signature(operation: Any) -> Tuple[str, int]:
+    """
+    Identify a circuit operation for its gate explanation by (name, qubit count).
+    
+    Parameters are left out, so every rotation angle of a gate shares one explanation,
+    while e.g. multi-controlled gates with different numbers of controls do not.
+    """
+    return operation.name, operation.num_qubits
+
+def gate_signatures(circuit: QuantumCircuit) -> List[Tuple[str, int]]:
+    """The distinct gate signatures in a circuit, in order of first use, without barriers."""
+    signatures = dict.fromkeys(
+        gate_signature(instruction.operation)
+        for instruction in circuit.data
+        if instruction.operation.name != "barrier"
+    )
+    return list(signatures)
+
+def get_cached_gate_explanation(signature: Tuple[str, int]) -> Optional[Dict[str, Any]]:
+    """Return a copy of a cached gate explanation, or None."""
+    explanation = lru_get(_GATE_EXPLANATION_CACHE, signature)
+    return dict(explanation) if explanation is not None else None
+
+def gate_explanation_request(signature: Tuple[str, int]) -> Dict[str, Any]:
+    """Chat completion parameters explaining one gate."""
+    name, num_qubits = signature
+    qubits = "qubit" if num_qubits == 1 else "qubits"
+    return {
+        "model": settings.OPENAI_EXPLANATION_MODEL,
+        "messages": [
+            {"role": "system", "content": _GATE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Please explain the quantum gate: {name} (acting on {num_qubits} {qubits})"}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.7
+    }
+
+def parse_gate_explanation(signature: Tuple[str, int], content: str) -> Dict[str, Any]:
+    """
+    Parse and cache an OpenAI gate explanation as a {gate, explanation, analogy} entry.
+    
+    Raises ValueError (pydantic.ValidationError) if the reply is not a valid gate entry.
+    """
+    reply = ExplainedGate.model_validate_json(content)
+    explanation = {
+        "gate": signature[0],
+        "explanation": reply.explanation,
+        "analogy": reply.analogy,
+    }
+    lru_put(_GATE_EXPLANATION_CACHE, signature, explanation, settings.GATE_EXPLANATION_CACHE_SIZE)
+    return dict(explanation)
+
+def missing_key_explanation() -> Dict[str, Any]:
+    """Explanation returned when no OpenAI API key is configured."""
+    return error_explanation(
+        "API Configuration Error",
+        "OpenAI API key is not configured. Please check your environment variables or provide a key.",
+        "OpenAI API key not found",
+    )
+
+def failed_explanation(e: Exception) -> Dict[str, Any]:
+    """Explanation returned when generating one raised."""
+    logger.warning("Error in OpenAI explanation generation: %s", e)
+    return error_explanation(
+        "Explanation Generation Error",
+        "There was a problem generating the explanation.",
+        f"Error: {str(e)}",
+    )
+
+def parse_explanation(content: str, cache_key: Optional[str]) -> Dict[str, Any]:
+    """Parse an OpenAI explanation reply, caching it under cache_key (if any) when it is a valid Explanation."""
+    logger.debug("Received explanation from OpenAI, content length: %d", len(content))
+    
+    try:
+        # Requests use JSON mode, so the reply is bare JSON (surrounding whitespace is fine)
+        explanation = Explanation.model_validate_json(content).model_dump(exclude_unset=True)
+        if cache_key is not None:
+            cache_explanation(cache_key, explanation)
+        return explanation
+    except ValidationError as e:
+        logger.warning("Failed to parse JSON explanation: %s", e)
+        # Return error information
+        return error_explanation(
+            "JSON Parsing Error",
+            "There was a problem parsing the explanation from OpenAI.",
+            f"JSON parsing error: {str(e)}",
+        )
+
+# A complete top-level text field in a streamed explanation; group 2 is its JSON string literal
+_STREAMED_FIELD_RE = re.compile(r'"(title|summary|educational_value)"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+class CircuitExplainer:
+    """Generates educational explanations for quantum circuits."""
+    
+    def __init__(self, api_key=None):
+        # Use provided API key or environment variable
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        
+        # Initialize the OpenAI client if API key is available. It retries rate limits,
+        # server errors and dropped connections with exponential backoff.
+        if self.api_key:
+            self.async_client = get_async_openai_client(self.api_key)
+            logger.debug("OpenAI API key found and loaded for CircuitExplainer")
+        else:
+            self.async_client = None
+            logger.warning("No OpenAI API key found. Cannot generate circuit explanations.")
+    
+    async def agenerate_explanation(self, intent: CircuitIntent, circuit: QuantumCircuit) -> Dict[str, Any]:
+        """
+        Generate an explanation for a quantum circuit using OpenAI.
+        
+        The title, summary, applications and educational value come from one request
+        about the circuit; each distinct gate is explained by its own cached request,
+        all awaited concurrently.
+        """
+        if not self.async_client:
+            return missing_key_explanation()
+        
+        try:
+            cache_key, request = self._explanation_request(intent, circuit)
+            cached = get_cached_explanation(cache_key)
+            if cached is not None:
+                return cached
             
-            # Call OpenAI API
-            print(f"Calling OpenAI API for {intent.circuit_type.value} circuit explanation...")
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},  # Request JSON format
-                temperature=0.7  # Some creativity for analogies
+            logger.debug("Calling OpenAI API for %s circuit explanation...", intent.circuit_type.value)
+            response, (gates, gates_complete) = await asyncio.gather(
+                self.async_client.chat.completions.create(**request),
+                self._aexplain_gates(gate_signatures(circuit)),
             )
+            explanation = parse_explanation(response.choices[0].message.content, None)
+            if "error" in explanation:
+                return explanation
+            explanation["gates"] = gates
+            if gates_complete:
+                cache_explanation(cache_key, explanation)
+            return explanation
+        except Exception as e:
+            return failed_explanation(e)
+    
+    async def stream_explanation(self, intent: CircuitIntent, circuit: QuantumCircuit) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an explanation while OpenAI writes it.
+        
+        Yields a one-key {field: value} fragment for the title, summary and
+        educational_value as soon as each is complete, so they can be shown before the
+        rest arrives. The last item is always the complete explanation, as
+        agenerate_explanation would return it. Cached explanations and errors are
+        yielded as that last item only.
+        """
+        if not self.async_client:
+            yield missing_key_explanation()
+            return
+        
+        gates_task = None
+        try:
+            cache_key, request = self._explanation_request(intent, circuit)
+            cached = get_cached_explanation(cache_key)
+            if cached is not None:
+                yield cached
+                return
             
-            # Extract and parse the response
-            content = response.choices[0].message.content
-            print(f"Received explanation from OpenAI, content length: {len(content)}")
+            # Gate explanations are fetched while the rest streams
+            gates_task = asyncio.ensure_future(self._aexplain_gates(gate_signatures(circuit)))
+            logger.debug("Streaming OpenAI explanation for %s circuit...", intent.circuit_type.value)
+            stream = await self.async_client.chat.completions.create(**request, stream=True)
+            content = ""
+            pos = 0  # Where to look for the next complete field
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                content += delta
+                for match in _STREAMED_FIELD_RE.finditer(content, pos):
+                    pos = match.end()
+                    yield {match.group(1): orjson.loads(match.group(2))}
             
-            try:
-                # Clean up response if needed
-                content = content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                
-                # Parse JSON
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON explanation: {e}")
-                # Return error information
-                return {
-                    "title": "JSON Parsing Error",
-                    "summary": "There was a problem parsing the explanation from OpenAI.",
-                    "gates": [],
-                    "applications": [],
-                    "educational_value": "",
-                    "error": f"JSON parsing error: {str(e)}"
-                }
-                
+            explanation = parse_explanation(content, None)
+            if "error" not in explanation:
+                explanation["gates"], gates_complete = await gates_task
+                if gates_complete:
+                    cache_explanation(cache_key, explanation)
         except Exception as e:
-            print(f"Error in OpenAI explanation generation: {str(e)}")
-            # Return error information
-            return {
-                "title": "Explanation Generation Error",
-                "summary": "There was a problem generating the explanation.",
-                "gates": [],
-                "applications": [],
-                "educational_value": "",
-                "error": f"Error: {str(e)}"
-            }
\ No newline at end of file
+            yield failed_explanation(e)
+            return
+        finally:
+            if gates_task is not None:
+                gates_task.cancel()
+        
+        yield explanation
+    
+    async def _aexplain_gates(self, signatures: List[Tuple[str, int]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Explain each gate signature, requesting the ones not cached concurrently.
+        
+        A gate whose request or reply fails is left out rather than failing the whole
+        explanation. Returns the gate entries and whether none were left out.
+        """
+        gates = {signature: get_cached_gate_explanation(signature) for signature in signatures}
+        missing = [signature for signature, explanation in gates.items() if explanation is None]
+        if missing:
+            logger.debug("Calling OpenAI API for %d gate explanation(s)...", len(missing))
+            results = await asyncio.gather(
+                *(self._aexplain_gate(signature) for signature in missing), return_exceptions=True
+            )
+            for signature, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logger.warning("Error explaining gate %s: %s", signature[0], result)
+                else:
+                    gates[signature] = result
+        explained = [gates[signature] for signature in signatures if gates[signature] is not None]
+        return explained, len(explained) == len(signatures)
+    
+    async def _aexplain_gate(self, signature: Tuple[str, int]) -> Dict[str, Any]:
+        """Request and parse the explanation of one gate."""
+        response = await self.async_client.chat.completions.create(**gate_explanation_request(signature))
+        return parse_gate_explanation(signature, response.choices[0].message.content)
+    
+    async def asubmit_batch(self, pairs: List[Tuple[CircuitIntent, QuantumCircuit]]) -> str:
+        """
+        Submit explanations for many circuits as one OpenAI Batch API job.
+        
+        Batch jobs cost about half as much as the same individual calls but may take up
+        to their 24h completion window, so this is meant for bulk work such as a
+        classroom set. Each request's custom_id is the index of its pair. Returns the
+        batch id to hand to apoll_batch.
+        """
+        if not self.async_client:
+            raise RuntimeError("OpenAI API key not found")
+        
+        batch_lines = []
+        for index, (intent, circuit) in enumerate(pairs):
+            # Batch jobs are not latency bound, so each asks for its gates inline
+            _, request = self._explanation_request(intent, circuit, _SYSTEM_PROMPT)
+            batch_lines.append(json.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": request,
+            }))
+        
+        batch_input = await self.async_client.files.create(
+            file=("circuit_explanation_requests.jsonl", "\n".join(batch_lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.async_client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.debug("Submitted explanation batch %s with %d request(s)", batch.id, len(batch_lines))
+        return batch.id
+    
+    async def apoll_batch(self, batch_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Check on an asubmit_batch job.
+        
+        Returns None while the job is still running, then the explanations keyed by
+        custom_id. A request that failed inside the batch gets an error explanation.
+        Raises RuntimeError if the job itself failed, expired or was cancelled. Batch
+        results are not added to the explanation cache, since their gate entries are
+        not per gate signature.
+        """
+        if not self.async_client:
+            raise RuntimeError("OpenAI API key not found")
+        
+        batch = await self.async_client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"batch {batch_id} ended with status {batch.status}")
+        if batch.status != "completed":
+            return None
+        
+        explanations = {}
+        output_lines = []
+        if batch.output_file_id:
+            output = await self.async_client.files.content(batch.output_file_id)
+            output_lines = output.text.splitlines()
+        for line in output_lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                content = response["body"]["choices"][0]["message"]["content"]
+                explanations[record["custom_id"]] = parse_explanation(content, None)
+            else:
+                error = record.get("error") or response.get("body", {}).get("error")
+                explanations[record["custom_id"]] = failed_explanation(RuntimeError(f"batch request failed: {error}"))
+        return explanations
+    
+    def _explanation_request(
+        self, intent: CircuitIntent, circuit: QuantumCircuit, system_prompt: str = _OVERVIEW_SYSTEM_PROMPT
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the cache key and chat completion parameters explaining a circuit.
+        
+        By default the request leaves out the per-gate explanations; pass _SYSTEM_PROMPT
+        to have them included in the reply.
+        """
+        # Each operation as (name, circuit-wide qubit indices)
+        operations = [
+            (instruction.operation.name, [circuit.find_bit(q).index for q in instruction.qubits])
+            for instruction in circuit.data
+        ]
+        
+        # Equivalent circuits of the same type get the same explanation. Neither the prompt
+        # nor the gate explanations depend on rotation angles, so neither does the key.
+        cache_key = explanation_cache_key(
+            "circuit", intent.circuit_type.value, circuit.num_qubits, canonical_operations(operations)
+        )
+        
+        # One "name [qubits]" line per operation, joined once for the prompt. Long lists
+        # are run-length compressed to keep the prompt small.
+        if len(operations) > COMPRESS_OPERATIONS_THRESHOLD:
+            operations_format = "name [qubits], with repeats of a gate on one line and [a..b] for qubits a to b"
+            operation_lines = compress_operations(operations)
+        else:
+            operations_format = "name [qubits]"
+            operation_lines = [f"{name} {qubits}" for name, qubits in operations]
+        operations_text = "\n".join(operation_lines)
+        
+        user_prompt = f"""
+            Please explain this quantum circuit of type {intent.circuit_type.value}:
+            
+            Number of qubits: {circuit.num_qubits}
+            Gate operations, in order, as {operations_format}:
+{operations_text}
+            
+            Provide an explanation tailored for students learning quantum computing. Be educational, clear, and include helpful analogies.
+            """
+        
+        return cache_key, {
+            "model": settings.OPENAI_EXPLANATION_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_object"},  # Request JSON format
+            "temperature": 0.7  # Some creativity for analogies
+        }
@@ -1,50 +1,47 @@
 # app/core/explanation_generator/custom_circuit_explainer.py
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import os
-import json
+import re
+import logging
 from qiskit import QuantumCircuit
 from ..nlp_processor.intent_parser import CircuitIntent, CircuitType
-from openai import OpenAI
+from .circuit_explainer import (
+    COMPRESS_OPERATIONS_THRESHOLD, explanation_cache_key, get_cached_explanation,
+    missing_key_explanation, failed_explanation, parse_explanation
+)
+from ..openai_clients import get_async_openai_client
+from ...config import settings
 
-class CustomCircuitExplainer:
-    """Generates educational explanations specifically for custom quantum circuits."""
+logger = logging.getLogger(__name__)
+
+# A parameterless single-qubit gate instruction, e.g. "h 3"
+_SINGLE_QUBIT_GATE_RE = re.compile(r"^(\w+) (\d+)$")
+
+def compress_gate_sequence(gates: List[str]) -> List[str]:
+    """
+    Run-length encode a gate sequence for an explanation prompt.
     
-    def __init__(self, api_key=None):
-        # Use provided API key or environment variable
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        
-        # Initialize the OpenAI client if API key is available
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-            print(f"OpenAI API key found and loaded for CustomCircuitExplainer")
+    More than two consecutive single-qubit gates of one kind on consecutive qubits,
+    e.g. "h 0", "h 1", "h 2", become one "h 0..2" entry; other gates are kept as they are.
+    """
+    compressed = []
+    i = 0
+    while i < len(gates):
+        end = i + 1
+        match = _SINGLE_QUBIT_GATE_RE.match(gates[i])
+        if match:
+            name, first = match.group(1), int(match.group(2))
+            while end < len(gates) and gates[end] == f"{name} {first + end - i}":
+                end += 1
+        if end - i > 2:
+            compressed.append(f"{name} {first}..{first + end - i - 1}")
         else:
-            self.client = None
-            print("Warning: No OpenAI API key found. Cannot generate custom circuit explanations.")
-    
-    def explain_circuit(self, intent: CircuitIntent) -> Dict[str, Any]:
-        """Generate a detailed explanation for a custom quantum circuit using OpenAI."""
-        # Check if OpenAI client is available
-        if not self.client:
-            return {
-                "title": "API Configuration Error",
-                "summary": "OpenAI API key is not configured. Please check your environment variables or provide a key.",
-                "gates": [],
-                "applications": [],
-                "educational_value": "",
-                "error": "OpenAI API key not found"
-            }
-            
-        try:
-            # Get relevant data from intent
-            gates = intent.params.get("custom_gates", [])
-            num_qubits = intent.params.get("num_qubits", 2)
-            description = intent.params.get("custom_description", "Custom quantum circuit")
-            
-            # Format gates for better readability in the prompt
-            human_readable_gates = [self._format_gate_for_human(gate) for gate in gates]
-            
-            # Prepare the prompt for OpenAI with explicit JSON instructions
-            system_prompt = """
+            compressed.extend(gates[i:end])
+        i = end
+    return compressed
+
+# System prompt for custom circuit explanations
+_SYSTEM_PROMPT = """
             You are a quantum computing professor teaching a class on quantum circuits. Your task is to explain quantum circuits in detail.
             
             IMPORTANT: You must respond ONLY with a valid JSON object containing the following fields:
@@ -69,8 +66,55 @@ class CustomCircuitExplainer:
             
             Ensure that your response is properly formatted as valid JSON with no additional text before or after the JSON object.
             """
+
+class CustomCircuitExplainer:
+    """Generates educational explanations specifically for custom quantum circuits."""
+    
+    def __init__(self, api_key=None):
+        # Use provided API key or environment variable
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        
+        # Initialize the OpenAI client if API key is available
+        if self.api_key:
+            self.async_client = get_async_openai_client(self.api_key)
+            logger.debug("OpenAI API key found and loaded for CustomCircuitExplainer")
+        else:
+            self.async_client = None
+            logger.warning("No OpenAI API key found. Cannot generate custom circuit explanations.")
+    
+    async def aexplain_circuit(self, intent: CircuitIntent) -> Dict[str, Any]:
+        """Generate a detailed explanation for a custom quantum circuit using OpenAI."""
+        if not self.async_client:
+            return missing_key_explanation()
+        
+        try:
+            cache_key, request = self._explanation_request(intent)
+            cached = get_cached_explanation(cache_key)
+            if cached is not None:
+                return cached
             
-            user_prompt = f"""
+            logger.debug("Calling OpenAI API for custom circuit explanation...")
+            response = await self.async_client.chat.completions.create(**request)
+            return parse_explanation(response.choices[0].message.content, cache_key)
+        except Exception as e:
+            return failed_explanation(e)
+    
+    def _explanation_request(self, intent: CircuitIntent) -> Tuple[str, Dict[str, Any]]:
+        """Build the cache key and chat completion parameters explaining a custom circuit."""
+        # Get relevant data from intent
+        gates = intent.params.get("custom_gates", [])
+        num_qubits = intent.params.get("num_qubits", 2)
+        description = intent.params.get("custom_description", "Custom quantum circuit")
+        
+        # The same gates and description always get the same explanation
+        cache_key = explanation_cache_key("custom", num_qubits, list(gates), description)
+        
+        # Format gates for better readability in the prompt, run-length compressing long sequences
+        human_readable_gates = [self._format_gate_for_human(gate) for gate in gates]
+        if len(human_readable_gates) > COMPRESS_OPERATIONS_THRESHOLD:
+            human_readable_gates = compress_gate_sequence(human_readable_gates)
+        
+        user_prompt = f"""
             Please explain this custom quantum circuit:
             
             Number of qubits: {num_qubits}
@@ -80,54 +124,16 @@ class CustomCircuitExplainer:
             
             Remember: Your response must be ONLY a JSON object with the fields: title, summary, gates (array), applications (array), and educational_value.
             """
-            
-            # Call OpenAI API
-            print("Calling OpenAI API for custom circuit explanation...")
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},  # Specifically request JSON response
-                temperature=0.7
-            )
-            
-            # Extract and parse the response
-            content = response.choices[0].message.content
-            print(f"Received explanation from OpenAI, content length: {len(content)}")
-            
-            try:
-                # Clean up response if needed
-                content = content.strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON explanation: {e}")
-                return {
-                    "title": "JSON Parsing Error",
-                    "summary": "There was a problem parsing the explanation from OpenAI.",
-                    "gates": [],
-                    "applications": [],
-                    "educational_value": "",
-                    "error": f"JSON parsing error: {str(e)}"
-                }
-                
-        except Exception as e:
-            print(f"Error in OpenAI explanation generation: {str(e)}")
-            return {
-                "title": "Explanation Generation Error",
-                "summary": "There was a problem generating the explanation.",
-                "gates": [],
-                "applications": [],
-                "educational_value": "",
-                "error": f"Error: {str(e)}"
-            }
+        
+        return cache_key, {
+            "model": settings.OPENAI_EXPLANATION_MODEL,
+            "messages": [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_object"},  # Specifically request JSON response
+            "temperature": 0.7
+        }
             
     def _format_gate_for_human(self, gate_str: str) -> str:
         """Convert gate string from internal format to human-readable format."""
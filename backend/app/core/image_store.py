@@ -0,0 +1,22 @@
+# app/core/image_store.py
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+from .lru_cache import ttl_get, ttl_put_bytes
+from ..config import settings
+
+# Visualization fields that carry base64 encoded PNGs
+IMAGE_FIELDS = ("circuit_diagram", "bloch_sphere", "q_sphere", "measurement_histogram")
+
+# Rendered PNGs served from /viz/{image_id}, keyed by content hash, with their expiry time
+_IMAGE_STORE: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+def put_image(png_bytes: bytes) -> str:
+    """Store a PNG for IMAGE_STORE_TTL seconds and return its id."""
+    image_id = hashlib.blake2b(png_bytes, digest_size=16).hexdigest()
+    ttl_put_bytes(_IMAGE_STORE, image_id, png_bytes, settings.IMAGE_STORE_BYTES, settings.IMAGE_STORE_TTL)
+    return image_id
+
+def get_image(image_id: str) -> Optional[bytes]:
+    """Return a stored PNG, or None if it was never stored or has expired."""
+    return ttl_get(_IMAGE_STORE, image_id)
@@ -0,0 +1,51 @@
+# app/core/lru_cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+def lru_get(cache: OrderedDict, key: Hashable) -> Optional[Any]:
+    """Return a cached value and mark it as most recently used."""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def lru_put(cache: OrderedDict, key: Hashable, value: Any, max_size: int) -> None:
+    """Store a value, evicting the least recently used entries beyond max_size."""
+    if max_size <= 0:
+        return
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+def ttl_get(cache: OrderedDict, key: Hashable) -> Optional[Any]:
+    """Return a value stored with ttl_put_bytes, or None once it has expired."""
+    entry = lru_get(cache, key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+        del cache[key]
+        return None
+    return value
+
+def lru_put_bytes(cache: OrderedDict, key: Hashable, value: Any, max_bytes: int,
+                  size: Callable[[Any], int] = len) -> None:
+    """
+    Store a value, evicting the least recently used entries until the size(value) of
+    all entries totals at most max_bytes. A value bigger than max_bytes is not stored.
+    """
+    value_size = size(value)
+    if value_size > max_bytes:
+        return
+    cache[key] = value
+    cache.move_to_end(key)
+    total = sum(map(size, cache.values()))
+    while total > max_bytes:
+        _, evicted = cache.popitem(last=False)
+        total -= size(evicted)
+
+def ttl_put_bytes(cache: OrderedDict, key: Hashable, value: bytes, max_bytes: int, ttl: float) -> None:
+    """Store a bytes value for ttl seconds, evicting the least recently used entries beyond max_bytes in total."""
+    lru_put_bytes(cache, key, (time.monotonic() + ttl, value), max_bytes, size=lambda entry: len(entry[1]))
@@ -1,8 +1,8 @@
 # app/core/nlp_processor/intent_parser.py
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Pattern, Tuple
 import re
-import math
+from ..angle_parser import parse_angle
 
 class CircuitType(str, Enum):
     # Circuit types remain the same
@@ -58,6 +58,12 @@ class SimpleIntentParser:
             CircuitType.HHL: ["hhl", "linear system", "linear equations", "harrow hassidim lloyd"]
         }
         
+        # Every (keyword, circuit type) pair in one flat tuple, in circuit type order,
+        # so parse scores all types in a single loop
+        self._keyword_types: Tuple[Tuple[str, CircuitType], ...] = tuple(
+            (keyword, c_type) for c_type, keywords in self.circuit_keywords.items() for keyword in keywords
+        )
+        
         # Gate pattern matches
         self.gate_patterns = {
             "rx": r"rx\s*\(\s*([^)]+)\s*\)\s*(?:on|to)?\s*qubit\s*(\d+)",
@@ -70,57 +76,60 @@ class SimpleIntentParser:
             "cnot": r"(?:cnot|cx|controlled-x|controlled\s*x)\s*(?:from|with)?\s*qubit\s*(\d+)\s*(?:to|and|controlling)?\s*qubit\s*(\d+)",
             "cz": r"(?:cz|controlled-z|controlled\s*z)\s*(?:from|with)?\s*qubit\s*(\d+)\s*(?:to|and|controlling)?\s*qubit\s*(\d+)",
         }
+        
+        # Compile the patterns once, case-insensitively, so matching needs no lowercased copy
+        self.compiled_patterns: Dict[str, Pattern] = {
+            gate_name: re.compile(pattern, re.IGNORECASE) for gate_name, pattern in self.gate_patterns.items()
+        }
+        self._qubit_re = re.compile(r'(\d+)\s*qubit')
+        
+        # All gate patterns as one alternation, each wrapped in a group named after its gate,
+        # so extract_gates scans the text once. _gate_groups holds the indices of each
+        # pattern's own capture groups within the combined pattern.
+        alternatives = []
+        self._gate_groups: Dict[str, Tuple[int, ...]] = {}
+        group_index = 1
+        for gate_name, pattern in self.compiled_patterns.items():
+            alternatives.append(f"(?P<{gate_name}>{pattern.pattern})")
+            self._gate_groups[gate_name] = tuple(range(group_index + 1, group_index + 1 + pattern.groups))
+            group_index += 1 + pattern.groups
+        self._combined_pattern = re.compile("|".join(alternatives), re.IGNORECASE)
     
     def parse_angle(self, angle_str: str) -> float:
         """Parse angle expressions like pi/2, pi/4, etc."""
-        angle_str = angle_str.lower().strip()
-        
-        # Handle pi expressions
-        if 'pi' in angle_str:
-            # Replace pi with math.pi
-            angle_str = angle_str.replace('pi', str(math.pi))
-            
-            # Evaluate the expression
-            try:
-                return eval(angle_str)
-            except:
-                # Default to 0 if we can't parse it
-                return 0.0
-        
-        # Try to convert to float directly
         try:
-            return float(angle_str)
-        except:
+            return parse_angle(angle_str)
+        except (ValueError, ArithmeticError):
             # Default to 0 if we can't parse it
             return 0.0
     
     def extract_gates(self, text: str) -> List[str]:
-        """Extract gate operations from the text."""
-        text = text.lower()
+        """
+        Extract gate operations from the text.
+        
+        The text is scanned once and gates are returned in the order they are written.
+        Matches never overlap, so e.g. the "x qubit 0" inside "cx qubit 0 qubit 1" is not
+        also read as an X gate.
+        """
         gates = []
         
-        # Search for rotation gates with angles
-        for gate_name, pattern in self.gate_patterns.items():
+        for match in self._combined_pattern.finditer(text):
+            gate_name = match.lastgroup
+            groups = [match.group(index) for index in self._gate_groups[gate_name]]
             if gate_name in ["rx", "ry", "rz"]:
                 # Handle rotation gates with angles
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    angle_str, qubit = match.groups()
-                    angle = self.parse_angle(angle_str)
-                    gates.append(f"{gate_name} {qubit} {angle}")
+                angle_str, qubit = groups
+                angle = self.parse_angle(angle_str)
+                gates.append(f"{gate_name} {qubit} {angle}")
             elif gate_name in ["cnot", "cz"]:
                 # Handle 2-qubit gates
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    control, target = match.groups()
-                    gate_cmd = "cx" if gate_name == "cnot" else gate_name
-                    gates.append(f"{gate_cmd} {control} {target}")
+                control, target = groups
+                gate_cmd = "cx" if gate_name == "cnot" else gate_name
+                gates.append(f"{gate_cmd} {control} {target}")
             else:
                 # Handle single qubit gates
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    qubit = match.groups()[0]
-                    gates.append(f"{gate_name} {qubit}")
+                qubit = groups[0]
+                gates.append(f"{gate_name} {qubit}")
         
         return gates
     
@@ -128,18 +137,17 @@ class SimpleIntentParser:
         """Parse a natural language request into a circuit intent."""
         text = text.lower()
         
-        # Identify circuit type
-        circuit_type = CircuitType.UNKNOWN
-        highest_score = 0
-        
-        for c_type, keywords in self.circuit_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text)
-            if score > highest_score:
-                highest_score = score
-                circuit_type = c_type
+        # Identify circuit type: the one with the most keywords in the text. Scores are
+        # inserted in circuit type order, so max keeps the earliest type on a tie.
+        scores: Dict[CircuitType, int] = {}
+        for keyword, c_type in self._keyword_types:
+            if keyword in text:
+                scores[c_type] = scores.get(c_type, 0) + 1
+        circuit_type = max(scores, key=scores.get) if scores else CircuitType.UNKNOWN
         
-        # Extract gates for potential custom circuit
-        gates = self.extract_gates(text)
+        # Extract gates for potential custom circuit. Every gate pattern needs the word
+        # "qubit", so requests without it, like "create a bell state", skip the scan.
+        gates = self.extract_gates(text) if "qubit" in text else []
         
         # If gates found, consider it a custom circuit
         if gates:
@@ -149,7 +157,7 @@ class SimpleIntentParser:
         params = {}
         
         # Try to extract number of qubits
-        qubit_matches = re.findall(r'(\d+)\s*qubit', text)
+        qubit_matches = self._qubit_re.findall(text)
         if qubit_matches:
             try:
                 num_qubits = int(qubit_matches[0])
@@ -0,0 +1,118 @@
+# app/core/nlp_processor/local_parser.py
+import json
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, ValidationError
+from qiskit import QuantumCircuit
+
+class JsonOperation(BaseModel):
+    """A single operation in our exported JSON circuit format."""
+    name: str
+    qubits: List[int]
+    clbits: List[int] = []
+    parameters: List[float] = []
+
+class JsonCircuitBody(BaseModel):
+    operations: List[JsonOperation]
+
+class JsonCircuitFile(BaseModel):
+    """The JSON circuit format written by ExportGenerator.generate_json."""
+    metadata: Dict[str, Any] = {}
+    circuit: JsonCircuitBody
+
+class LocalCircuitFileParser:
+    """
+    Parses well-formed QASM 2 and exported JSON circuit files without calling OpenAI.
+
+    Produces the same (cleaned_content, metadata) result as
+    OpenAICircuitParser.parse_circuit_file, or None when the file needs the LLM.
+    """
+
+    # Gates the CustomCircuitBuilder accepts, by (qubit count, parameter count)
+    SUPPORTED_GATES = {
+        "h": (1, 0), "x": (1, 0), "y": (1, 0), "z": (1, 0), "id": (1, 0),
+        "s": (1, 0), "t": (1, 0), "reset": (1, 0),
+        "rx": (1, 1), "ry": (1, 1), "rz": (1, 1), "u1": (1, 1),
+        "u2": (1, 2), "u3": (1, 3),
+        "cx": (2, 0), "cz": (2, 0), "swap": (2, 0), "cp": (2, 1),
+        "ccx": (3, 0),
+    }
+
+    def parse_circuit_file(self, file_content: str, file_format: str, description: Optional[str] = None) -> Optional[tuple]:
+        if file_format == 'qasm':
+            return self._parse_qasm(file_content, description)
+        if file_format == 'json':
+            return self._parse_json(file_content, description)
+        return None
+
+    def _parse_qasm(self, file_content: str, description: Optional[str]) -> Optional[tuple]:
+        try:
+            circuit = QuantumCircuit.from_qasm_str(file_content)
+        except Exception:
+            return None
+
+        operations = []
+        for instruction in circuit.data:
+            operation = instruction.operation
+            # Classically conditioned gates need the LLM to map onto the builder's format
+            if getattr(operation, "condition", None) is not None:
+                return None
+            operations.append((
+                operation.name,
+                [circuit.find_bit(q).index for q in instruction.qubits],
+                [circuit.find_bit(c).index for c in instruction.clbits],
+                operation.params,
+            ))
+
+        return self._to_result(file_content, "qasm", circuit.num_qubits, description, operations)
+
+    def _parse_json(self, file_content: str, description: Optional[str]) -> Optional[tuple]:
+        try:
+            circuit_file = JsonCircuitFile.model_validate(json.loads(file_content))
+        except (ValueError, ValidationError):
+            return None
+
+        operations = [(op.name, op.qubits, op.clbits, op.parameters) for op in circuit_file.circuit.operations]
+        num_qubits = circuit_file.metadata.get("num_qubits")
+        if not isinstance(num_qubits, int):
+            num_qubits = max((q for _, qubits, _, _ in operations for q in qubits), default=1) + 1
+
+        return self._to_result(
+            file_content, "json", num_qubits, description or circuit_file.metadata.get("description"), operations
+        )
+
+    def _to_result(self, file_content: str, file_format: str, num_qubits: int,
+                   description: Optional[str], operations: List[tuple]) -> Optional[tuple]:
+        gates = []
+        for name, qubits, clbits, params in operations:
+            gate = self._gate_instruction(name, qubits, clbits, params)
+            if gate is None:
+                return None
+            gates.append(gate)
+
+        metadata = {
+            "num_qubits": num_qubits,
+            "description": description or f"Imported {file_format.upper()} circuit",
+            "gates": gates
+        }
+        return file_content, metadata
+
+    def _gate_instruction(self, name: str, qubits: List[int], clbits: List[int], params: List[Any]) -> Optional[str]:
+        """Format one operation in the builder's gate syntax, or None if unsupported."""
+        if name == "measure" and len(qubits) == 1 and len(clbits) == 1:
+            return f"measure {qubits[0]} {clbits[0]}"
+        if name == "barrier":
+            return " ".join(["barrier", *map(str, qubits)])
+        if name == "u":
+            name = "u3"
+
+        arity = self.SUPPORTED_GATES.get(name)
+        if arity is None or arity != (len(qubits), len(params)):
+            return None
+        try:
+            angles = [str(float(p)) for p in params]
+        except (TypeError, ValueError):
+            # Unbound parameters can't be built
+            return None
+
+        # The builder takes qubits first, then angles
+        return " ".join([name, *map(str, qubits), *angles])
@@ -1,85 +1,20 @@
 import os
 import json
+import logging
 import math
 import re
 from typing import Dict, Any, Optional, List
 from .intent_parser import CircuitIntent, CircuitType
-from openai import OpenAI
+from ..angle_parser import parse_angle
+from ..openai_clients import get_openai_client, get_async_openai_client
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class OpenAICircuitParser:
-    def __init__(self, api_key=None):
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("OpenAI API key is required.")
-        self.client = OpenAI(api_key=self.api_key)
-
-    def parse_angle(self, angle_expression: str) -> float:
-        angle_expression = angle_expression.lower().replace('π', 'math.pi').replace('pi', 'math.pi')
-        try:
-            return eval(angle_expression)
-        except Exception as e:
-            print(f"Error parsing angle '{angle_expression}': {str(e)}")
-            match = re.search(r'([\d.]+)', angle_expression)
-            return float(match.group(1)) if match else 0.0
+logger = logging.getLogger(__name__)
 
-    def normalize_gate_instructions(self, gates: List[str]) -> List[str]:
-        normalized_gates = []
-        for gate in gates:
-            # Debug log
-            print(f"Normalizing gate instruction: '{gate}'")
-            
-            # Skip empty or None gates
-            if not gate:
-                continue
-                
-            # Handle measurement with arrow
-            if "->" in gate:
-                parts = gate.replace("->", " ").split()
-                if len(parts) == 2:
-                    normalized_gates.append(f"measure {parts[0]} {parts[1]}")
-                elif len(parts) == 3 and parts[0].lower() == "measure":
-                    normalized_gates.append(f"measure {parts[1]} {parts[2]}")
-                else:
-                    normalized_gates.append(gate)
-            
-            # Handle conditionals
-            elif gate.startswith("if("):
-                match = re.match(r"if\s*\(c\[(\d+)\]==(\d+)\)\s*(\w+)\s*(\d+)", gate)
-                if match:
-                    normalized_gates.append(f"if c {match.group(1)} {match.group(2)} {match.group(3)} {match.group(4)}")
-                else:
-                    normalized_gates.append(gate)
-            
-            # Handle rotation gates with parentheses like rx(pi/3) 0
-            elif any(gate.startswith(f"{g}(") for g in ["rx", "ry", "rz"]):
-                # Keep the format as is - the CustomCircuitBuilder will handle it
-                normalized_gates.append(gate)
-                print(f"Kept rotation gate with parentheses: '{gate}'")
-            
-            # Handle rotation gates with separate angle params like rx 0 1.5708
-            elif any(gate.startswith(prefix) for prefix in ["rx ", "ry ", "rz ", "u1 ", "u2 ", "u3 "]):
-                parts = gate.split()
-                if len(parts) >= 3:
-                    # Try to parse and normalize the angle value
-                    try:
-                        angle = self.parse_angle(" ".join(parts[2:]))
-                        normalized_gates.append(f"{parts[0]} {parts[1]} {angle}")
-                        print(f"Normalized rotation gate with separate angle: '{parts[0]} {parts[1]} {angle}'")
-                    except Exception as e:
-                        print(f"Error normalizing angle in gate '{gate}': {str(e)}")
-                        normalized_gates.append(gate)
-                else:
-                    normalized_gates.append(gate)
-            else:
-                normalized_gates.append(gate)
-        
-        return normalized_gates
-
-    def parse(self, text: str) -> CircuitIntent:
-        system_prompt = """
+# System prompt for turning a natural language circuit request into an intent
+_INTENT_SYSTEM_PROMPT = """
 You are a quantum computing expert assistant. Analyze user requests for circuits and extract:
 
 - Circuit type (bell_state, ghz_state, teleportation, grovers, custom, etc)
@@ -112,60 +47,18 @@ IMPORTANT: YOUR RESPONSE MUST BE IN VALID JSON FORMAT with this structure:
   "custom_description": "Description of the circuit"
 }
 """
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.1
-        )
-        content = response.choices[0].message.content
-        parsed = json.loads(content)
 
-        circuit_type_str = parsed.get("circuit_type", "unknown").upper()
-        try:
-            circuit_type = CircuitType[circuit_type_str]
-        except KeyError:
-            circuit_type = CircuitType.CUSTOM if circuit_type_str.lower() == "custom" else CircuitType.UNKNOWN
-
-        params = {
-            "num_qubits": min(parsed.get("num_qubits", 2), 10),
-            **parsed.get("params", {})
-        }
-
-        if circuit_type == CircuitType.CUSTOM:
-            params["custom_description"] = parsed.get("custom_description", "Custom quantum circuit")
-            raw_gates = parsed.get("custom_gates", [])
-            
-            # Handle if custom_gates is a dictionary
-            if isinstance(raw_gates, dict):
-                print("WARNING: custom_gates is a dictionary, flattening to list")
-                flattened_gates = []
-                for gate_type, gates in raw_gates.items():
-                    if isinstance(gates, list):
-                        flattened_gates.extend(gates)
-                    else:
-                        print(f"Warning: Unexpected format for {gate_type}: {gates}")
-                        if isinstance(gates, str):
-                            flattened_gates.append(gates)
-                raw_gates = flattened_gates
-            
-            # Debug log the raw gates before normalization
-            print(f"Raw gates from parser: {raw_gates}")
-            
-            normalized_gates = self.normalize_gate_instructions(raw_gates)
-            params["custom_gates"] = normalized_gates
-            
-            # Debug log the normalized gates
-            print(f"Normalized gates: {normalized_gates}")
-
-        return CircuitIntent(circuit_type, params)
+# Appended to _INTENT_SYSTEM_PROMPT when several requests share one call
+_BATCH_INTENT_INSTRUCTIONS = """
+BATCHED REQUESTS:
+The user message is a JSON array of independent requests. Analyze each one on its own and respond with
+{"results": [...]} holding exactly one object per request, in the same order, each with the structure above.
+"""
 
-    def parse_circuit_file(self, file_content: str, file_format: str, description: Optional[str] = None) -> tuple:
-        if file_format == 'qasm':
-            system_prompt = """
+# System prompts for cleaning an uploaded circuit file, by file format. They are
+# module-level so repeated parses send byte-identical text for OpenAI's prompt caching.
+_CIRCUIT_FILE_PROMPTS = {
+    "qasm": """
 You are a quantum computing expert. Analyze and clean OpenQASM. Extract:
 
 - cleaned_qasm
@@ -196,9 +89,8 @@ IMPORTANT: YOUR RESPONSE MUST BE IN THIS VALID JSON FORMAT:
   "description": "Circuit description",
   "gates": ["h 0", "ry(pi/3) 0", "cx 0 1", ...]
 }
-"""
-        elif file_format == 'qiskit':
-            system_prompt = """
+""",
+    "qiskit": """
 You are a quantum computing expert. Analyze and clean Qiskit Python code. Extract:
 
 - cleaned_code
@@ -229,9 +121,8 @@ IMPORTANT: YOUR RESPONSE MUST BE IN THIS VALID JSON FORMAT:
   "description": "Circuit description",
   "gates": ["h 0", "ry(pi/3) 0", "cx 0 1", ...]
 }
-"""
-        elif file_format == 'json':
-            system_prompt = """
+""",
+    "json": """
 You are a quantum computing expert. Analyze and clean JSON circuit. Extract:
 
 - cleaned_json
@@ -262,53 +153,249 @@ IMPORTANT: YOUR RESPONSE MUST BE IN THIS VALID JSON FORMAT:
   "description": "Circuit description", 
   "gates": ["h 0", "ry(pi/3) 0", "cx 0 1", ...]
 }
-"""
-        else:
-            raise ValueError(f"Unsupported file format: {file_format}")
+""",
+}
 
-        if description:
-            system_prompt += f"\nUser Description: {description}"
+class OpenAICircuitParser:
+    # Model used to analyze uploaded circuit files
+    FILE_PARSE_MODEL = "gpt-3.5-turbo"
 
-        # Try up to 3 times with increasingly explicit instructions
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": file_content}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("OpenAI API key is required.")
+        self.client = get_openai_client(self.api_key)
+        self.async_client = get_async_openai_client(self.api_key)
+
+    def parse_angle(self, angle_expression: str) -> float:
+        # Safe, cached evaluation of numbers, pi and arithmetic; no eval of model output
+        try:
+            return parse_angle(angle_expression)
+        except (ValueError, ArithmeticError) as e:
+            logger.warning("Error parsing angle '%s': %s", angle_expression, e)
+            match = re.search(r'(\d*\.?\d+)', angle_expression)
+            return float(match.group(1)) if match else 0.0
+
+    def normalize_gate_instructions(self, gates: List[str]) -> List[str]:
+        normalized_gates = []
+        for gate in gates:
+            logger.debug("Normalizing gate instruction: '%s'", gate)
             
-            # Check if gates is a dictionary or not in the expected format
-            raw_gates = parsed.get("gates", [])
+            # Skip empty or None gates
+            if not gate:
+                continue
+                
+            # Handle measurement with arrow
+            if "->" in gate:
+                parts = gate.replace("->", " ").split()
+                if len(parts) == 2:
+                    normalized_gates.append(f"measure {parts[0]} {parts[1]}")
+                elif len(parts) == 3 and parts[0].lower() == "measure":
+                    normalized_gates.append(f"measure {parts[1]} {parts[2]}")
+                else:
+                    normalized_gates.append(gate)
             
-            if isinstance(raw_gates, list) and len(raw_gates) > 0 and isinstance(raw_gates[0], str):
-                # Success! We have a list of strings
-                break
+            # Handle conditionals
+            elif gate.startswith("if("):
+                match = re.match(r"if\s*\(c\[(\d+)\]==(\d+)\)\s*(\w+)\s*(\d+)", gate)
+                if match:
+                    normalized_gates.append(f"if c {match.group(1)} {match.group(2)} {match.group(3)} {match.group(4)}")
+                else:
+                    normalized_gates.append(gate)
             
-            if attempt < max_attempts - 1:
-                # If gates is a dictionary, make the prompt more explicit for the next attempt
-                if isinstance(raw_gates, dict):
-                    print(f"Attempt {attempt+1}: Gates returned as a dictionary, retrying with more explicit instructions")
-                    system_prompt += """
+            # Handle rotation gates with parentheses like rx(pi/3) 0
+            elif any(gate.startswith(f"{g}(") for g in ["rx", "ry", "rz"]):
+                # Keep the format as is - the CustomCircuitBuilder will handle it
+                normalized_gates.append(gate)
+                logger.debug("Kept rotation gate with parentheses: '%s'", gate)
+            
+            # Handle rotation gates with separate angle params like rx 0 1.5708
+            elif any(gate.startswith(prefix) for prefix in ["rx ", "ry ", "rz ", "u1 ", "u2 ", "u3 "]):
+                parts = gate.split()
+                if len(parts) >= 3:
+                    # Try to parse and normalize the angle value
+                    try:
+                        angle = self.parse_angle(" ".join(parts[2:]))
+                        normalized_gates.append(f"{parts[0]} {parts[1]} {angle}")
+                        logger.debug("Normalized rotation gate with separate angle: '%s %s %s'", parts[0], parts[1], angle)
+                    except Exception as e:
+                        logger.warning("Error normalizing angle in gate '%s': %s", gate, e)
+                        normalized_gates.append(gate)
+                else:
+                    normalized_gates.append(gate)
+            else:
+                normalized_gates.append(gate)
+        
+        return normalized_gates
+
+    def _intent_request(self, text: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for parsing a circuit request."""
+        return dict(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": _INTENT_SYSTEM_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1
+        )
+
+    def _batch_intent_request(self, texts: List[str]) -> Dict[str, Any]:
+        """Build the chat completion arguments for parsing several independent requests at once."""
+        return dict(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": _INTENT_SYSTEM_PROMPT + _BATCH_INTENT_INSTRUCTIONS},
+                {"role": "user", "content": json.dumps(texts)}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1
+        )
+
+    def parse(self, text: str) -> CircuitIntent:
+        response = self.client.chat.completions.create(**self._intent_request(text))
+        return self._intent_result(json.loads(response.choices[0].message.content))
+
+    async def parse_async(self, text: str) -> CircuitIntent:
+        """Async variant of parse that doesn't block the event loop on OpenAI."""
+        response = await self.async_client.chat.completions.create(**self._intent_request(text))
+        return self._intent_result(json.loads(response.choices[0].message.content))
+
+    async def parse_batch_async(self, texts: List[str]) -> List[CircuitIntent]:
+        """Parse several requests with one OpenAI call, returning intents in the same order."""
+        if len(texts) == 1:
+            return [await self.parse_async(texts[0])]
+        response = await self.async_client.chat.completions.create(**self._batch_intent_request(texts))
+        results = json.loads(response.choices[0].message.content).get("results")
+        if not isinstance(results, list) or len(results) != len(texts) or not all(isinstance(r, dict) for r in results):
+            raise ValueError("Batched intent response does not have one result per request")
+        return [self._intent_result(parsed) for parsed in results]
+
+    def _intent_result(self, parsed: Dict[str, Any]) -> CircuitIntent:
+        """Turn a parsed circuit request response into a CircuitIntent."""
+        circuit_type_str = parsed.get("circuit_type", "unknown").upper()
+        try:
+            circuit_type = CircuitType[circuit_type_str]
+        except KeyError:
+            circuit_type = CircuitType.CUSTOM if circuit_type_str.lower() == "custom" else CircuitType.UNKNOWN
+
+        params = {
+            "num_qubits": min(parsed.get("num_qubits", 2), 10),
+            **parsed.get("params", {})
+        }
+
+        if circuit_type == CircuitType.CUSTOM:
+            params["custom_description"] = parsed.get("custom_description", "Custom quantum circuit")
+            raw_gates = parsed.get("custom_gates", [])
+            
+            # Handle if custom_gates is a dictionary
+            if isinstance(raw_gates, dict):
+                logger.warning("custom_gates is a dictionary, flattening to list")
+                flattened_gates = []
+                for gate_type, gates in raw_gates.items():
+                    if isinstance(gates, list):
+                        flattened_gates.extend(gates)
+                    else:
+                        logger.warning("Unexpected format for %s: %s", gate_type, gates)
+                        if isinstance(gates, str):
+                            flattened_gates.append(gates)
+                raw_gates = flattened_gates
+            
+            logger.debug("Raw gates from parser: %s", raw_gates)
+            
+            normalized_gates = self.normalize_gate_instructions(raw_gates)
+            params["custom_gates"] = normalized_gates
+            
+            logger.debug("Normalized gates: %s", normalized_gates)
+
+        return CircuitIntent(circuit_type, params)
+
+    def _circuit_file_prompt(self, file_format: str, description: Optional[str] = None) -> str:
+        system_prompt = _CIRCUIT_FILE_PROMPTS.get(file_format)
+        if system_prompt is None:
+            raise ValueError(f"Unsupported file format: {file_format}")
+
+        # The user's description goes last so the fixed prompt stays a shared prefix
+        if description:
+            system_prompt += f"\nUser Description: {description}"
+
+        return system_prompt
+
+    def _circuit_file_request(self, system_prompt: str, file_content: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for a circuit file parse."""
+        return {
+            "model": self.FILE_PARSE_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": file_content}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.1
+        }
+
+    def _gate_format_correction(self, raw_gates: Any, attempt: int) -> Optional[str]:
+        """Return the prompt correction for a malformed gates field, or None if it is usable."""
+        if isinstance(raw_gates, list) and len(raw_gates) > 0 and isinstance(raw_gates[0], str):
+            # Success! We have a list of strings
+            return None
+        
+        # If gates is a dictionary, make the prompt more explicit for the next attempt
+        if isinstance(raw_gates, dict):
+            logger.debug("Attempt %d: Gates returned as a dictionary, retrying with more explicit instructions", attempt + 1)
+            return """
 CRITICAL CORRECTION NEEDED:
 DO NOT RETURN GATES AS A DICTIONARY OR OBJECT. The "gates" field MUST be a flat array of strings.
 WRONG: "gates": {"single_qubit_gates": ["h 0"], "two_qubit_gates": ["cx 0 1"]}
 CORRECT: "gates": ["h 0", "cx 0 1", "measure 0 -> 0"]
 """
-                else:
-                    print(f"Attempt {attempt+1}: Gates not in expected format: {raw_gates}, retrying")
-                    system_prompt += """
+        logger.debug("Attempt %d: Gates not in expected format: %s, retrying", attempt + 1, raw_gates)
+        return """
 CRITICAL CORRECTION NEEDED:
 The "gates" field MUST be a flat array of individual gate operation strings in the exact order they appear in the circuit.
 Each gate must be a separate string in the array.
 """
 
+    def parse_circuit_file(self, file_content: str, file_format: str, description: Optional[str] = None) -> tuple:
+        system_prompt = self._circuit_file_prompt(file_format, description)
+
+        # Try up to 3 times with increasingly explicit instructions
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            response = self.client.chat.completions.create(
+                **self._circuit_file_request(system_prompt, file_content)
+            )
+            parsed = json.loads(response.choices[0].message.content)
+            
+            correction = self._gate_format_correction(parsed.get("gates", []), attempt)
+            if correction is None:
+                break
+            if attempt < max_attempts - 1:
+                system_prompt += correction
+
+        return self._circuit_file_result(parsed, file_format)
+
+    async def parse_circuit_file_async(self, file_content: str, file_format: str, description: Optional[str] = None) -> tuple:
+        """Async variant of parse_circuit_file that doesn't block the event loop on OpenAI."""
+        system_prompt = self._circuit_file_prompt(file_format, description)
+
+        # Try up to 3 times with increasingly explicit instructions
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            response = await self.async_client.chat.completions.create(
+                **self._circuit_file_request(system_prompt, file_content)
+            )
+            parsed = json.loads(response.choices[0].message.content)
+            
+            correction = self._gate_format_correction(parsed.get("gates", []), attempt)
+            if correction is None:
+                break
+            if attempt < max_attempts - 1:
+                system_prompt += correction
+
+        return self._circuit_file_result(parsed, file_format)
+
+    def _circuit_file_result(self, parsed: Dict[str, Any], file_format: str) -> tuple:
+        """Turn a parsed circuit file response into (cleaned_content, metadata)."""
         if file_format == 'qasm':
             cleaned_content = parsed.get("cleaned_qasm", "")
         elif file_format == 'qiskit':
@@ -321,13 +408,13 @@ Each gate must be a separate string in the array.
         
         # If gates is a dictionary, flatten it
         if isinstance(raw_gates, dict):
-            print("WARNING: Gates is still a dictionary after multiple attempts, flattening manually")
+            logger.warning("Gates is still a dictionary after multiple attempts, flattening manually")
             flattened_gates = []
             for gate_type, gates in raw_gates.items():
                 if isinstance(gates, list):
                     flattened_gates.extend(gates)
                 else:
-                    print(f"Warning: Unexpected gate format for {gate_type}: {gates}")
+                    logger.warning("Unexpected gate format for %s: %s", gate_type, gates)
                     if isinstance(gates, str):
                         flattened_gates.append(gates)
             raw_gates = flattened_gates
@@ -338,9 +425,9 @@ Each gate must be a separate string in the array.
             if isinstance(gate, str):
                 string_gates.append(gate)
             else:
-                print(f"Warning: Non-string gate encountered: {gate}, skipping")
+                logger.warning("Non-string gate encountered: %s, skipping", gate)
         
-        print(f"Parsed {len(string_gates)} gates from {file_format} file: {string_gates}")
+        logger.debug("Parsed %d gates from %s file: %s", len(string_gates), file_format, string_gates)
         
         normalized_gates = self.normalize_gate_instructions(string_gates)
         
@@ -0,0 +1,85 @@
+# app/core/nlp_processor/parse_batcher.py
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+from .intent_parser import CircuitIntent
+from .openai_parser import OpenAICircuitParser
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+class IntentParseBatcher:
+    """
+    Coalesces concurrent OpenAI intent parses into shared requests.
+
+    Requests arriving within OPENAI_BATCH_WAIT_MS of each other (up to
+    OPENAI_BATCH_MAX_SIZE) are sent as one batched call. If the batched answer
+    can't be used, each request falls back to its own call.
+    """
+
+    def __init__(self, parser: OpenAICircuitParser):
+        self.parser = parser
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: "Optional[asyncio.Queue[Tuple[str, asyncio.Future]]]" = None
+        self._worker: Optional[asyncio.Task] = None
+        # Strong references to in-flight batch tasks, which the loop only holds weakly
+        self._pending: "set[asyncio.Task]" = set()
+
+    async def parse(self, text: str) -> CircuitIntent:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # The queue and worker belong to the loop that created them
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self) -> None:
+        wait = settings.OPENAI_BATCH_WAIT_MS / 1000
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + wait
+            while len(batch) < settings.OPENAI_BATCH_MAX_SIZE:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Parse in the background so the next batch can start collecting
+            task = self._loop.create_task(self._parse_batch(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _parse_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            intents = await self.parser.parse_batch_async(texts)
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch[0][1], exception=e)
+                return
+            logger.warning("Batched intent parse of %d requests failed, parsing individually: %s", len(batch), e)
+            await asyncio.gather(*(self._parse_one(text, future) for text, future in batch))
+            return
+        for (_, future), intent in zip(batch, intents):
+            self._settle(future, result=intent)
+
+    async def _parse_one(self, text: str, future: asyncio.Future) -> None:
+        try:
+            self._settle(future, result=await self.parser.parse_async(text))
+        except Exception as e:
+            self._settle(future, exception=e)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, result=None, exception: Optional[BaseException] = None) -> None:
+        # The awaiting request may have been cancelled in the meantime
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
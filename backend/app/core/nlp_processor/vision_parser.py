@@ -2,11 +2,11 @@
 import os
 import json
 import base64
+import logging
 from typing import Optional, Dict, Any, List
 import re
 import math
-import traceback
-from openai import OpenAI
+from ..openai_clients import get_openai_client, get_async_openai_client
 from .intent_parser import CircuitIntent, CircuitType
 from .openai_parser import OpenAICircuitParser
 from dotenv import load_dotenv
@@ -15,34 +15,11 @@ from fastapi import HTTPException
 # Load environment variables
 load_dotenv()
 
-class VisionCircuitParser:
-    """Uses OpenAI Vision to parse circuit diagrams from images."""
-    
-    def __init__(self, api_key=None, model="gpt-4o"):
-        # Use provided API key or environment variable
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        self.model = model
-        
-        if not self.api_key:
-            raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass as parameter.")
-        
-        # Initialize the OpenAI client
-        self.client = OpenAI(api_key=self.api_key)
-        
-        # Create OpenAI parser for reusing gate normalization logic
-        self.openai_parser = OpenAICircuitParser(api_key=self.api_key)
-    
-    async def parse_image(self, image_data: bytes, content_type: str) -> CircuitIntent:
-        """Parse a circuit diagram image into a CircuitIntent."""
-        print(f"\n==== Vision Parser Request ====")
-        print(f"Processing image of type: {content_type}")
-        print(f"Using model: {self.model}")
-        
-        # Encode the image as base64
-        base64_image = base64.b64encode(image_data).decode('utf-8')
-        
-        # Define the system prompt to instruct the model - enhanced to better align with OpenAI parser
-        system_prompt = """
+logger = logging.getLogger(__name__)
+
+# System prompt for reading a circuit diagram. It is module-level so every request
+# sends byte-identical text, which OpenAI's prompt caching can reuse.
+_VISION_SYSTEM_PROMPT = """
         You are a quantum computing expert specialized in interpreting circuit diagrams and quantum computing notations. 
         Analyze the uploaded image and extract a quantum circuit description.
         
@@ -113,14 +90,42 @@ class VisionCircuitParser:
         
         If you see a multi-qubit circuit with sophisticated structure, be sure to identify all qubits and operations accurately.
         """
+
+class VisionCircuitParser:
+    """Uses OpenAI Vision to parse circuit diagrams from images."""
+    
+    # Vision-capable model used when none is given
+    DEFAULT_MODEL = "gpt-4o"
+    
+    def __init__(self, api_key=None, model=DEFAULT_MODEL):
+        # Use provided API key or environment variable
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.model = model
+        
+        if not self.api_key:
+            raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass as parameter.")
+        
+        # Initialize the OpenAI client
+        self.client = get_openai_client(self.api_key)
+        self.async_client = get_async_openai_client(self.api_key)
+        
+        # Create OpenAI parser for reusing gate normalization logic
+        self.openai_parser = OpenAICircuitParser(api_key=self.api_key)
+    
+    async def parse_image(self, image_data: bytes, content_type: str) -> CircuitIntent:
+        """Parse a circuit diagram image into a CircuitIntent."""
+        logger.debug("Vision parser request: image of type %s, model %s", content_type, self.model)
+        
+        # Encode the image as base64
+        base64_image = base64.b64encode(image_data).decode('utf-8')
         
         try:
-            print("Calling OpenAI Vision API...")
+            logger.debug("Calling OpenAI Vision API...")
             # Call OpenAI Vision API
-            response = self.client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model=self.model,  # Current model with vision capabilities
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": _VISION_SYSTEM_PROMPT},
                     {
                         "role": "user", 
                         "content": [
@@ -142,7 +147,7 @@ class VisionCircuitParser:
             
             # Extract the response content
             content = response.choices[0].message.content
-            print(f"Vision API response content: {content}")
+            logger.debug("Vision API response content: %s", content)
             
             # Try to extract JSON from the response (up to 3 attempts with increasingly explicit error messages)
             attempts = 0
@@ -154,32 +159,32 @@ class VisionCircuitParser:
                     json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
                     if json_match:
                         json_str = json_match.group(1)
-                        print(f"Extracted JSON from code block: {json_str}")
+                        logger.debug("Extracted JSON from code block: %s", json_str)
                     else:
                         # Look for a JSON object directly
                         json_match = re.search(r'(\{[\s\S]*?\})', content, re.DOTALL)
                         if json_match:
                             json_str = json_match.group(1)
-                            print(f"Extracted JSON from text: {json_str}")
+                            logger.debug("Extracted JSON from text: %s", json_str)
                         else:
-                            print("No JSON format found in response, cannot process")
+                            logger.warning("No JSON format found in response, cannot process")
                             raise HTTPException(status_code=422, detail="Failed to extract circuit data from image. The AI could not identify a valid quantum circuit.")
                     
                     # Clean up the string to help with parsing
                     json_str = json_str.strip()
                     if not json_str.startswith('{'): 
-                        print(f"JSON string doesn't start with '{{': {json_str[:20]}")
+                        logger.warning("JSON string doesn't start with '{': %s", json_str[:20])
                         raise HTTPException(status_code=422, detail="Invalid JSON format in AI response. Could not process the circuit image.")
                     
                     parsed_data = json.loads(json_str)
-                    print(f"Parsed JSON data: {json.dumps(parsed_data, indent=2)}")
+                    logger.debug("Parsed JSON data: %s", parsed_data)
                     
                     # Extract circuit type
                     circuit_type_str = parsed_data.get("circuit_type", "custom").upper()
                     try:
                         circuit_type = CircuitType[circuit_type_str]
                     except KeyError:
-                        print(f"Unknown circuit type: {circuit_type_str}, defaulting to CUSTOM")
+                        logger.debug("Unknown circuit type: %s, defaulting to CUSTOM", circuit_type_str)
                         circuit_type = CircuitType.CUSTOM
                     
                     # Extract parameters
@@ -197,7 +202,7 @@ class VisionCircuitParser:
                     # Get custom description from the response or generate one if missing
                     custom_description = ""
                     if "custom_description" not in parsed_data or not parsed_data["custom_description"] or parsed_data["custom_description"].strip() in ["", "Custom quantum circuit", "Custom quantum circuit from image"]:
-                        print("Missing or generic description detected, generating a better one...")
+                        logger.debug("Missing or generic description detected, generating a better one...")
                         # Generate a description based on the gate sequence
                         raw_gates = parsed_data.get("custom_gates", [])
                         gate_description = ""
@@ -208,7 +213,7 @@ class VisionCircuitParser:
                             gate_description = "\n".join([f"{k}: {v}" for k, v in raw_gates.items()])
                         
                         # Make a follow-up API call to generate a better description
-                        description_response = self.client.chat.completions.create(
+                        description_response = await self.async_client.chat.completions.create(
                             model="gpt-3.5-turbo",
                             messages=[
                                 {"role": "system", "content": "You are a quantum computing expert. Based on the gate sequence, provide a detailed explanation of what this quantum circuit does, its purpose, and any quantum phenomena it demonstrates."},
@@ -217,10 +222,10 @@ class VisionCircuitParser:
                             max_tokens=200
                         )
                         custom_description = description_response.choices[0].message.content.strip()
-                        print(f"Generated description: {custom_description}")
+                        logger.debug("Generated description: %s", custom_description)
                     else:
                         custom_description = parsed_data["custom_description"]
-                        print(f"Using provided description: {custom_description}")
+                        logger.debug("Using provided description: %s", custom_description)
                     
                     params["custom_description"] = custom_description
                     
@@ -229,13 +234,13 @@ class VisionCircuitParser:
                     
                     # Handle if custom_gates is a dictionary
                     if isinstance(raw_gates, dict):
-                        print("WARNING: custom_gates is a dictionary, flattening to list")
+                        logger.warning("custom_gates is a dictionary, flattening to list")
                         flattened_gates = []
                         for gate_type, gates in raw_gates.items():
                             if isinstance(gates, list):
                                 flattened_gates.extend(gates)
                             else:
-                                print(f"Warning: Unexpected format for {gate_type}: {gates}")
+                                logger.warning("Unexpected format for %s: %s", gate_type, gates)
                                 if isinstance(gates, str):
                                     flattened_gates.append(gates)
                         raw_gates = flattened_gates
@@ -246,9 +251,9 @@ class VisionCircuitParser:
                         if isinstance(gate, str):
                             string_gates.append(gate)
                         else:
-                            print(f"Warning: Non-string gate encountered: {gate}, skipping")
+                            logger.warning("Non-string gate encountered: %s, skipping", gate)
                     
-                    print(f"Raw gates from Vision: {string_gates}")
+                    logger.debug("Raw gates from Vision: %s", string_gates)
                     
                     # Use the same gate normalization logic as the text parser
                     normalized_gates = self.openai_parser.normalize_gate_instructions(string_gates)
@@ -256,7 +261,7 @@ class VisionCircuitParser:
                     
                     # Generate explanation structure for the EducationalExplanation component
                     # Use OpenAI to generate detailed gate explanations directly as an enriched JSON
-                    print("Generating quantum circuit explanation...")
+                    logger.debug("Generating quantum circuit explanation...")
                     
                     # Build the prompt for generating explanations
                     circuit_title = f"Quantum Circuit Analysis: {circuit_type_str.capitalize()}"
@@ -290,7 +295,7 @@ class VisionCircuitParser:
                     """
                     
                     # Call OpenAI to generate the explanation
-                    explanation_response = self.client.chat.completions.create(
+                    explanation_response = await self.async_client.chat.completions.create(
                         model="gpt-3.5-turbo",
                         messages=[
                             {"role": "system", "content": explanation_prompt},
@@ -303,14 +308,13 @@ class VisionCircuitParser:
                     
                     # Extract and parse the explanation
                     explanation_content = explanation_response.choices[0].message.content
-                    print(f"Generated explanation: {explanation_content[:200]}...")
+                    logger.debug("Generated explanation: %.200s...", explanation_content)
                     
                     try:
                         explanation_data = json.loads(explanation_content)
                         
                         # CRITICAL FIX: Set the "explanation" field explicitly at the top level
                         # This ensures it will be seen by the API response handler
-                        print("Setting explanation directly as a top-level attribute")
                         
                         # Make sure to include all fields the frontend expects
                         final_explanation = {
@@ -329,9 +333,9 @@ class VisionCircuitParser:
                         # Directly attach the explanation to both places it might be used
                         params["explanation"] = final_explanation
                         
-                        print(f"Final explanation structure for API: {json.dumps(final_explanation, indent=2)}")
+                        logger.debug("Final explanation structure for API: %s", final_explanation)
                     except json.JSONDecodeError as e:
-                        print(f"Error parsing explanation JSON: {e}")
+                        logger.warning("Error parsing explanation JSON: %s", e)
                         # Create a minimal explanation structure as fallback
                         params["explanation"] = {
                             "title": circuit_title,
@@ -345,14 +349,11 @@ class VisionCircuitParser:
                     if "params" in parsed_data:
                         params.update(parsed_data["params"])
                     
-                    # Add debugging information
-                    print("==== Vision Parser Results ====")
-                    print(f"Circuit type: {circuit_type}")
-                    print(f"Num qubits: {num_qubits}")
-                    print(f"Custom description: {params.get('custom_description', 'No description')}")
-                    print(f"Custom gates: {params.get('custom_gates', [])}")
-                    print(f"Explanation structure: {bool(params.get('explanation'))}")
-                    print("================================")
+                    logger.debug(
+                        "Vision parser results: circuit type %s, %d qubits, description %r, gates %s, explanation %s",
+                        circuit_type, num_qubits, params.get("custom_description", "No description"),
+                        params.get("custom_gates", []), bool(params.get("explanation")),
+                    )
                     
                     result = CircuitIntent(circuit_type, params)
                     
@@ -360,17 +361,18 @@ class VisionCircuitParser:
                     # This ensures it will persist through any transformations 
                     if "explanation" in params:
                         setattr(result, "explanation", params["explanation"])
-                        print(f"IMPORTANT: Added explanation as direct attribute to CircuitIntent result!")
                     
                     return result
                     
                 except json.JSONDecodeError as e:
                     attempts += 1
-                    print(f"Attempt {attempts}: Failed to parse JSON: {e}")
+                    logger.debug("Attempt %d: Failed to parse JSON: %s", attempts, e)
                     
                     if attempts >= max_attempts:
-                        print(f"Failed to parse JSON from Vision API response after {max_attempts} attempts: {e}")
-                        print(f"Response content: {content[:500]}...")  # Print first 500 chars for debugging
+                        logger.warning(
+                            "Failed to parse JSON from Vision API response after %d attempts: %s; response content: %.500s...",
+                            max_attempts, e, content,
+                        )
                         raise HTTPException(status_code=422, detail="Could not understand the quantum circuit in the image. Please try with a clearer image.")
                     
                     # Try again with a different approach
@@ -380,12 +382,11 @@ class VisionCircuitParser:
                     end_idx = json_str.rfind('}')
                     if start_idx != -1 and end_idx != -1:
                         json_str = json_str[start_idx:end_idx + 1]
-                        print(f"Cleaned JSON string, attempt {attempts+1}: {json_str[:100]}...")
+                        logger.debug("Cleaned JSON string, attempt %d: %.100s...", attempts + 1, json_str)
                 
         except HTTPException as he:
             # Re-raise HTTP exceptions directly
             raise he
         except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"Exception during Vision API call: {str(e)}\n{error_details}")
+            logger.exception("Exception during Vision API call: %s", e)
             raise HTTPException(status_code=500, detail=f"Error processing circuit image: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,21 @@
+# app/core/openai_clients.py
+import functools
+from openai import OpenAI, AsyncOpenAI
+
+# Every OpenAI-backed component shares these, so the process keeps one connection pool
+# (and one set of warm keep-alive connections) per API key instead of one per instance
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client(api_key: str) -> OpenAI:
+    """Return the shared synchronous client for an API key."""
+    return OpenAI(api_key=api_key)
+
+@functools.lru_cache(maxsize=None)
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Return the shared async client for an API key.
+
+    Its connections belong to the event loop that first uses them, so it is only for
+    code running on the app's loop; a private loop needs its own short-lived client.
+    """
+    return AsyncOpenAI(api_key=api_key)
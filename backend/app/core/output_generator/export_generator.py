@@ -1,16 +1,79 @@
 # app/core/output_generator/export_generator.py
-from qiskit import QuantumCircuit
+from qiskit import QuantumCircuit, qasm2
 import json
+import orjson
 import qiskit.qpy as qpy
 import io
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 import nbformat
 from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
 
 class ExportGenerator:
    """Generates various export formats for quantum circuits with enhanced metadata."""
    
-   def generate_qasm(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None) -> str:
+   # Descriptions attached to well-known gates in the JSON export
+   _GATE_DESCRIPTIONS = {
+       "h": "Hadamard gate (creates superposition)",
+       "x": "Pauli-X gate (NOT gate)",
+       "cx": "CNOT gate (creates entanglement)",
+       "measure": "Measurement operation",
+   }
+   
+   def _operation_records(self, circuit: QuantumCircuit) -> List[Dict[str, Any]]:
+       """Collect each instruction's name, bit indices and float parameters in one pass."""
+       return [
+           {
+               "name": instruction.name,
+               "qubits": [circuit.find_bit(q).index for q in qargs],
+               "clbits": [circuit.find_bit(c).index for c in cargs],
+               "params": [float(param) for param in instruction.params]
+           }
+           for instruction, qargs, cargs in circuit.data
+       ]
+   
+   def generate_all(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None) -> Dict[str, Any]:
+       """
+       Generate the QASM, JSON and IBMQ exports from a single walk of the circuit.
+       
+       Args:
+           circuit: The quantum circuit to export
+           circuit_type: Type of the circuit (e.g., 'bell_state', 'qft')
+           description: Optional description of what the circuit does
+           
+       Returns:
+           dict: qasm_code, json_code and ibmq_config, each holding the raised
+           exception instead when that export failed
+       """
+       results: Dict[str, Any] = {}
+       
+       # Each export reuses what the earlier ones already derived from the circuit,
+       # and recomputes it only if that step failed
+       qasm_code = None
+       try:
+           qasm_code = qasm2.dumps(circuit)
+           results["qasm_code"] = self.generate_qasm(circuit, circuit_type, description, qasm_code=qasm_code)
+       except Exception as e:
+           results["qasm_code"] = e
+       
+       operations = None
+       try:
+           operations = self._operation_records(circuit)
+           results["json_code"] = self.generate_json(circuit, circuit_type, description, operations=operations)
+       except Exception as e:
+           results["json_code"] = e
+       
+       try:
+           results["ibmq_config"] = self.generate_ibmq_job(
+               circuit, circuit_type, description, qasm_code=qasm_code, operations=operations
+           )
+       except Exception as e:
+           results["ibmq_config"] = e
+       
+       return results
+   
+   def generate_qasm(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None,
+                     qasm_code: Optional[str] = None) -> str:
        """
        Generate OpenQASM code for the circuit with detailed comments.
        
@@ -18,12 +81,14 @@ class ExportGenerator:
            circuit: The quantum circuit to export
            circuit_type: Type of the circuit (e.g., 'bell_state', 'qft')
            description: Optional description of what the circuit does
+           qasm_code: The circuit's plain QASM, if already generated
            
        Returns:
            str: OpenQASM representation of the circuit with comments
        """
        # Get the base QASM code
-       qasm_code = circuit.qasm()
+       if qasm_code is None:
+           qasm_code = qasm2.dumps(circuit)
        
        # Add header comments
        header = [
@@ -78,7 +143,8 @@ class ExportGenerator:
        qpy.dump(circuit, buffer)
        return buffer.getvalue()
    
-   def generate_json(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None) -> str:
+   def generate_json(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None,
+                     operations: Optional[List[Dict[str, Any]]] = None) -> str:
        """
        Generate a comprehensive JSON representation of the circuit with metadata.
        
@@ -86,10 +152,28 @@ class ExportGenerator:
            circuit: The quantum circuit to export
            circuit_type: Type of the circuit (e.g., 'bell_state', 'qft')
            description: Optional description of what the circuit does
+           operations: The circuit's operation records, if already collected
            
        Returns:
            str: JSON representation of the circuit with metadata
        """
+       circuit_dict = self.generate_json_dict(circuit, circuit_type, description, operations=operations)
+       return orjson.dumps(circuit_dict, default=str, option=orjson.OPT_INDENT_2).decode('utf-8')
+   
+   def generate_json_dict(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None,
+                          operations: Optional[List[Dict[str, Any]]] = None) -> dict:
+       """
+       Build the JSON-serializable dictionary behind generate_json.
+       
+       Args:
+           circuit: The quantum circuit to export
+           circuit_type: Type of the circuit (e.g., 'bell_state', 'qft')
+           description: Optional description of what the circuit does
+           operations: The circuit's operation records, if already collected
+           
+       Returns:
+           dict: Circuit metadata and operations
+       """
        # Create a dictionary with metadata
        circuit_dict = {
            "metadata": {
@@ -112,32 +196,31 @@ class ExportGenerator:
        }
        
        # Add each gate operation with detailed information
-       for instruction, qargs, cargs in circuit.data:
+       if operations is None:
+           operations = self._operation_records(circuit)
+       
+       for op in operations:
            gate_info = {
-               "name": instruction.name,
-               "qubits": [q.index for q in qargs],
-               "clbits": [c.index for c in cargs] if cargs else []
+               "name": op["name"],
+               "qubits": op["qubits"],
+               "clbits": op["clbits"]
            }
            
            # Add any parameters the gate might have
-           if hasattr(instruction, 'params') and instruction.params:
-               gate_info["parameters"] = [float(param) for param in instruction.params]
+           if op["params"]:
+               gate_info["parameters"] = op["params"]
            
            # Add gate description
-           if instruction.name == "h":
-               gate_info["description"] = "Hadamard gate (creates superposition)"
-           elif instruction.name == "x":
-               gate_info["description"] = "Pauli-X gate (NOT gate)"
-           elif instruction.name == "cx":
-               gate_info["description"] = "CNOT gate (creates entanglement)"
-           elif instruction.name == "measure":
-               gate_info["description"] = "Measurement operation"
+           description_text = self._GATE_DESCRIPTIONS.get(op["name"])
+           if description_text:
+               gate_info["description"] = description_text
            
            circuit_dict["circuit"]["operations"].append(gate_info)
        
-       return json.dumps(circuit_dict, indent=2)
+       return circuit_dict
    
-   def generate_ibmq_job(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None) -> str:
+   def generate_ibmq_job(self, circuit: QuantumCircuit, circuit_type: str = "custom", description: str = None,
+                         qasm_code: Optional[str] = None, operations: Optional[List[Dict[str, Any]]] = None) -> str:
        """
        Generate comprehensive IBM Quantum Experience job configuration.
        
@@ -145,6 +228,8 @@ class ExportGenerator:
            circuit: The quantum circuit to export
            circuit_type: Type of the circuit (e.g., 'bell_state', 'qft')  
            description: Optional description of what the circuit does
+           qasm_code: The circuit's plain QASM, if already generated
+           operations: The circuit's operation records, if already collected
            
        Returns:
            str: JSON configuration for IBM Q Experience with metadata
@@ -183,19 +268,22 @@ class ExportGenerator:
        }
        
        # Add QASM representation
-       ibmq_config["circuits"][0]["qasm"] = circuit.qasm()
+       ibmq_config["circuits"][0]["qasm"] = qasm_code if qasm_code is not None else qasm2.dumps(circuit)
        
        # Add gates to operations
-       for instruction, qargs, cargs in circuit.data:
+       if operations is None:
+           operations = self._operation_records(circuit)
+       
+       for op in operations:
            operation = {
-               "name": instruction.name,
-               "qubits": [q.index for q in qargs],
-               "memory": [c.index for c in cargs] if cargs else []
+               "name": op["name"],
+               "qubits": op["qubits"],
+               "memory": op["clbits"]
            }
            
            # Add parameters if applicable
-           if hasattr(instruction, 'params') and instruction.params:
-               operation["params"] = [float(param) for param in instruction.params]
+           if op["params"]:
+               operation["params"] = op["params"]
                
            ibmq_config["circuits"][0]["compiled_circuit"]["operations"].append(operation)
        
@@ -253,8 +341,8 @@ class ExportGenerator:
        # Add gate operations
        for instruction, qargs, cargs in circuit.data:
            gate_name = instruction.name
-           qubits = [q.index for q in qargs]
-           clbits = [c.index for c in cargs]
+           qubits = [circuit.find_bit(q).index for q in qargs]
+           clbits = [circuit.find_bit(c).index for c in cargs]
            
            # Add comment for the gate
            if gate_name == "h":
@@ -63,8 +63,8 @@ class QiskitGenerator:
         for i, (instruction, qargs, cargs) in enumerate(circuit.data):
             # Get the name of the gate
             gate_name = instruction.name
-            qubits = [q.index for q in qargs]
-            clbits = [c.index for c in cargs]
+            qubits = [circuit.find_bit(q).index for q in qargs]
+            clbits = [circuit.find_bit(c).index for c in cargs]
             
             # Add code with comments - indented for the function
             gate_code = self._generate_gate_code(gate_name, qubits, clbits, instruction, indent=4)
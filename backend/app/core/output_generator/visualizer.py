@@ -3,14 +3,30 @@ import numpy as np
 import io
 import base64
 import logging
+import threading
+import functools
 from qiskit import QuantumCircuit
+from qiskit.quantum_info import Statevector
 from qiskit.visualization import plot_histogram, plot_bloch_multivector, plot_state_qsphere
 from typing import Optional, Dict, Any
 import matplotlib.patheffects as path_effects
+from ...config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("CircuitVisualizer")
 
+# pyplot tracks the "current" figure globally and is not thread-safe, so renders
+# dispatched to worker threads must not interleave.
+_MPL_LOCK = threading.RLock()
+
+def _serialized_render(method):
+    """Run a rendering method while holding the module-wide matplotlib lock."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with _MPL_LOCK:
+            return method(*args, **kwargs)
+    return wrapper
+
 class CircuitVisualizer:
     """Generates professional visualizations for quantum circuits with enhanced styling."""
 
@@ -274,6 +290,7 @@ class CircuitVisualizer:
 
         return circuit_to_draw
 
+    @_serialized_render
     def generate_circuit_image(self, circuit: QuantumCircuit, fold: Optional[int] = None, 
                               transparent_bg: bool = True, dpi: int = 150) -> str:  # Return just the string
         """Generate a visualization of the quantum circuit with optimized dimensions."""
@@ -408,6 +425,7 @@ class CircuitVisualizer:
         # Return just the base64 encoded image as a string
         return base64.b64encode(buf.getvalue()).decode('utf-8')
 
+    @_serialized_render
     def generate_statevector_visualization(self, statevector=None, plot_type='bloch', 
                            title=None, figsize=(8, 6), dpi=150) -> str:
         """Generate a visualization of a quantum state."""
@@ -445,6 +463,7 @@ class CircuitVisualizer:
         # Return just the base64 encoded image as a string
         return base64.b64encode(buf.getvalue()).decode('utf-8')
     
+    @_serialized_render
     def generate_measurement_histogram(self, counts=None, figsize=(8, 5), dpi=150, title=None) -> str:
         """Generate a histogram visualization of measurement results."""
         fig = plt.figure(figsize=figsize)
@@ -495,4 +514,73 @@ class CircuitVisualizer:
         buf.seek(0)
         
         # Return just the base64 encoded image as a string
-        return base64.b64encode(buf.getvalue()).decode('utf-8')
\ No newline at end of file
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+    def _figure_to_base64(self, fig: plt.Figure, dpi: int = 150) -> str:
+        """Encode a finished figure as a base64 PNG and close it."""
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+    def _final_statevector(self, circuit: QuantumCircuit):
+        """
+        Simulate the circuit once without its final measurements.
+
+        Returns the statevector and the qubits the measurements read, in classical
+        bit order, or (None, None) when the circuit can't be simulated as a pure state.
+        """
+        measured = {}
+        for instruction in circuit.data:
+            if instruction.operation.name == 'measure':
+                clbit = circuit.find_bit(instruction.clbits[0]).index
+                measured[clbit] = circuit.find_bit(instruction.qubits[0]).index
+        try:
+            statevector = Statevector.from_instruction(circuit.remove_final_measurements(inplace=False))
+        except Exception as e:
+            # Mid-circuit measurements, resets and conditionals have no single final state
+            logger.info(f"Statevector simulation unavailable: {e}")
+            return None, None
+        return statevector, [measured[clbit] for clbit in sorted(measured)] or None
+
+    @_serialized_render
+    def render_all(self, circuit: QuantumCircuit, dpi: int = 150) -> Dict[str, Any]:
+        """
+        Render the Bloch sphere, Q-sphere and measurement histogram from a single simulation.
+
+        Each image is None when it could not be rendered, or when the circuit is wider
+        than MAX_QUBIT_VISUALIZATION (spheres) or MAX_QUBIT_SIMULATION (everything).
+        """
+        bundle: Dict[str, Any] = {"bloch_sphere": None, "q_sphere": None, "measurement_histogram": None}
+
+        # Simulation cost grows as 2^n, so large circuits only get their diagram
+        if circuit.num_qubits > settings.MAX_QUBIT_SIMULATION:
+            logger.info(f"Skipping state visualizations for {circuit.num_qubits} qubits")
+            return bundle
+
+        statevector, measured_qubits = self._final_statevector(circuit)
+
+        if statevector is None:
+            # Fall back to sampling the circuit for the histogram
+            try:
+                bundle["measurement_histogram"] = self.generate_measurement_histogram(circuit, dpi=dpi)
+            except Exception as e:
+                logger.error(f"Error generating histogram: {e}")
+            return bundle
+
+        if circuit.num_qubits <= settings.MAX_QUBIT_VISUALIZATION:
+            try:
+                bundle["bloch_sphere"] = self._figure_to_base64(plot_bloch_multivector(statevector), dpi)
+            except Exception as e:
+                logger.error(f"Error generating Bloch sphere: {e}")
+            try:
+                bundle["q_sphere"] = self._figure_to_base64(plot_state_qsphere(statevector), dpi)
+            except Exception as e:
+                logger.error(f"Error generating Q-sphere: {e}")
+
+        # Exact outcome probabilities of the measured qubits, so no shots are needed
+        probabilities = {
+            outcome: p for outcome, p in statevector.probabilities_dict(measured_qubits).items() if p > 1e-12
+        }
+        bundle["measurement_histogram"] = self.generate_measurement_histogram(probabilities, dpi=dpi)
+        return bundle
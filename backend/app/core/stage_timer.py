@@ -0,0 +1,44 @@
+# app/core/stage_timer.py
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict
+
+logger = logging.getLogger(__name__)
+
+class StageTimer:
+    """
+    Wall-clock timings for the stages of one request, emitted as a single log line.
+
+    Stages are timed in the route itself with perf_counter_ns, so timing adds no ASGI
+    middleware to the request path. Concurrent stages are timed individually, including any
+    wait for a CPU pool worker, so they can add up to more than the request total.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter_ns()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`, in milliseconds."""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter_ns() - start) / 1e6
+
+    async def timed(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await `awaitable` as stage `name`; lets stages run under asyncio.gather."""
+        with self.stage(name):
+            return await awaitable
+
+    def log(self, **fields: Any) -> None:
+        """Emit the collected stage timings plus any extra fields."""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        total = (time.perf_counter_ns() - self._start) / 1e6
+        stages = " ".join(f"{name}={ms:.1f}" for name, ms in self.stages.items())
+        extra = "".join(f" {key}={value}" for key, value in fields.items())
+        logger.info("route=%s total_ms=%.1f%s stages={%s}", self.route, total, extra, stages)
@@ -4,11 +4,14 @@ import logging
 logging.getLogger('qiskit').setLevel(logging.ERROR)
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
 # Standard library imports
-import logging
+import logging.handlers
+import queue
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any
 
 # Application imports
@@ -17,21 +20,52 @@ from app.api.routes import (
     circuit_templates,
     image_input,
     exports,
-    circuit_upload  # Added our new module
+    circuit_upload,  # Added our new module
+    visualizations
 )
 from app.config import settings
+from app.core.cpu_pool import CPU_POOL
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Route log records through a queue; records are queued on the calling thread and
+    written by a listener thread so request handlers never block on stream I/O.
+    
+    Returns the started listener, which the caller stops on shutdown.
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Leave the full layout to the stream handler so records aren't formatted twice
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        handlers=[queue_handler],
+        force=True,
+    )
+    return listener
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up logging on startup; release the shared worker pool and flush logs on shutdown."""
+    log_listener = configure_logging()
+    yield
+    CPU_POOL.shutdown(wait=True)
+    log_listener.stop()
+
 app = FastAPI(
     title=settings.APP_NAME,
     description=settings.APP_DESCRIPTION,
-    version=settings.APP_VERSION
+    version=settings.APP_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -44,12 +78,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Routes that accept file uploads, and the headroom allowed for multipart framing and form fields
+_UPLOAD_PATH_PREFIXES = ("/upload/", "/image/")
+_MULTIPART_ALLOWANCE = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject uploads whose declared Content-Length is over the limit before the
+    multipart body is read and spooled.
+    
+    A plain ASGI middleware, so requests to other routes only pay for a path check.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].startswith(_UPLOAD_PATH_PREFIXES):
+            content_length = next((value for name, value in scope["headers"] if name == b"content-length"), b"")
+            if content_length.isdigit() and int(content_length) > settings.MAX_UPLOAD_SIZE + _MULTIPART_ALLOWANCE:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File too large. Maximum upload size is {settings.MAX_UPLOAD_SIZE} bytes"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Include routers
 app.include_router(text_input.router)
 app.include_router(circuit_templates.router)  
 app.include_router(image_input.router)
 app.include_router(exports.router)
 app.include_router(circuit_upload.router)  # Added our new router
+app.include_router(visualizations.router)
 
 @app.get("/")
 async def root() -> Dict[str, Any]:
@@ -0,0 +1,56 @@
+# prebuild_gate_cache.py
+"""
+Prebuild the OpenAI gate sequences for the template catalogue in one Batch API job.
+
+Templates without a local builder (W state, Simon, QPE, ...) get their gates from
+OpenAI on first request. This asks for all of them, at every qubit count the catalogue
+offers, at about half the price of individual calls, and stores the answers in the
+on-disk gate cache the server reads. Run it offline with the server's environment:
+
+    CUBITS_OPENAI_CACHE=1 python prebuild_gate_cache.py
+"""
+import argparse
+import logging
+import sys
+
+from app.api.routes.circuit_templates import _TEMPLATES_RAW
+from app.config import settings
+from app.core.circuit_builder.builder import _TEMPLATE_BUILDERS
+from app.core.circuit_builder.openai_circuit_generator import OpenAICircuitGenerator
+from app.core.nlp_processor.intent_parser import CircuitType
+
+
+def catalogue_requests():
+    """(circuit type, params) for each generated template at each of its qubit counts."""
+    requests = []
+    for template in _TEMPLATES_RAW:
+        circuit_type = CircuitType(template["id"])
+        if circuit_type in _TEMPLATE_BUILDERS:
+            continue
+        qubits = next((p for p in template["parameters"] if p["name"] == "num_qubits"), None)
+        if qubits is None:
+            requests.append((circuit_type, dict(template["defaultParams"])))
+            continue
+        for num_qubits in range(qubits["min"], qubits["max"] + 1):
+            requests.append((circuit_type, {**template["defaultParams"], "num_qubits": num_qubits}))
+    return requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch status checks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    generator = OpenAICircuitGenerator()
+    if not generator.client:
+        print("OPENAI_API_KEY is not set")
+        sys.exit(1)
+    if not settings.OPENAI_GATE_DISK_CACHE:
+        # Without the disk cache the answers would be lost when this process exits
+        print("Set CUBITS_OPENAI_CACHE=1 (and CUBITS_OPENAI_CACHE_DIR if the server uses one)")
+        sys.exit(1)
+
+    requests = catalogue_requests()
+    print(f"Prebuilding {len(requests)} gate sequences into {settings.OPENAI_GATE_DISK_CACHE_DIR}")
+    generator.generate_circuit_gates_batch(requests, poll_interval=args.poll_interval)
@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+from app.core import angle_parser
+from app.core.angle_parser import parse_angle
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("pi/2", math.pi / 2),
+    ("-3*pi/4", -3 * math.pi / 4),
+    ("π/4", math.pi / 4),
+    ("np.pi", math.pi),
+    ("math.pi / 3", math.pi / 3),
+    ("2**3", 8.0),
+    ("  1.5 ", 1.5),
+])
+def test_valid_expressions(expression, expected):
+    assert parse_angle(expression) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("expression", [
+    "theta",
+    "__import__('os')",
+    "abs(-1)",
+    "os.pi",
+    "np.sqrt",
+    "pi.real",
+    "True",
+    "'pi'",
+    "pi/",
+    "",
+])
+def test_names_calls_and_attributes_are_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_angle(expression)
+
+
+def test_complex_result_is_rejected():
+    with pytest.raises(ValueError):
+        parse_angle("(-1)**0.5")
+
+
+def test_overflow_is_rejected():
+    with pytest.raises(ArithmeticError):
+        parse_angle("2**1e10")
+    with pytest.raises(ValueError):
+        parse_angle("1e308*10")
+
+
+def test_division_by_zero_is_rejected():
+    with pytest.raises(ArithmeticError):
+        parse_angle("pi/0")
+
+
+def test_overlong_expression_is_rejected():
+    with pytest.raises(ValueError):
+        parse_angle("rx(" + "-" * 1000 + "1)")
+
+
+def test_deep_nesting_is_rejected(monkeypatch):
+    # Past the length limit, deep nesting must still fail as ValueError, not RecursionError
+    monkeypatch.setattr(angle_parser, "MAX_EXPRESSION_LENGTH", 1_000_000)
+    with pytest.raises(ValueError):
+        parse_angle("-" * 100_000 + "1")
+    with pytest.raises(ValueError):
+        parse_angle("(" * 10_000 + "1" + ")" * 10_000)
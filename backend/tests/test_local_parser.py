@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from app.core.nlp_processor.local_parser import LocalCircuitFileParser
+
+BELL_QASM = """OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[2];
+creg c[2];
+h q[0];
+cx q[0],q[1];
+rz(pi/2) q[1];
+barrier q[0],q[1];
+measure q[0] -> c[0];
+measure q[1] -> c[1];
+"""
+
+
+@pytest.fixture
+def parser():
+    return LocalCircuitFileParser()
+
+
+def test_qasm_is_parsed_locally(parser):
+    content, metadata = parser.parse_circuit_file(BELL_QASM, "qasm")
+    assert content == BELL_QASM
+    assert metadata["num_qubits"] == 2
+    assert metadata["description"] == "Imported QASM circuit"
+    assert metadata["gates"][:2] == ["h 0", "cx 0 1"]
+    assert metadata["gates"][2].startswith("rz 1 1.5707")
+    assert metadata["gates"][3:] == ["barrier 0 1", "measure 0 0", "measure 1 1"]
+
+
+def test_qasm_description_is_kept(parser):
+    _, metadata = parser.parse_circuit_file(BELL_QASM, "qasm", "my bell circuit")
+    assert metadata["description"] == "my bell circuit"
+
+
+@pytest.mark.parametrize("content", [
+    "not qasm at all",
+    # Classically conditioned gates need the LLM
+    'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[1];\ncreg c[1];\nmeasure q[0] -> c[0];\nif(c==1) x q[0];\n',
+    # Gates the builder doesn't support
+    'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[2];\nch q[0],q[1];\n',
+])
+def test_qasm_needing_the_llm_returns_none(parser, content):
+    assert parser.parse_circuit_file(content, "qasm") is None
+
+
+def test_exported_json_is_parsed_locally(parser):
+    document = {
+        "metadata": {"num_qubits": 3, "description": "exported"},
+        "circuit": {"operations": [
+            {"name": "h", "qubits": [0]},
+            {"name": "u", "qubits": [1], "parameters": [0.1, 0.2, 0.3]},
+            {"name": "ccx", "qubits": [0, 1, 2]},
+            {"name": "measure", "qubits": [2], "clbits": [0]},
+        ]},
+    }
+    _, metadata = parser.parse_circuit_file(json.dumps(document), "json")
+    assert metadata == {
+        "num_qubits": 3,
+        "description": "exported",
+        "gates": ["h 0", "u3 1 0.1 0.2 0.3", "ccx 0 1 2", "measure 2 0"],
+    }
+
+
+def test_json_qubit_count_falls_back_to_highest_index(parser):
+    document = {"circuit": {"operations": [{"name": "cx", "qubits": [0, 4]}]}}
+    _, metadata = parser.parse_circuit_file(json.dumps(document), "json")
+    assert metadata["num_qubits"] == 5
+
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    json.dumps({"metadata": {}}),
+    json.dumps({"circuit": {"operations": [{"name": "rx", "qubits": [0]}]}}),
+    json.dumps({"circuit": {"operations": [{"name": "mystery", "qubits": [0]}]}}),
+])
+def test_json_needing_the_llm_returns_none(parser, content):
+    assert parser.parse_circuit_file(content, "json") is None
+
+
+def test_other_formats_return_none(parser):
+    assert parser.parse_circuit_file("qc = QuantumCircuit(1)", "python") is None
@@ -0,0 +1,64 @@
+import pytest
+
+from app.api.routes.text_input import _FASTPATH_MIN_QUBITS, _match_template_request
+from app.core.nlp_processor.intent_parser import CircuitType
+
+
+@pytest.mark.parametrize("text, circuit_type", [
+    ("bell state", CircuitType.BELL_STATE),
+    ("create a bell pair", CircuitType.BELL_STATE),
+    ("please make me a ghz state circuit.", CircuitType.GHZ_STATE),
+    ("build a w-state", CircuitType.W_STATE),
+    ("quantum teleportation protocol", CircuitType.TELEPORTATION),
+    ("superdense coding", CircuitType.SUPERDENSE_CODING),
+    ("generate the deutsch-jozsa algorithm", CircuitType.DEUTSCH_JOZSA),
+    ("bernstein vazirani", CircuitType.BERNSTEIN_VAZIRANI),
+    ("simon's algorithm", CircuitType.SIMON),
+    ("quantum fourier transform", CircuitType.QFT),
+    ("show qpe", CircuitType.QPE),
+    ("grover's search please", CircuitType.GROVERS),
+])
+def test_bare_template_requests_match(text, circuit_type):
+    intent = _match_template_request(text)
+    assert intent is not None
+    assert intent.circuit_type == circuit_type
+    assert intent.params == {}
+
+
+@pytest.mark.parametrize("text, num_qubits", [
+    ("create a 4-qubit ghz state", 4),
+    ("make a 5 qubit ghz state", 5),
+    ("qft on 5 qubits", 5),
+    ("grover's algorithm with 3 qubits", 3),
+    ("create a   3-qubit   qft", 3),
+])
+def test_qubit_count_is_extracted(text, num_qubits):
+    intent = _match_template_request(text)
+    assert intent is not None
+    assert intent.params == {"num_qubits": num_qubits}
+
+
+def test_qubit_count_is_capped_at_ten():
+    assert _match_template_request("create a 20 qubit qft").params == {"num_qubits": 10}
+
+
+@pytest.mark.parametrize("circuit_type, text", [
+    (CircuitType.BELL_STATE, "bell state with 1 qubit"),
+    (CircuitType.GHZ_STATE, "ghz state with 2 qubits"),
+    (CircuitType.TELEPORTATION, "2-qubit teleportation"),
+    (CircuitType.SUPERDENSE_CODING, "superdense coding on 1 qubit"),
+])
+def test_undersized_requests_fall_through(circuit_type, text):
+    assert _FASTPATH_MIN_QUBITS[circuit_type] > 1
+    assert _match_template_request(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "explain the bell state to me",
+    "bell state then measure qubit 0",
+    "apply h on qubit 0 and cnot from qubit 0 to qubit 1",
+    "ghz state with 3 qubits and a hadamard on qubit 2",
+    "",
+])
+def test_specific_requests_fall_through(text):
+    assert _match_template_request(text) is None